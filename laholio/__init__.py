@@ -11,4 +11,11 @@ __meta__ = pkg.meta.data
 
 logger = pkg.log  # pylint: disable=invalid-name
 
+if S.LOG_QUEUE:
+    from laholio.utils.query_log import (  # noqa: E402 pylint: disable=C0413
+        install_queue_logging,
+    )
+
+    install_queue_logging()
+
 logger.debug("initialized laholio", **dict(S))
@@ -11,6 +11,7 @@ from elasticsearch_dsl import connections
 
 from laholio import S
 from laholio.exceptions import ElasticsearchNotReady
+from laholio.utils.serializer import FastJSONSerializer
 
 CA_CERTS = certifi.where()
 
@@ -26,6 +27,10 @@ class ElasticSearchConnection:
     conexión se usará, es a través del parámetro `transport_type`
     (sync o async).
 
+    Las respuestas se decodifican con
+    :class:`laholio.utils.serializer.FastJSONSerializer`, salvo que se
+    entregue otro `serializer`.
+
     Ambas librerías son oficiales.
 
     Ver mas:
@@ -64,6 +69,7 @@ class ElasticSearchConnection:
         kwargs.setdefault("hosts", [S.ELASTICSEARCH_HOST])
         kwargs.setdefault("verify_certs", True)
         kwargs.setdefault("ca_certs", CA_CERTS)
+        kwargs.setdefault("serializer", FastJSONSerializer())
         kwargs.setdefault(
             "transport_class",
             AsyncTransport if transport_type == "async" else Transport,
@@ -1,28 +1,67 @@
 """Operaciones CRUD."""
 # -*- coding: utf-8 -*-
+import asyncio
+import json
+import time
+from contextlib import contextmanager
+from functools import partial
+from operator import methodcaller
+from typing import AsyncIterable
+from typing import Callable
 from typing import Iterable
 from typing import List
 from typing import Optional
+from typing import Sequence
 from typing import Tuple
 from typing import Union
 
 from elasticsearch import Elasticsearch
+from elasticsearch.exceptions import TransportError
 from elasticsearch.helpers import bulk
+from elasticsearch.helpers import parallel_bulk
 from elasticsearch_dsl import Q
 from elasticsearch_dsl import Search
 from elasticsearch_dsl.response import Response
+from elasticsearch_dsl.utils import AttrDict
 
 from laholio import logger
 from laholio.connection import AsyncTransport
 from laholio.exceptions import IndexNotExists
+from laholio.exceptions import InvalidCursor
 from laholio.exceptions import NotAsyncEsConnection
 from laholio.exceptions import NotUsingEsConnection
 from laholio.exceptions import NotUsingIndex
 from laholio.schemas import CatalogoUpload
 from laholio.schemas import Sku
+from laholio.templates import SKU_LIST_ALL
+from laholio.templates import SKU_SEARCH
+from laholio.templates import SKU_SUGGEST
+from laholio.templates import SearchTemplates
+from laholio.templates import is_missing_template
+from laholio.templates import provider_filter
+from laholio.utils import cache as result_cache
 from laholio.utils._elasticsearch import Document
+from laholio.utils.adaptive_bulk import AdaptiveChunking
+from laholio.utils.adaptive_bulk import adaptive_bulk
+from laholio.utils.adaptive_bulk import failure
+from laholio.utils.adaptive_bulk import helpers_failures
+from laholio.utils.async_bulk import async_bulk
+from laholio.utils.async_bulk import batches
+from laholio.utils.async_dsl import AsyncMultiSearch
 from laholio.utils.async_dsl import AsyncSearch
 from laholio.utils.async_dsl import AsyncTasks
+from laholio.utils.async_dsl import SingleFlight
+from laholio.utils.bloom import BloomFilter
+from laholio.utils.cache import MISSING
+from laholio.utils.cache import SearchResultCache
+from laholio.utils.cursor import SearchPage
+from laholio.utils.cursor import decode_cursor
+from laholio.utils.cursor import encode_cursor
+from laholio.utils.ndjson import BulkEncoder
+from laholio.utils.ndjson import split_document
+from laholio.utils.prefix import SkuPrefixIndex
+from laholio.utils.query_log import QUERY_LOG
+from laholio.utils.spelling import SymSpell
 
 
 class Base:  # pylint: disable=R0903
@@ -43,17 +82,55 @@ class Base:  # pylint: disable=R0903
 
 
 class BaseAsyncSearch(Base):
-    """Clase base para operaciones de búsquedas asincrónicas."""
+    """Clase base para operaciones de búsquedas asincrónicas.
+
+    Args:
+        cache: Caché opcional de resultados. Si se entrega, las búsquedas
+            que lo soportan guardan y reutilizan sus resultados. Ver
+            :class:`~laholio.utils.cache.SearchResultCache`.
+        single_flight: Grupo opcional en el que se coalescen las búsquedas
+            concurrentes idénticas. Ver
+            :class:`~laholio.utils.async_dsl.SingleFlight`.
+        templates: Si se entrega, las búsquedas que tienen plantilla
+            guardada en el cluster la usan, volviendo al DSL completo si
+            el cluster no la tiene. Ver
+            :class:`~laholio.templates.SearchTemplates`.
 
-    def __init__(self, *args, **kwargs):
+    """
+
+    TIEBREAKER: Optional[str] = None
+    """Campo de desempate del orden al paginar con `search_after`.
+
+    Debe ser un keyword con doc values y único por documento. Las
+    subclases que paginan lo definen; `_id` no sirve, pues ordenar por
+    él carga fielddata en el heap de cada nodo.
+
+    """
+
+    SUGGEST_FILTER_PATH = "suggest.*.text,suggest.*.options.text"
+    """`filter_path` de las sugerencias: solo los textos sugeridos."""
+
+    def __init__(
+        self,
+        *args,
+        cache: Optional[SearchResultCache] = None,
+        single_flight: Optional[SingleFlight] = None,
+        templates: Optional[SearchTemplates] = None,
+        **kwargs,
+    ):
         super().__init__(*args, **kwargs)
         if not isinstance(self.connection.transport, AsyncTransport):
             raise NotAsyncEsConnection(connection=self.connection)
+        self.cache = cache
+        self.single_flight = single_flight
+        self.templates = templates
 
     @property
     def search_base(self):
         """Búsqueda con la configuración básica."""
         search = AsyncSearch(using=self.connection, index=self.index_name)
+        if self.single_flight is not None:
+            search = search.single_flight(self.single_flight)
         return search
 
     @staticmethod
@@ -65,6 +142,7 @@ class BaseAsyncSearch(Base):
         size: int = 5,
         includes: Optional[List[str]] = None,
         excludes: Optional[List[str]] = None,
+        match_options: Optional[dict] = None,
     ) -> AsyncSearch:
         """Construye búsqueda por texto en multiples campos.
 
@@ -88,6 +166,8 @@ class BaseAsyncSearch(Base):
 
             fields: Nombre de los fields de :class:~`laholio.schemas.Sku`
                 en donde se quiere buscar
+            match_options: Opciones adicionales del `multi_match`, e.g.
+                `fuzziness`.
 
         Returns:
             search: Search
@@ -106,51 +186,134 @@ class BaseAsyncSearch(Base):
             search = search.source(excludes=excludes)
 
         search = search.query(
-            Q("multi_match", query=text, operator=operator, fields=fields)
+            Q(
+                "multi_match",
+                query=text,
+                operator=operator,
+                fields=fields,
+                **(match_options or {}),
+            )
         )
 
         search = search.params(size=size)
 
-        logger.info("Query", query=search.to_dict())
+        QUERY_LOG.log("multi_match:" + operator, search.to_dict)
 
         return search
 
-    async def suggest(
-        self, text: str, field_name, suggestion_type, suggestion_name: str
-    ) -> List[str]:
-        """Corrección/sugerencia de un texto
-        Args:
-            field_name: Nombre del campo de referencia para sugerir.
-            suggestion_type: Tipo de sugerencia de ES, `phrase` o `term`.
-            suggestion_name : Identificador de la sugerencia.
-            text: Texto de entrada.
+    async def _search_template(
+        self, template_id: str, params: dict, **query_params
+    ) -> Optional[dict]:
+        """Ejecuta la plantilla guardada `template_id`.
+
+        Solo viajan el `id` y los `params` de la plantilla.
+
         Returns:
-           Lista con las opciones de sugerencia de texto. Retorna una lista
-                vacía si es que no hay sugerencias.
+            La respuesta sin procesar, o `None` si no se usan plantillas o
+            el cluster no tiene la plantilla: en ese caso quien llama debe
+            buscar con el DSL completo.
+
         """
-        search = self.search_base
+        if self.templates is None or not self.templates.enabled(template_id):
+            return None
+
+        body = {"id": template_id, "params": params}
+
+        QUERY_LOG.log(template_id, body)
+
+        def request():
+            return self.connection.search_template(
+                index=self.index_name, body=body, **query_params
+            )
+
+        try:
+            if self.single_flight is None:
+                response = await request()
+            else:
+                key = (
+                    id(self.connection),
+                    self.index_name,
+                    json.dumps(body, sort_keys=True, default=str),
+                    json.dumps(query_params, sort_keys=True, default=str),
+                )
+                response = await self.single_flight.do(key, request)
+        except TransportError as exc:
+            if not is_missing_template(exc):
+                raise
+            logger.warning("Plantilla no encontrada", template=template_id)
+            self.templates.missing(template_id)
+            return None
+
+        self.templates.found(template_id)
+        return response
+
+    def _from_cache(self, key):
+        """Valor cacheado bajo `key`, o `MISSING` si no hay caché o hit."""
+        if key is None:
+            return MISSING
+        return self.cache.get(key)
+
+    def _to_cache(self, key, value):
+        if key is not None:
+            self.cache.set(key, value)
 
+    @staticmethod
+    def _check_suggestion_type(suggestion_type: str):
         if suggestion_type not in ("phrase", "term"):
             raise ValueError(
                 "Parámetro `suggestion_type` debe ser `term` o `phrase`"
             )
 
-        if suggestion_type == "phrase":
-            search = search.suggest(
-                suggestion_name,
-                text,
-                phrase={"field": field_name, "max_errors": 3},
-            )
+    def _suggest_search(
+        self, text: str, field_name, suggestion_type, suggestion_name: str
+    ) -> AsyncSearch:
+        """Búsqueda que solo pide la sugerencia de `text`.
 
-        elif suggestion_type == "term":
-            search = search.suggest(
-                suggestion_name,
+        Ver :meth:`~laholio.crud.BaseAsyncSearch.suggest`.
+
+        """
+        self._check_suggestion_type(suggestion_type)
+
+        return self.search_base.suggest(
+            suggestion_name,
+            text,
+            **{suggestion_type: {"field": field_name, "max_errors": 3}},
+        )
+
+    @staticmethod
+    def _suggest_params(
+        text: str, field_name, suggestion_type, suggestion_name: str
+    ) -> dict:
+        """Parámetros de la plantilla equivalente a :meth:`_suggest_search`.
+
+        Ver :data:`~laholio.templates.SKU_SUGGEST`.
+
+        """
+        return dict(
+            name=suggestion_name,
+            type=suggestion_type,
+            field=field_name,
+            text=text,
+        )
+
+    def _suggest_key(
+        self, text: str, field_name, suggestion_type, suggestion_name: str
+    ):
+        if self.cache is None:
+            return None
+        return self.cache.stamp(
+            self.cache.make_key(
+                self.index_name,
                 text,
-                term={"field": field_name, "max_errors": 3},
+                suggestion_type,
+                field_name=field_name,
+                suggestion_name=suggestion_name,
             )
+        )
 
-        response = await search.execute()
-
+    @staticmethod
+    def _suggestion_texts(response, suggestion_name: str) -> List[str]:
+        """Extrae las opciones de la sugerencia `suggestion_name`."""
         if not hasattr(response, "suggest"):
             raise NotImplementedError  # TODO: Cuando el índice no tiene docs
             # entra a este error, why? que otro caso?
@@ -161,7 +324,60 @@ class BaseAsyncSearch(Base):
         # en el único elemeno de la lista
         suggestions = suggestions[suggestion_name][0]
 
-        return [suggest.text for suggest in suggestions.options]
+        # Con `filter_path` las sugerencias sin opciones no traen la lista
+        options = getattr(suggestions, "options", [])
+
+        # Con `collate` y `prune`, las correcciones sin matches se marcan
+        return [
+            suggest.text
+            for suggest in options
+            if getattr(suggest, "collate_match", True)
+        ]
+
+    async def suggest(
+        self, text: str, field_name, suggestion_type, suggestion_name: str
+    ) -> List[str]:
+        """Corrección/sugerencia de un texto
+        Args:
+            field_name: Nombre del campo de referencia para sugerir.
+            suggestion_type: Tipo de sugerencia de ES, `phrase` o `term`.
+            suggestion_name : Identificador de la sugerencia.
+            text: Texto de entrada.
+        Returns:
+           Lista con las opciones de sugerencia de texto. Retorna una lista
+                vacía si es que no hay sugerencias.
+        """
+        self._check_suggestion_type(suggestion_type)
+
+        cache_key = self._suggest_key(
+            text, field_name, suggestion_type, suggestion_name
+        )
+        cached = self._from_cache(cache_key)
+        if cached is not MISSING:
+            return cached
+
+        response = await self._search_template(
+            SKU_SUGGEST,
+            self._suggest_params(
+                text, field_name, suggestion_type, suggestion_name
+            ),
+            filter_path=self.SUGGEST_FILTER_PATH,
+        )
+        if response is not None:
+            response = AttrDict(response)
+        else:
+            search = self._suggest_search(
+                text, field_name, suggestion_type, suggestion_name
+            )
+            response = await search.params(
+                filter_path=self.SUGGEST_FILTER_PATH
+            ).execute()
+
+        suggested = self._suggestion_texts(response, suggestion_name)
+
+        self._to_cache(cache_key, suggested)
+
+        return suggested
 
     @staticmethod
     def _hit_dsl_conversor(hit, include_meta: bool):
@@ -171,6 +387,27 @@ class BaseAsyncSearch(Base):
     def _hit_conversor(hit: dict, include_meta: bool):
         return hit if include_meta else hit["_source"]
 
+    @staticmethod
+    def _hits(response: Union[Response, dict]):
+        """Hits de la respuesta, vacío si `filter_path` los eliminó."""
+        try:
+            return response["hits"]["hits"]  # Ambas respuestas dsl y es-py
+        except KeyError:
+            return []
+
+    @staticmethod
+    def _filter_path(include_meta: bool, *extra: str) -> str:
+        """`filter_path` con solo lo que consume :meth:`serialize`.
+
+        Args:
+            include_meta: Igual que en :meth:`serialize`. Si es `False`
+                solo se descarga el `_source` de cada hit.
+            extra: Rutas adicionales que consume quien llama.
+
+        """
+        paths = ["hits.hits" if include_meta else "hits.hits._source"]
+        return ",".join(paths + list(extra))
+
     def serialize(
         self, response: Union[Response, dict], include_meta: bool
     ) -> List[dict]:
@@ -193,68 +430,239 @@ class BaseAsyncSearch(Base):
             else "_hit_conversor",
         )
 
-        hits = response["hits"]["hits"]  # Ambas respuestas dsl y es-py
+        hits = self._hits(response)
 
         serialized = [conversor(hit, include_meta) for hit in hits]
 
         return serialized
 
+    def _page_search(
+        self,
+        search: AsyncSearch,
+        pag_size: int,
+        search_after: Optional[List] = None,
+    ) -> AsyncSearch:
+        """Prepara `search` para paginar usando `search_after`.
+
+        Conserva el orden de la búsqueda (por defecto `_score`) y le
+        agrega como desempate `TIEBREAKER`, de manera que el orden sea
+        total y cada página continúe exactamente donde terminó la
+        anterior. A diferencia de la scroll API, no queda ningún contexto
+        abierto en el cluster.
+
+        """
+        if self.TIEBREAKER is None:
+            raise NotImplementedError(
+                "{} no define `TIEBREAKER`".format(type(self).__name__)
+            )
+
+        sort = list(search._sort) or [{"_score": "desc"}]
+        sorted_fields = [
+            field if isinstance(field, str) else next(iter(field))
+            for field in sort
+        ]
+        if self.TIEBREAKER not in sorted_fields:
+            sort.append({self.TIEBREAKER: "asc"})
+
+        search = search.sort(*sort)
+        search._extra.pop("from", None)
+        search._extra.pop("size", None)
+        search._params.pop("from_", None)
+        search = search.params(size=pag_size)
+
+        if search_after is not None:
+            search = search.extra(search_after=list(search_after))
+
+        return search
+
+    async def _fetch_page(
+        self, search: AsyncSearch, include_meta: bool
+    ) -> Tuple[List[dict], Optional[List]]:
+        """Ejecuta una página y retorna sus resultados y su último `sort`."""
+        response = await search.params(
+            filter_path=self._filter_path(include_meta, "hits.hits.sort")
+        ).execute_raw()
+        serialized = self.serialize(response, include_meta=include_meta)
+        hits = self._hits(response)
+        search_after = list(hits[-1]["sort"]) if hits else None
+        return serialized, search_after
+
+    def _cursor(
+        self, search: AsyncSearch, search_after: Optional[List] = None
+    ) -> str:
+        """Cursor opaco para continuar `search` desde `search_after`.
+
+        Sin `search_after`, el cursor parte desde el primer resultado.
+        Ver :mod:`laholio.utils.cursor`.
+
+        """
+        body = search.to_dict()
+        body.pop("search_after", None)
+        return encode_cursor(
+            {
+                "index": self.index_name,
+                "body": body,
+                "params": search._params,
+                "search_after": search_after,
+            }
+        )
+
+    def _search_from_cursor(
+        self, cursor: str
+    ) -> Tuple[AsyncSearch, Optional[List]]:
+        """Reconstruye la búsqueda y la posición guardadas en `cursor`."""
+        state = decode_cursor(cursor)
+        if state.get("index") != self.index_name:
+            raise InvalidCursor(reason="índice")
+
+        search = self.search_base.update_from_dict(state["body"])
+        search = search.params(**state["params"])
+        return search, state["search_after"]
+
     async def init_scroll(
         self,
         search: AsyncSearch,
         pag_size: int,
         include_meta: bool = False,
-        scroll: str = "1m",
-    ) -> Tuple[List[dict], int]:
-        """Inicialización de la scroll API de elasitcsearch.
+        scroll: str = "1m",  # pylint: disable=unused-argument
+    ) -> Tuple[List[dict], Optional[str]]:
+        """Inicialización de la paginación de una búsqueda.
+
+        La paginación usa `search_after` y no la scroll API, por lo que
+        no se abre ningún search context en el cluster.
 
         Args:
-            search : Búsqueda inicial para la scroll API.
+            search : Búsqueda a paginar.
             pag_size : Tamaño de la paginación.
             include_meta : Incluir o no metadatos asociados a la búsqueda.
-            scroll : Tiempo en que se dejará abierto el search context.
+            scroll : Sin uso, se mantiene por compatibilidad.
 
         Returns:
-            Lista serializada de matchs,
-              y el scroll_id para continuar con la paginación.
+            Lista serializada de matchs, y el cursor para continuar con
+              la paginación usando :meth:`next_page`. El cursor es `None`
+              si no hay más resultados.
 
         """
 
-        search = search.params(size=pag_size, scroll=scroll)
+        search = self._page_search(search, pag_size)
 
-        response = await search.execute()
-
-        serialized = self.serialize(response, include_meta=include_meta)
+        serialized, search_after = await self._fetch_page(search, include_meta)
 
-        scroll_id = response["_scroll_id"]
+        cursor = self._cursor(search, search_after) if search_after else None
 
-        return serialized, scroll_id
+        return serialized, cursor
 
     async def next_page(
-        self, scroll_id: int, include_meta: bool = False, scroll: str = "1m"
-    ):
-        """Consulta al scroll API de elasticsearch usando scroll id."""
+        self,
+        cursor: Optional[str],
+        include_meta: bool = False,
+        scroll: str = "1m",  # pylint: disable=unused-argument
+        pag_size: Optional[int] = None,
+    ) -> Tuple[List[dict], Optional[str]]:
+        """Página siguiente a `cursor`.
 
-        connection = self.connection
-        response = await connection.scroll(
-            body={
-                "scroll_id": scroll_id,  # pylint: disable=used-before-assignment
-                "scroll": scroll,
-            }
-        )
-        scroll_id = response["_scroll_id"]
+        Args:
+            cursor: Cursor retornado por la página anterior, o por
+                :meth:`init_scroll`.
+            include_meta : Incluir o no metadatos asociados a la búsqueda.
+            scroll : Sin uso, se mantiene por compatibilidad.
+            pag_size: Tamaño de la paginación. Por defecto el de la
+                búsqueda guardada en el cursor.
+
+        """
+        if cursor is None:
+            return [], None
+
+        search, search_after = self._search_from_cursor(cursor)
+        pag_size = pag_size or search._params.get("size", 10)
+        search = self._page_search(search, pag_size, search_after)
 
-        serialized = self.serialize(response, include_meta)
+        serialized, search_after = await self._fetch_page(search, include_meta)
 
-        return serialized, scroll_id
+        cursor = self._cursor(search, search_after) if search_after else None
+
+        return serialized, cursor
 
 
 class SkuSearch(BaseAsyncSearch):
-    """Operaciones CRUD para el :class:`laholio.schemas.Sku`."""
+    """Operaciones CRUD para el :class:`laholio.schemas.Sku`.
+
+    Args:
+        connection: Conexión asíncrona a ES.
+        cache: Ver :class:`~laholio.crud.BaseAsyncSearch`.
+        single_flight: Ver :class:`~laholio.crud.BaseAsyncSearch`.
+        multi_search: Si es `True`, :meth:`search_product` envía sus
+            consultas en un único `_msearch`.
+        templates: Ver :class:`~laholio.crud.BaseAsyncSearch`.
+        collate_suggest: Si es `True`, :meth:`suggest_product` obtiene la
+            corrección y los productos en un solo request. Ver
+            :meth:`_suggest_product_collated`.
+        corrector: Corrector ortográfico local. Si se entrega, las
+            correcciones se buscan primero en él y solo si no tiene
+            candidatos se usa el suggester de ES. Ver
+            :meth:`load_corrector`.
+        sku_index: Índice local de prefijos de códigos. Si se entrega,
+            :meth:`complete_sku` responde sin consultar el cluster. Ver
+            :meth:`load_sku_index`.
+        sku_filter: Filtro de Bloom de los `_id` del índice. Ver
+            :meth:`load_sku_filter`.
+        sku_filter_max_age: Segundos durante los que se confía en que un
+            código que :attr:`sku_filter` descarta no existe, contados
+            desde que se construyó el filtro. Los skus escritos después
+            por otros procesos no están en el filtro, así que este es el
+            máximo tiempo en que :meth:`get_skus` puede responder que no
+            existe un sku que sí existe. Con `None` (por defecto), o con
+            un filtro más antiguo, los códigos descartados igual se piden
+            al cluster.
 
-    def __init__(self, connection: Elasticsearch):
-        super().__init__(connection, Sku.Index.name)
+    """
+
+    TIEBREAKER = "sku_id.raw"
+
+    PRODUCT_SUGGESTION = ("descripcion_corta_", "phrase", "sku_suggest")
+    """Campo, tipo y nombre de la sugerencia de :meth:`suggest_product`."""
+
+    PRODUCT_FIELDS = ["sku^10", "descripcion_corta"]
+    """Campos de la búsqueda por texto de :meth:`_search_product`."""
+
+    FUZZY_MATCH = {"fuzziness": "AUTO", "prefix_length": 1}
+    """Opciones del `multi_match` difuso de :meth:`_collated_search`."""
+
+    COLLATE_FILTER_PATH = (
+        "suggest.*.text",
+        "suggest.*.options.text",
+        "suggest.*.options.collate_match",
+    )
+    """`filter_path` de la sugerencia de :meth:`_collated_search`."""
+
+    def __init__(
+        self,
+        connection: Elasticsearch,
+        cache: Optional[SearchResultCache] = None,
+        single_flight: Optional[SingleFlight] = None,
+        multi_search: bool = False,
+        templates: Optional[SearchTemplates] = None,
+        collate_suggest: bool = False,
+        corrector: Optional[SymSpell] = None,
+        sku_index: Optional[SkuPrefixIndex] = None,
+        sku_filter: Optional[BloomFilter] = None,
+        sku_filter_max_age: Optional[float] = None,
+    ):
+        super().__init__(
+            connection,
+            Sku.Index.name,
+            cache=cache,
+            single_flight=single_flight,
+            templates=templates,
+        )
         self.last_search: Optional[AsyncSearch] = None
+        self.multi_search = multi_search
+        self.collate_suggest = collate_suggest
+        self.corrector = corrector
+        self.sku_index = sku_index
+        self.sku_filter = sku_filter
+        self.sku_filter_max_age = sku_filter_max_age
+        self.corrector_field = "descripcion_corta"
 
     @staticmethod
     def _filter_brand(
@@ -271,22 +679,59 @@ class SkuSearch(BaseAsyncSearch):
             sin el digito verificador, tratado como entero.
                 e.g: '96885880-7' -> 96885880.
         Return
-            Búsqueda con el filtro por rut(s).
+            Búsqueda con el filtro por rut(s), ruteada a los shards de
+            los proveedores si `S.ROUTING_BY_PROVIDER` está habilitado.
 
         """
-        return search.filter(
+        search = search.filter(
             "term" if isinstance(rut_proveedor_, int) else "terms",
             rut_proveedor_=rut_proveedor_,
         )
         # Importa la diferencia entre term y terms!
 
+        routing = Sku.build_routing(rut_proveedor_)
+        if routing is None:
+            return search
+        return search.params(routing=routing)
+
+    @staticmethod
+    def _routing_params(
+        rut_proveedor_: Optional[Union[int, List[int]]]
+    ) -> dict:
+        """Parámetro `routing` de una búsqueda por `rut_proveedor_`.
+
+        Ver :meth:`laholio.schemas.Sku.build_routing`.
+
+        """
+        routing = Sku.build_routing(rut_proveedor_ or None)
+        return {} if routing is None else {"routing": routing}
+
     async def search_product_by_sku(
         self,
         sku: str,
         rut_proveedor_: Optional[Union[int, List[int]]] = None,
         include_meta: bool = False,
+        exact: bool = False,
     ) -> List[dict]:
-        """Búsqueda directa por código sku."""
+        """Búsqueda directa por código sku.
+
+        Args:
+            exact: Si es `True`, solo se obtiene el documento con el código
+                exacto, por su `_id` (ver
+                :meth:`laholio.schemas.Sku.build_sku_id`), con un get en
+                tiempo real y sin pasar por las fases de query y fetch.
+                Requiere un solo rut. Los resultados tienen el formato de
+                :meth:`get_skus`. Si no, se busca por el campo `sku`.
+
+        """
+        if exact:
+            if not isinstance(rut_proveedor_, int):
+                raise ValueError("`exact` requiere un solo `rut_proveedor_`")
+            [document] = await self.get_skus(
+                [(rut_proveedor_, sku)], include_meta=include_meta
+            )
+            return [] if document is None else [document]
+
         search = self.search_base
 
         if rut_proveedor_:
@@ -294,7 +739,9 @@ class SkuSearch(BaseAsyncSearch):
 
         search = search.query("match", sku=sku)  # pylint: disable=no-member
 
-        response = await search.execute()
+        response = await search.params(
+            filter_path=self._filter_path(include_meta)
+        ).execute_raw()
 
         serialized = self.serialize(
             response=response, include_meta=include_meta
@@ -302,7 +749,96 @@ class SkuSearch(BaseAsyncSearch):
 
         return serialized
 
-    async def _search_product(  # pylint: disable=too-many-arguments
+    async def get_skus(  # pylint: disable=too-many-arguments
+        self,
+        skus: Iterable[Tuple[int, str]],
+        includes: Optional[List[str]] = None,
+        excludes: Optional[List[str]] = None,
+        include_meta: bool = False,
+        concurrency: int = 4,
+        chunk_size: int = 1000,
+    ) -> List[Optional[dict]]:
+        """Obtiene skus por proveedor y código exacto con la API `_mget`.
+
+        Los `_id` se construyen con :meth:`laholio.schemas.Sku.build_sku_id`,
+        por lo que no se ejecuta ninguna query. Los códigos se agrupan en
+        requests de `chunk_size` y se ejecutan a lo más `concurrency` a la
+        vez. Los códigos que :attr:`sku_filter` descarta no se piden,
+        mientras el filtro no tenga más de :attr:`sku_filter_max_age`
+        segundos (ver :meth:`_fresh_sku_filter`).
+
+        Args:
+            skus: Pares `(rut_proveedor_, sku)`.
+            includes: Control selectivo del campo _source.
+            excludes: Control selectivo del campo _source.
+            include_meta: Si es `True`, entrega el documento completo con
+                sus campos meta y no solo el `_source`.
+            concurrency: Máximo de requests `_mget` en vuelo.
+            chunk_size: Documentos por request `_mget`.
+
+        Returns:
+            Un documento por par, en el orden de entrada, o `None` si el
+            sku no existe.
+
+        """
+        if concurrency < 1 or chunk_size < 1:
+            raise ValueError("`concurrency` y `chunk_size` deben ser >= 1")
+
+        skus = list(skus)
+        ids = [Sku.build_sku_id(rut, sku) for rut, sku in skus]
+        results: List[Optional[dict]] = [None] * len(ids)
+        sku_filter = self._fresh_sku_filter()
+        if sku_filter is not None:
+            positions = [i for i, id_ in enumerate(ids) if id_ in sku_filter]
+        else:
+            positions = list(range(len(ids)))
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        params = {}
+        if includes:
+            params["_source_includes"] = includes
+        if excludes:
+            params["_source_excludes"] = excludes
+        if not include_meta:
+            # `found` mantiene la posición de los documentos que no existen
+            params["filter_path"] = "docs.found,docs._source"
+
+        def docs(position):
+            doc = {"_id": ids[position]}
+            routing = Sku.build_routing(skus[position][0])
+            if routing is not None:
+                doc["routing"] = routing
+            return doc
+
+        async def run(chunk):
+            async with semaphore:
+                response = await self.connection.mget(
+                    body={"docs": [docs(position) for position in chunk]},
+                    index=self.index_name,
+                    doc_type="doc",
+                    **params,
+                )
+            return [
+                (doc if include_meta else doc.get("_source", {}))
+                if doc.get("found")
+                else None
+                for doc in response.get("docs", [])
+            ]
+
+        chunks = await asyncio.gather(
+            *(
+                run(positions[start : start + chunk_size])  # noqa: E203
+                for start in range(0, len(positions), chunk_size)
+            )
+        )
+
+        found = (document for chunk in chunks for document in chunk)
+        for position, document in zip(positions, found):
+            results[position] = document
+        return results
+
+    def _product_search(  # pylint: disable=too-many-arguments
         self,
         text: str,
         search_operator: str,
@@ -310,31 +846,12 @@ class SkuSearch(BaseAsyncSearch):
         rut_proveedor_: Optional[Union[int, List[int]]] = None,
         includes: Optional[List[str]] = None,
         excludes: Optional[List[str]] = None,
-        include_meta=False,
-    ) -> List[dict]:
-        """Busca un Sku dado un texto.
-
-        Busca en los campos `descripcion corta` y `sku` de
-        :class:~`laholio.schemas.Sku` por texto, dándole mayor peso
-        al campo `sku`. Esto significa si en la búsqueda viaja el código
-        sku del proveedor, entonces debería mostrarse como en primera
-        opción dicho sku.
-
-        Args:
-            text : Texto de búsqueda
-            rut_proveedor_: rut o lista de
-            ruts para realizar filtro por proveedores. Se considera este
-            argumento como el rut del proveedor sin el digito verificador,
-            tratado como entero. e.g: '96885880-7' -> 96885880.
-            include_meta : Si es True, muestra los meta fields
-            de los matches.
-
-            Los demás argumentos corresponden a los argumentos de
-                :func: `~laholio.crud.SkuSearch.construct_multi_field_search`
+        match_options: Optional[dict] = None,
+    ) -> AsyncSearch:
+        """Construye la búsqueda de :meth:`_search_product`.
 
-        Returns:
-            Lista serializada de productos encontrados. Si no hay
-            matches retorna una lista vacía
+        Pide un resultado más que `search_size` para saber si hay más
+        resultados que mostrar.
 
         """
 
@@ -345,164 +862,1059 @@ class SkuSearch(BaseAsyncSearch):
         if rut_proveedor_ is not None:
             search_base = self._filter_brand(search_base, rut_proveedor_)
 
-        search = self.construct_multi_field_search(
+        return self.construct_multi_field_search(
             search_base,
             text,
             search_operator,
-            fields=["sku^10", "descripcion_corta"],
+            fields=self.PRODUCT_FIELDS,
             size=search_size + 1,
             includes=includes,
             excludes=excludes,
+            match_options=match_options,
         )
 
-        response = await search.execute()
-
-        serialized = self.serialize(response, include_meta=include_meta)
-
-        if len(serialized) > search_size:
-            self.last_search = search
-            serialized = serialized[:search_size]
-        else:
-            self.last_search = None
-
-        return serialized
-
-    async def search_product(self, text, **kwargs):
-
-        """Busqueda de sku dado un texto.
+    def _collated_search(  # pylint: disable=too-many-arguments
+        self,
+        text: str,
+        search_size: int = 5,
+        rut_proveedor_: Optional[Union[int, List[int]]] = None,
+        includes: Optional[List[str]] = None,
+        excludes: Optional[List[str]] = None,
+    ) -> Tuple[AsyncSearch, AsyncSearch]:
+        """Construye la búsqueda de :meth:`_suggest_product_collated`.
 
-        Se hace una búsqueda con la siguiente lógica. De manera asincrónica
-        se consulta a elasticsearch usando la función
-        :func:`~laholio.crud.SkuSearch._search_product` con operadores
-        de nexo entre tokens `and` y `or`, y además se
-        realiza sugerencia con :func:`~laholio.crud.SkuSearch.suggest_product`.
+        La búsqueda `or` de `text` se hace difusa (`FUZZY_MATCH`), de
+        manera que encuentre los productos de la corrección, y lleva la
+        sugerencia de frase de :meth:`suggest_product` con `collate`: cada
+        corrección se marca según si la búsqueda `or` de
+        :meth:`_search_product` (con el mismo filtro de proveedor)
+        encuentra algo con ella.
 
-        Las tareas están siendo controladas por
-        :class: `~laholio.utils.async_dsl.AsyncTasks`, en la cual las tareas
-        se ejecutan de manera asincrona, pero tienen prioridades, es decir,
-        se retorna el resultado de la tarea exitosa ordenada por prioridad, y
-        las restantes son canceladas. El orden de este método es buscar con
-        prioridad 1 usando `and`, prioridad 2 usando `or` y prioridad 3 la
-        sugerencia.
+        Returns:
+            La búsqueda difusa, usada para paginar, y la misma con la
+            sugerencia.
 
         """
-
-        result = await AsyncTasks.quickexit(
-            lambda r: bool(r),  # pylint: disable=unnecessary-lambda
-            self._search_product(text, search_operator="and", **kwargs),
-            self._search_product(text, search_operator="or", **kwargs),
-            self.suggest_product(text, **kwargs),
+        search = self._product_search(
+            text,
+            "or",
+            search_size,
+            rut_proveedor_,
+            includes,
+            excludes,
+            match_options=self.FUZZY_MATCH,
         )
 
-        return result
+        field_name, suggestion_type, suggestion_name = self.PRODUCT_SUGGESTION
+        self._check_suggestion_type(suggestion_type)
+        collate = {
+            "bool": {
+                "must": [
+                    {
+                        "multi_match": {
+                            "query": "{{suggestion}}",
+                            "operator": "or",
+                            "fields": self.PRODUCT_FIELDS,
+                        }
+                    }
+                ],
+                "filter": provider_filter(rut_proveedor_),
+            }
+        }
 
-    async def suggest_product(self, text, **kwargs):
-        """Sugerencia de sku, dado un texto.
+        return (
+            search,
+            search.suggest(
+                suggestion_name,
+                text,
+                **{
+                    suggestion_type: {
+                        "field": field_name,
+                        "max_errors": 3,
+                        "collate": {
+                            "query": {"source": collate},
+                            "prune": True,
+                        },
+                    }
+                },
+            ),
+        )
 
-        Este método hace dos consultas. Primero, dado el texto, intenta
-        corregirlo (si necesita ser corregido), si el texto fue corregido,
-        realiza la query usando :meth:`laholio.crud.SkuSearch._search_product`
+    def _collated_page(  # pylint: disable=too-many-arguments
+        self,
+        response: Union[Response, dict],
+        search: AsyncSearch,
+        search_size: int,
+        include_meta: bool,
+        cache_key=None,
+    ) -> SearchPage:
+        """Serializa la respuesta de :meth:`_collated_search`.
 
-        Kwargs:
-            corresponden a los kwargs
-                :meth:~`laholio.crud.BaseAsyncSearch.suggest`
+        Los productos solo se retornan si el texto tiene una corrección
+        con matches, igual que en :meth:`suggest_product`.
 
         """
+        if self._suggestion_texts(response, self.PRODUCT_SUGGESTION[-1]):
+            return self._product_page(
+                response, search, search_size, include_meta, cache_key
+            )
 
-        suggested_text = await self.suggest(
-            text=text,
-            field_name="descripcion_corta_",
-            suggestion_type="phrase",
-            suggestion_name="sku_suggest",
-        )
+        self._to_cache(cache_key, ([], False))
+        return self._product_result([], False, search)
 
-        if suggested_text:
-            return await self._search_product(
+    def _product_params(  # pylint: disable=too-many-arguments
+        self,
+        text: str,
+        search_operator: str,
+        search_size: int = 5,
+        rut_proveedor_: Optional[Union[int, List[int]]] = None,
+        includes: Optional[List[str]] = None,
+        excludes: Optional[List[str]] = None,
+    ) -> dict:
+        """Parámetros de la plantilla equivalente a :meth:`_product_search`.
+
+        Ver :data:`~laholio.templates.SKU_SEARCH`.
+
+        """
+        return dict(
+            text=text,
+            operator=search_operator,
+            fields=self.PRODUCT_FIELDS,
+            size=search_size + 1,
+            filter=provider_filter(rut_proveedor_),
+            includes=includes or [],
+            excludes=excludes or ["descripcion_corta_"],
+        )
+
+    def _product_key(  # pylint: disable=too-many-arguments
+        self,
+        text: str,
+        search_operator: str,
+        search_size: int = 5,
+        rut_proveedor_: Optional[Union[int, List[int]]] = None,
+        includes: Optional[List[str]] = None,
+        excludes: Optional[List[str]] = None,
+        include_meta=False,
+    ):
+        if self.cache is None:
+            return None
+        return self.cache.stamp(
+            self.cache.make_key(
+                self.index_name,
+                text,
+                search_operator,
+                rut_proveedor_,
+                includes,
+                excludes,
+                search_size,
+                include_meta=include_meta,
+            )
+        )
+
+    def _product_result(
+        self,
+        serialized: List[dict],
+        has_more: bool,
+        search: Union[AsyncSearch, Callable[[], AsyncSearch]],
+    ) -> SearchPage:
+        """Página de resultados, con cursor si es que hay más.
+
+        Args:
+            search: La búsqueda, o una función que la construye. La
+                búsqueda solo se necesita para el cursor, por lo que si
+                no hay más resultados no se construye.
+
+        """
+        if not has_more:
+            self.last_search = None
+            return SearchPage(serialized, None)
+
+        if not isinstance(search, AsyncSearch):
+            search = search()
+        self.last_search = search
+        return SearchPage(serialized, self._cursor(search))
+
+    def _cached_product_page(
+        self, search: Union[AsyncSearch, Callable[[], AsyncSearch]], cached
+    ) -> SearchPage:
+        """Restaura una página cacheada por :meth:`_product_page`."""
+        serialized, has_more = cached
+        return self._product_result(serialized, has_more, search)
+
+    def _product_page(  # pylint: disable=too-many-arguments
+        self,
+        response: Union[Response, dict],
+        search: Union[AsyncSearch, Callable[[], AsyncSearch]],
+        search_size: int,
+        include_meta: bool,
+        cache_key=None,
+    ) -> SearchPage:
+        """Serializa la respuesta de :meth:`_product_search`.
+
+        Recorta el resultado extra pedido y, si es que hay más resultados
+        que mostrar, agrega el cursor para verlos con :meth:`see_more`.
+
+        """
+        serialized = self.serialize(response, include_meta=include_meta)
+
+        has_more = len(serialized) > search_size
+        serialized = serialized[:search_size]
+
+        self._to_cache(cache_key, (serialized, has_more))
+
+        return self._product_result(serialized, has_more, search)
+
+    async def _search_product(  # pylint: disable=too-many-arguments
+        self,
+        text: str,
+        search_operator: str,
+        search_size: int = 5,
+        rut_proveedor_: Optional[Union[int, List[int]]] = None,
+        includes: Optional[List[str]] = None,
+        excludes: Optional[List[str]] = None,
+        include_meta=False,
+    ) -> List[dict]:
+        """Busca un Sku dado un texto.
+
+        Busca en los campos `descripcion corta` y `sku` de
+        :class:~`laholio.schemas.Sku` por texto, dándole mayor peso
+        al campo `sku`. Esto significa si en la búsqueda viaja el código
+        sku del proveedor, entonces debería mostrarse como en primera
+        opción dicho sku.
+
+        Args:
+            text : Texto de búsqueda
+            rut_proveedor_: rut o lista de
+            ruts para realizar filtro por proveedores. Se considera este
+            argumento como el rut del proveedor sin el digito verificador,
+            tratado como entero. e.g: '96885880-7' -> 96885880.
+            include_meta : Si es True, muestra los meta fields
+            de los matches.
+
+            Los demás argumentos corresponden a los argumentos de
+                :func: `~laholio.crud.SkuSearch.construct_multi_field_search`
+
+        Returns:
+            Lista serializada de productos encontrados. Si no hay
+            matches retorna una lista vacía. Ver
+            :class:`~laholio.utils.cursor.SearchPage`.
+
+        """
+        args = (
+            text,
+            search_operator,
+            search_size,
+            rut_proveedor_,
+            includes,
+            excludes,
+        )
+
+        search = partial(self._product_search, *args)
+
+        cache_key = self._product_key(*args, include_meta=include_meta)
+        cached = self._from_cache(cache_key)
+        if cached is not MISSING:
+            return self._cached_product_page(search, cached)
+
+        filter_path = self._filter_path(include_meta)
+
+        response = await self._search_template(
+            SKU_SEARCH,
+            self._product_params(*args),
+            filter_path=filter_path,
+            **self._routing_params(rut_proveedor_),
+        )
+        if response is None:
+            search = search()
+            response = await search.params(
+                filter_path=filter_path
+            ).execute_raw()
+
+        return self._product_page(
+            response, search, search_size, include_meta, cache_key
+        )
+
+    async def search_product(self, text, **kwargs):
+
+        """Busqueda de sku dado un texto.
+
+        Se hace una búsqueda con la siguiente lógica. De manera asincrónica
+        se consulta a elasticsearch usando la función
+        :func:`~laholio.crud.SkuSearch._search_product` con operadores
+        de nexo entre tokens `and` y `or`, y además se
+        realiza sugerencia con :func:`~laholio.crud.SkuSearch.suggest_product`.
+
+        Las tareas están siendo controladas por
+        :class: `~laholio.utils.async_dsl.AsyncTasks`, en la cual las tareas
+        se ejecutan de manera asincrona, pero tienen prioridades, es decir,
+        se retorna el resultado de la tarea exitosa ordenada por prioridad, y
+        las restantes son canceladas. El orden de este método es buscar con
+        prioridad 1 usando `and`, prioridad 2 usando `or` y prioridad 3 la
+        sugerencia.
+
+        Si el buscador se creó con `multi_search=True`, las mismas tres
+        consultas viajan en un único `_msearch`. Ver
+        :meth:`~laholio.crud.SkuSearch._search_product_multi`.
+
+        """
+
+        if self.multi_search:
+            return await self._search_product_multi(text, **kwargs)
+
+        result = await AsyncTasks.quickexit(
+            lambda r: bool(r),  # pylint: disable=unnecessary-lambda
+            self._search_product(text, search_operator="and", **kwargs),
+            self._search_product(text, search_operator="or", **kwargs),
+            self.suggest_product(text, **kwargs),
+        )
+
+        return result
+
+    async def _search_product_multi(self, text, **kwargs):
+        """Versión de :meth:`search_product` en un único `_msearch`.
+
+        Las búsquedas `and` y `or` y la sugerencia sobre
+        `descripcion_corta_` viajan en el mismo request y se respeta la
+        misma prioridad: se retorna el primer resultado no vacío. Solo si
+        ambas búsquedas vienen vacías y hay una corrección, se hace un
+        segundo request buscando con `or` el texto corregido.
+
+        """
+        search_size = kwargs.get("search_size", 5)
+        include_meta = kwargs.pop("include_meta", False)
+        operators = ("and", "or")
+
+        searches = [
+            self._product_search(text, operator, **kwargs)
+            for operator in operators
+        ]
+        keys = [
+            self._product_key(
+                text, operator, include_meta=include_meta, **kwargs
+            )
+            for operator in operators
+        ]
+
+        for search, key in zip(searches, keys):
+            cached = self._from_cache(key)
+            if cached is MISSING:
+                break
+            serialized = self._cached_product_page(search, cached)
+            if serialized:
+                return serialized
+        else:
+            return await self.suggest_product(
+                text, include_meta=include_meta, **kwargs
+            )
+
+        suggestion_args = (text, *self.PRODUCT_SUGGESTION)
+
+        # La tercera búsqueda es la corrección local, si hay, o la de ES.
+        # Las llaves se marcan antes de consultar, ver `SearchResultCache`
+        corrected = self._correct(text)
+        if corrected is not None:
+            suggest_search = self._product_search(corrected, "or", **kwargs)
+            suggest_key = self._product_key(
+                corrected, "or", include_meta=include_meta, **kwargs
+            )
+        elif self.collate_suggest:
+            collated, suggest_search = self._collated_search(text, **kwargs)
+            suggest_key = self._product_key(
+                text, "collate", include_meta=include_meta, **kwargs
+            )
+        else:
+            suggest_search = self._suggest_search(*suggestion_args).extra(
+                size=0
+            )
+            suggest_key = self._suggest_key(*suggestion_args)
+
+        multi_search = AsyncMultiSearch(
+            using=self.connection, index=self.index_name
+        )
+        for search in searches:
+            multi_search = multi_search.add(search)
+        multi_search = multi_search.add(suggest_search)
+
+        # Solo se levanta el error de una búsqueda que se llega a usar
+        *responses, suggest_response = await multi_search.execute()
+        checked = AsyncMultiSearch.raise_for_error
+
+        for search, response, key in zip(searches, responses, keys):
+            serialized = self._product_page(
+                checked(response), search, search_size, include_meta, key
+            )
+            if serialized:
+                return serialized
+
+        if corrected is not None:
+            return self._product_page(
+                checked(suggest_response),
+                suggest_search,
+                search_size,
+                include_meta,
+                suggest_key,
+            )
+
+        if self.collate_suggest:
+            return self._collated_page(
+                checked(suggest_response),
+                collated,
+                search_size,
+                include_meta,
+                suggest_key,
+            )
+
+        suggested_text = self._suggestion_texts(
+            checked(suggest_response), self.PRODUCT_SUGGESTION[-1]
+        )
+        self._to_cache(suggest_key, suggested_text)
+
+        if suggested_text:
+            return await self._search_product(
+                suggested_text[0],
+                search_operator="or",
+                include_meta=include_meta,
+                **kwargs,
+            )
+        return list()
+
+    async def search_products_many(
+        self,
+        texts: Iterable[str],
+        rut_proveedor_: Optional[Union[int, List[int]]] = None,
+        concurrency: int = 4,
+        chunk_size: int = 100,
+        return_exceptions: bool = False,
+        **kwargs,
+    ) -> List[Union[List[dict], TransportError]]:
+        """Búsqueda en lote de skus dada una lista de textos.
+
+        Aplica a cada texto la misma lógica de :meth:`search_product`
+        (`and`, luego `or`, luego la sugerencia), pero agrupando los textos
+        en requests `_msearch` de `chunk_size` textos. Se ejecutan a lo más
+        `concurrency` requests a la vez.
+
+        Args:
+            texts: Textos de búsqueda.
+            rut_proveedor_: rut o lista de ruts para filtrar por proveedor.
+            concurrency: Máximo de requests `_msearch` en vuelo.
+            chunk_size: Textos por request `_msearch`.
+            return_exceptions: Si es `True`, el texto cuya búsqueda falla
+                lleva su :class:`TransportError` en vez de resultados y los
+                demás textos no se ven afectados. Si no, se levanta el
+                error del primer texto que falla. En ambos casos, solo
+                cuenta el error de una búsqueda que se llega a usar.
+
+            Los demás kwargs corresponden a los de
+                :meth:`~laholio.crud.SkuSearch._search_product`.
+
+        Returns:
+            Una lista de resultados por texto, en el orden de entrada. Con
+            `return_exceptions`, los textos que fallan llevan su error.
+
+        """
+        if concurrency < 1 or chunk_size < 1:
+            raise ValueError("`concurrency` y `chunk_size` deben ser >= 1")
+
+        texts = list(texts)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run(chunk):
+            async with semaphore:
+                return await self._search_products_chunk(
+                    chunk, rut_proveedor_=rut_proveedor_, **kwargs
+                )
+
+        chunks = await asyncio.gather(
+            *(
+                run(texts[start : start + chunk_size])  # noqa: E203
+                for start in range(0, len(texts), chunk_size)
+            )
+        )
+
+        results = [result for chunk in chunks for result in chunk]
+        if not return_exceptions:
+            for result in results:
+                AsyncMultiSearch.raise_for_error(result)
+        return results
+
+    async def _search_products_chunk(
+        self, texts: List[str], include_meta=False, **kwargs
+    ) -> List[Union[List[dict], TransportError]]:
+        """Resuelve un lote de :meth:`search_products_many`.
+
+        Un primer `_msearch` lleva, por texto, las búsquedas `and` y `or`
+        y la sugerencia. Un segundo `_msearch`, solo si hace falta, busca
+        con `or` los textos corregidos de los que no tuvieron resultados.
+
+        Si una búsqueda que se usa falla, el texto lleva el error en vez
+        de resultados, sin afectar a los demás textos del lote.
+
+        """
+        search_size = kwargs.get("search_size", 5)
+
+        def page(response):
+            response = AsyncMultiSearch.raise_for_error(response)
+            serialized = self.serialize(response, include_meta=include_meta)
+            return serialized[:search_size]
+
+        multi_search = AsyncMultiSearch(
+            using=self.connection, index=self.index_name
+        )
+        for text in texts:
+            for operator in ("and", "or"):
+                multi_search = multi_search.add(
+                    self._product_search(text, operator, **kwargs)
+                )
+            multi_search = multi_search.add(
+                self._suggest_search(text, *self.PRODUCT_SUGGESTION).extra(
+                    size=0
+                )
+            )
+
+        responses = await multi_search.execute()
+
+        results: List[Union[List[dict], TransportError]] = []
+        corrections: List[Tuple[int, str]] = []
+        for position in range(len(texts)):
+            and_response, or_response, suggest_response = responses[
+                3 * position : 3 * position + 3  # noqa: E203
+            ]
+            try:
+                serialized = page(and_response) or page(or_response)
+                if not serialized:
+                    suggested_text = self._suggestion_texts(
+                        AsyncMultiSearch.raise_for_error(suggest_response),
+                        self.PRODUCT_SUGGESTION[-1],
+                    )
+                    if suggested_text:
+                        corrections.append((position, suggested_text[0]))
+            except TransportError as exc:
+                serialized = exc
+            results.append(serialized)
+
+        if corrections:
+            multi_search = AsyncMultiSearch(
+                using=self.connection, index=self.index_name
+            )
+            for _, suggested_text in corrections:
+                multi_search = multi_search.add(
+                    self._product_search(suggested_text, "or", **kwargs)
+                )
+
+            responses = await multi_search.execute()
+
+            for (position, _), response in zip(corrections, responses):
+                try:
+                    results[position] = page(response)
+                except TransportError as exc:
+                    results[position] = exc
+
+        return results
+
+    async def suggest_product(self, text, **kwargs):
+        """Sugerencia de sku, dado un texto.
+
+        Este método hace dos consultas. Primero, dado el texto, intenta
+        corregirlo (si necesita ser corregido), si el texto fue corregido,
+        realiza la query usando :meth:`laholio.crud.SkuSearch._search_product`
+
+        Kwargs:
+            corresponden a los kwargs
+                :meth:~`laholio.crud.BaseAsyncSearch.suggest`
+
+        Si el buscador tiene :attr:`corrector` y este corrige el texto,
+        no se consulta el suggester de ES.
+
+        """
+
+        corrected = self._correct(text)
+        if corrected is not None:
+            return await self._search_product(
+                corrected, search_operator="or", **kwargs
+            )
+
+        if self.collate_suggest:
+            return await self._suggest_product_collated(text, **kwargs)
+
+        suggested_text = await self.suggest(text, *self.PRODUCT_SUGGESTION)
+
+        if suggested_text:
+            return await self._search_product(
                 suggested_text[0], search_operator="or", **kwargs
             )
-        return list()
+        return list()
+
+    def _correct(self, text: str) -> Optional[str]:
+        """Corrección de `text` con :attr:`corrector`, si es que hay."""
+        if self.corrector is None:
+            return None
+        return self.corrector.correct(text)
+
+    async def load_corrector(
+        self, field: str = "descripcion_corta", slices: int = 1, **kwargs
+    ) -> SymSpell:
+        """Construye el corrector local recorriendo todo el índice.
+
+        El corrector queda en :attr:`corrector`. Para mantenerlo al día
+        con las escrituras del proceso, registrar su listener en el
+        insertador::
+
+            corrector = await searcher.load_corrector()
+            inserter.add_listener(corrector.bulk_listener("descripcion_corta"))
+
+        Args:
+            field: Campo de donde se obtiene el vocabulario.
+            slices: Ver :meth:`laholio.utils.async_dsl.AsyncSearch.scan`.
+            kwargs: Parámetros de :class:`~laholio.utils.spelling.SymSpell`.
+
+        """
+        corrector = SymSpell(**kwargs)
+
+        search = self.search_base.source(includes=[field])
+        async for hit in search.scan(slices=slices):
+            text = getattr(hit, field, None)
+            if text:
+                corrector.add_text(text)
+
+        logger.info("Corrector cargado", palabras=len(corrector))
+
+        self.corrector = corrector
+        self.corrector_field = field
+        return corrector
+
+    async def complete_sku(
+        self,
+        prefix: str,
+        rut_proveedor_: Optional[Union[int, List[int]]] = None,
+        size: int = 10,
+    ) -> List[dict]:
+        """Autocompletado de códigos sku.
+
+        Si el buscador tiene :attr:`sku_index` y `prefix` es un código (una
+        sola palabra), se responde desde el índice local sin consultar el
+        cluster. En otro caso se busca en el campo `sku`.
+
+        Args:
+            prefix: Prefijo del `sku` o del `sku_fabricante`.
+            rut_proveedor_: Rut o ruts por los que filtrar.
+            size: Máximo de resultados.
+
+        Returns:
+            Lista de `{"sku_id", "sku", "rut_proveedor_"}`.
+
+        """
+        if self.sku_index is not None and self.sku_index.is_code(prefix):
+            return self.sku_index.complete(prefix, rut_proveedor_, size)
+
+        search = self.search_base
+        if rut_proveedor_:
+            search = self._filter_brand(search, rut_proveedor_)
+
+        search = search.query(  # pylint: disable=no-member
+            "multi_match", query=prefix, fields=["sku", "sku_fabricante"]
+        ).source(includes=["sku_id", "sku", "rut_proveedor_"])[:size]
+
+        response = await search.params(
+            filter_path=self._filter_path(False)
+        ).execute_raw()
+
+        return self.serialize(response=response, include_meta=False)
+
+    async def load_sku_index(self, slices: int = 1) -> SkuPrefixIndex:
+        """Construye el índice de prefijos recorriendo todo el índice.
+
+        El índice queda en :attr:`sku_index`. Para mantenerlo al día con
+        las escrituras del proceso, registrar su listener en el
+        insertador::
+
+            sku_index = await searcher.load_sku_index()
+            inserter.add_listener(sku_index.bulk_listener)
+
+        Args:
+            slices: Ver :meth:`laholio.utils.async_dsl.AsyncSearch.scan`.
+
+        """
+        fields = ["sku_id", "sku", "sku_fabricante", "rut_proveedor_"]
+        documents = []
+
+        search = self.search_base.source(includes=fields)
+        async for hit in search.scan(slices=slices):
+            document = hit.to_dict()
+            if document.get("sku") and "rut_proveedor_" in document:
+                document.setdefault("sku_id", hit.meta.id)
+                documents.append(document)
+
+        sku_index = SkuPrefixIndex()
+        sku_index.add_many(documents)
+
+        logger.info("Índice de prefijos sku cargado", **sku_index.stats())
+
+        self.sku_index = sku_index
+        return sku_index
+
+    def _fresh_sku_filter(self) -> Optional[BloomFilter]:
+        """:attr:`sku_filter`, si se puede confiar en lo que descarta.
+
+        Si el archivo del filtro (ver :meth:`BloomFilter.open`) fue
+        reemplazado por uno nuevo, primero se abre el nuevo.
+
+        """
+        sku_filter = self.sku_filter
+        if sku_filter is None or self.sku_filter_max_age is None:
+            return None
+        if sku_filter.changed():
+            sku_filter = self.sku_filter = BloomFilter.open(sku_filter.path)
+            logger.info(
+                "Filtro de skus recargado",
+                skus=len(sku_filter),
+                path=sku_filter.path,
+            )
+        if sku_filter.age() > self.sku_filter_max_age:
+            return None
+        return sku_filter
+
+    def sku_filter_listener(self, action: dict):
+        """Listener del insertador para el :attr:`sku_filter` vigente.
+
+        Ver :meth:`laholio.utils.bloom.BloomFilter.bulk_listener`.
+
+        """
+        if self.sku_filter is not None:
+            self.sku_filter.bulk_listener(action)
+
+    async def load_sku_filter(
+        self, error_rate: float = 0.01, headroom: float = 1.5, slices: int = 1
+    ) -> BloomFilter:
+        """Construye el filtro de Bloom recorriendo los `_id` del índice.
+
+        El filtro queda en :attr:`sku_filter`, con fecha de creación
+        anterior al recorrido. Para compartirlo entre procesos, guardarlo
+        y abrirlo en cada uno; un proceso periódico lo reconstruye y lo
+        guarda en el mismo archivo, y cada buscador abre la nueva versión
+        en su siguiente :meth:`get_skus`::
+
+            sku_filter = await searcher.load_sku_filter()
+            sku_filter.save("/var/lib/laholio/skus.bloom")
+
+            searcher = SkuSearch(
+                connection,
+                sku_filter=BloomFilter.open("/var/lib/laholio/skus.bloom"),
+                sku_filter_max_age=600,  # se reconstruye cada 5 minutos
+            )
+            inserter.add_listener(searcher.sku_filter_listener)
+
+        `sku_filter_max_age` debe ser mayor que el período de
+        reconstrucción más lo que esta toma: un filtro más antiguo no
+        descarta códigos.
+
+        Args:
+            error_rate: Tasa de falsos positivos del filtro.
+            headroom: Capacidad del filtro sobre el número actual de
+                documentos, para los que se agreguen luego.
+            slices: Ver :meth:`laholio.utils.async_dsl.AsyncSearch.scan`.
+
+        """
+        search = self.search_base.source(False)
+
+        count = await search.count()
+        sku_filter = BloomFilter(
+            max(int(count * headroom), 1), error_rate=error_rate
+        )
+
+        async for hit in search.scan(slices=slices):
+            sku_filter.add(hit.meta.id)
+
+        logger.info(
+            "Filtro de skus cargado",
+            skus=len(sku_filter),
+            nbytes=sku_filter.nbytes(),
+        )
+
+        self.sku_filter = sku_filter
+        return sku_filter
+
+    async def reload_local_indexes(self, slices: int = 1):
+        """Reconstruye desde el cluster los índices locales que haya.
+
+        El :attr:`corrector`, el :attr:`sku_index` y el :attr:`sku_filter`
+        en memoria se construyen recorriendo el índice detrás del alias,
+        así que luego de moverlo (ver
+        :meth:`laholio.rebuild.CatalogRebuild.publish` y
+        :func:`laholio.rebuild.rollback`) describen la versión anterior.
+        Cada proceso debe llamar este método tras el cambio. Un
+        :attr:`sku_filter` abierto desde un archivo no se reconstruye
+        aquí: se recarga cuando el proceso que lo construye lo reemplaza.
+
+        Los listeners de los índices anteriores siguen escribiendo en
+        ellos; para que las escrituras lleguen a los recargados, registrar
+        :meth:`local_index_listener` en vez de los de cada índice.
+
+        Args:
+            slices: Ver :meth:`laholio.utils.async_dsl.AsyncSearch.scan`.
+
+        """
+        if self.corrector is not None:
+            await self.load_corrector(
+                self.corrector_field,
+                slices=slices,
+                max_edit_distance=self.corrector.max_edit_distance,
+                prefix_length=self.corrector.prefix_length,
+                min_length=self.corrector.min_length,
+            )
+        if self.sku_index is not None:
+            await self.load_sku_index(slices=slices)
+        if self.sku_filter is not None and self.sku_filter.path is None:
+            await self.load_sku_filter(slices=slices)
+
+    def local_index_listener(self, action: dict):
+        """Listener del insertador para los índices locales vigentes.
+
+        Actualiza el :attr:`corrector`, el :attr:`sku_index` y el
+        :attr:`sku_filter` que tenga el buscador al momento de la
+        escritura, incluso si fueron recargados (ver
+        :meth:`reload_local_indexes`).
+
+        """
+        if self.corrector is not None:
+            self.corrector.bulk_listener(self.corrector_field)(action)
+        if self.sku_index is not None:
+            self.sku_index.bulk_listener(action)
+        self.sku_filter_listener(action)
+
+    async def _suggest_product_collated(  # pylint: disable=too-many-arguments
+        self,
+        text: str,
+        search_size: int = 5,
+        rut_proveedor_: Optional[Union[int, List[int]]] = None,
+        includes: Optional[List[str]] = None,
+        excludes: Optional[List[str]] = None,
+        include_meta: bool = False,
+    ) -> SearchPage:
+        """Versión de :meth:`suggest_product` en un solo request.
+
+        En vez de corregir el texto y luego buscar la corrección, se
+        busca el texto de manera difusa junto con la sugerencia con
+        `collate` (ver :meth:`_collated_search`). Los productos difieren
+        de los de buscar la corrección cuando la corrección cambia más
+        de lo que permite `fuzziness`.
+
+        """
+        args = (text, search_size, rut_proveedor_, includes, excludes)
+
+        search, collated = self._collated_search(*args)
+
+        cache_key = self._product_key(
+            text,
+            "collate",
+            search_size,
+            rut_proveedor_,
+            includes,
+            excludes,
+            include_meta=include_meta,
+        )
+        cached = self._from_cache(cache_key)
+        if cached is not MISSING:
+            return self._cached_product_page(search, cached)
+
+        response = await collated.params(
+            filter_path=self._filter_path(
+                include_meta, *self.COLLATE_FILTER_PATH
+            )
+        ).execute()
+
+        return self._collated_page(
+            response, search, search_size, include_meta, cache_key
+        )
 
-    async def _compaginated_search(  # pylint: disable=too-many-arguments
+    async def _compaginated_search(
         self,
         search: AsyncSearch,
         pag_size: int,
-        scroll_timeout: str = "1m",
-        scroll_kwargs: dict = None,
         include_meta: bool = False,
+        search_after: Optional[List] = None,
     ):
-        """Búsqueda compaginada usando la scroll API de ES.
+        """Búsqueda compaginada usando `search_after`.
 
-        Se encuentran todos los matches dada una query. En esta búsqueda
-        no importa el orden (meta field _score es ignorado). Ver más:
-            https://www.elastic.co/guide/en/elasticsearch/reference/current/search-request-body.html#request-body-search-scroll
+        Se encuentran todos los matches dada una query, ordenados por
+        `_score` y desempatados por `sku_id`. Ver más:
+            https://www.elastic.co/guide/en/elasticsearch/reference/6.8/search-request-search-after.html
 
         Args:
-            search: Búsqueda será ejecutada en la
-                        scroll API.
+            search: Búsqueda a paginar.
             pag_size : Número de resultados por pagina
-            scroll_timeout : Tiempo en que esta abierta
-                        el search context . Default "1m".
-            scroll_kwargs : Argumento scroll_kwargs
-                        de :func:`ElasticSearch.scroll`.
             include_meta : Si es `True`, metadatos incluidos en los resultados.
+            search_after: Posición desde la cual continuar.
 
         """
 
-        connection = self.connection
-        search = search.params(size=pag_size, scroll=scroll_timeout)
-        scroll_kwargs = scroll_kwargs or {}
-        is_first = True
-        scroll_id: str
-        try:
-            while True:
-                if is_first:
-                    response = await search.execute()
-                    is_first = False
-                else:
-                    response = await connection.scroll(
-                        body={
-                            "scroll_id": scroll_id,  # pylint: disable=used-before-assignment
-                            "scroll": scroll_timeout,
-                        },
-                        **scroll_kwargs,
-                    )
-                scroll_id = response["_scroll_id"]
-                serialized = self.serialize(response, include_meta)
-
-                if not serialized:
-                    break
-                yield serialized
+        search = self._page_search(search, pag_size, search_after)
 
-        finally:
-            await connection.clear_scroll(
-                body={"scroll_id": [scroll_id]}, ignore=(404,)
+        while True:
+            serialized, search_after = await self._fetch_page(
+                search, include_meta
             )
 
-    async def see_more(self, pag_size: int = 10, **kwargs):
-        """Búsqueda compaginada usando la última búsqueda registrada."""
-        # TODO: Levantar error para timeout -> más espefico e.g ScrollTimeOutEr
-        if not self.last_search:
+            if not serialized:
+                break
+            yield serialized
+
+            if len(serialized) < pag_size:
+                break
+            search = search.extra(search_after=search_after)
+
+    async def see_more(
+        self, pag_size: int = 10, cursor: Optional[str] = None, **kwargs
+    ):
+        """Búsqueda compaginada a partir de un cursor.
+
+        Args:
+            pag_size: Número de resultados por página.
+            cursor: Cursor de la página retornada por
+                :meth:`search_product` o :meth:`list_all`. Cualquier
+                instancia de :class:`SkuSearch` puede continuarlo.
+
+        Sin `cursor` se usa `last_search`, que solo es correcto si la
+        instancia no atiende búsquedas concurrentes. Se mantiene por
+        compatibilidad.
+
+        """
+        if cursor is not None:
+            search, search_after = self._search_from_cursor(cursor)
+        elif self.last_search:
+            search, search_after = self.last_search, None
+        else:
             raise ValueError("No hay más resultados que mostrar")
 
         async for results in self._compaginated_search(
-            self.last_search, pag_size, **kwargs
+            search, pag_size, search_after=search_after, **kwargs
         ):
             yield results
 
-    async def list_all(
+    async def list_all(  # pylint: disable=too-many-arguments
         self,
         *,
-        from_: int,
+        from_: int = 0,
         size: int,
         rut_proveedor_: Union[int, List[int]],
         includes: Optional[List[str]] = None,
         excludes: Optional[List[str]] = None,
         include_meta=False,
-    ):
+        keyset: bool = False,
+        after: Optional[str] = None,
+    ) -> SearchPage:
 
-        """Lista todos los sku."""
+        """Lista todos los sku.
+
+        Por defecto pagina con `from_` y `size`, cuyo costo crece con la
+        profundidad de la página y está acotado por
+        `index.max_result_window`.
+
+        En modo keyset (`keyset=True` o entregando `after`) los sku se
+        ordenan por `sku_id` y cada página continúa desde la llave
+        `after`, el `sku_id` del último sku de la página anterior. El costo
+        de cada página es constante sin importar su profundidad.
+
+        Args:
+            from_: Desplazamiento de la página. No se usa en modo keyset.
+            size: Tamaño de la página.
+            keyset: Pagina ordenando por `sku_id` en vez de por `from_`.
+            after: `sku_id` desde el cual continuar. Implica `keyset`.
+
+        Returns:
+            La página de skus. Si hay más resultados trae un cursor: en
+            modo keyset continúa desde el último sku retornado, en otro
+            caso recorre la búsqueda desde el inicio con :meth:`see_more`.
+            :meth:`see_more` sin cursor continúa igual que el cursor.
+
+        """
+
+        keyset = keyset or after is not None
+        if keyset and from_:
+            raise ValueError("`from_` no se usa en modo keyset")
 
         excludes = excludes or ["descripcion_corta_"]
+        args = (from_, size, rut_proveedor_, includes, excludes, keyset, after)
+
+        search = partial(self._list_all_search, *args)
+        filter_path = self._filter_path(
+            include_meta, *(["hits.hits.sort"] if keyset else [])
+        )
+
+        response = await self._search_template(
+            SKU_LIST_ALL,
+            self._list_all_params(*args),
+            filter_path=filter_path,
+            **self._routing_params(rut_proveedor_),
+        )
+        if response is None:
+            search = search()
+            response = await search.params(
+                filter_path=filter_path
+            ).execute_raw()
+
+        serialized = self.serialize(response, include_meta=include_meta)
+
+        has_more = len(serialized) > size
+        if not has_more:
+            self.last_search = None
+            return SearchPage(serialized, None)
+
+        if not isinstance(search, AsyncSearch):
+            search = search()
+        serialized = serialized[:size]
+
+        if keyset:
+            search_after = list(self._hits(response)[size - 1]["sort"])
+            # Desde el último sku retornado y no desde `after`
+            search = search.extra(search_after=search_after)
+            cursor = self._cursor(
+                self._page_search(search, size), search_after
+            )
+        else:
+            cursor = self._cursor(search)
+
+        self.last_search = search
+        return SearchPage(serialized, cursor)
+
+    def _list_all_params(  # pylint: disable=too-many-arguments
+        self,
+        from_: int,
+        size: int,
+        rut_proveedor_: Union[int, List[int]],
+        includes: Optional[List[str]],
+        excludes: List[str],
+        keyset: bool,
+        after: Optional[str],
+    ) -> dict:
+        """Parámetros de la plantilla equivalente a :meth:`_list_all_search`.
+
+        Ver :data:`~laholio.templates.SKU_LIST_ALL`.
+
+        """
+        return dict(
+            filter=provider_filter(rut_proveedor_),
+            includes=includes or [],
+            excludes=excludes,
+            keyset=keyset,
+            sort=[{self.TIEBREAKER: "asc"}],
+            after=after,
+            # Igual que el slice de `_list_all_search`
+            size=max(size + 1 - from_, 0),
+            **{"from": from_},
+        )
+
+    def _list_all_search(  # pylint: disable=too-many-arguments
+        self,
+        from_: int,
+        size: int,
+        rut_proveedor_: Union[int, List[int]],
+        includes: Optional[List[str]],
+        excludes: List[str],
+        keyset: bool,
+        after: Optional[str],
+    ) -> AsyncSearch:
+        """Construye la búsqueda de :meth:`list_all`."""
         search_base = self.search_base
 
         if search_base._using is None:
@@ -510,23 +1922,23 @@ class SkuSearch(BaseAsyncSearch):
         if search_base._index is None:
             raise NotUsingIndex
 
-        search = self._filter_brand(search_base, rut_proveedor_)
+        search = search_base
+        if rut_proveedor_ is not None:
+            search = self._filter_brand(search, rut_proveedor_)
         search = search.source(includes=includes, excludes=excludes)
+        search = search.query(Q("match_all"))
 
-        search = search.query(Q("match_all"))[from_ : size + 1]  # noqa: E203
-
-        logger.info("Query", query=search.to_dict())
-
-        response = await search.execute()
-        serialized = self.serialize(response, include_meta=include_meta)
-
-        if len(serialized) > size:
-            self.last_search = search
-            serialized = serialized[:size]
+        if keyset:
+            search = search.sort({self.TIEBREAKER: "asc"})[: size + 1]
+            if after is not None:
+                search = search.extra(search_after=[after])
         else:
-            self.last_search = None
+            # Nunca un `size` negativo, que ES toma como el por defecto
+            search = search[from_ : max(size + 1, from_)]  # noqa: E203
 
-        return serialized
+        QUERY_LOG.log("list_all", search.to_dict)
+
+        return search
 
 
 class CatalogoUploadSearch(BaseAsyncSearch):
@@ -548,7 +1960,9 @@ class CatalogoUploadSearch(BaseAsyncSearch):
         search = self.search_base
         search = search.query("match", **{field_name: field_value})
 
-        response = await search.execute()
+        response = await search.params(
+            filter_path=self._filter_path(include_meta)
+        ).execute_raw()
 
         serialized = self.serialize(
             response=response, include_meta=include_meta
@@ -558,7 +1972,96 @@ class CatalogoUploadSearch(BaseAsyncSearch):
 
 
 class BulkInsertUpdateDelete(Base):
-    """Clase para insertador documentos en elasticSearch."""
+    """Clase para insertador documentos en elasticSearch.
+
+    Args:
+        connection: Conexión sincrónica a ES.
+        index_name: Índice en el que se escribe.
+        listeners: Funciones que reciben cada acción enviada en
+            :meth:`bulk_request`. Ver :meth:`add_listener`.
+
+    """
+
+    BULK_LOAD_SETTINGS = {
+        "index.refresh_interval": "-1",
+        "index.number_of_replicas": "0",
+        "index.translog.durability": "async",
+        "index.translog.flush_threshold_size": "1gb",
+    }
+    """Settings del índice durante :meth:`bulk_load_mode`."""
+
+    BULK_LOAD_META = "laholio_bulk_load"
+    """Llave del `_meta` del mapping con los settings previos a la carga."""
+
+    FORCE_MERGE_TIMEOUT = 3600
+    """Segundos que se espera el force merge al terminar una carga."""
+
+    MAX_CHUNK_BYTES = 10 * 1024 * 1024
+    """Bytes máximos de cada request de la bulk API.
+
+    Los chunks se cortan por número de documentos o por bytes, lo que
+    ocurra primero, de manera que los documentos con `atributos` o
+    `descripcion_larga` grandes no generen requests de cientos de MB.
+
+    """
+
+    def __init__(
+        self,
+        connection: Elasticsearch,
+        index_name: str,
+        listeners: Optional[Iterable[Callable[[dict], None]]] = None,
+    ):
+        super().__init__(connection, index_name)
+        self.listeners: List[Callable[[dict], None]] = list(listeners or [])
+
+    def add_listener(self, listener: Callable[[dict], None]):
+        """Registra `listener`, que recibe cada acción de la bulk API.
+
+        Las acciones son los diccionarios que se envían, con el documento
+        en `_source` (o en `doc` si es un `update`). Se llama a los
+        listeners a medida que las acciones se envían, sin importar si
+        luego ES las rechaza.
+
+        """
+        self.listeners.append(listener)
+
+    @staticmethod
+    def _notify(objects: Iterable[dict], listeners: List[Callable]):
+        """Entrega cada acción a los `listeners` a medida que pasa."""
+        for action in objects:
+            for listener in listeners:
+                listener(action)
+            yield action
+
+    @staticmethod
+    def _with_routing(action: dict) -> dict:
+        """Agrega a la acción el routing por `rut_proveedor_`, si corresponde.
+
+        Ver :meth:`laholio.schemas.Sku.build_routing`. Un `delete` o un
+        `update` parcial sin `rut_proveedor_` se rutea según su `_id` (ver
+        :meth:`laholio.schemas.Sku.routing_from_id`); sin esto el cluster
+        lo rechaza, pues el mapping exige routing. Las acciones que ya
+        traen `_routing`, o sin `rut_proveedor_` (e.g. de otros índices),
+        quedan igual.
+
+        """
+        if "_routing" in action:
+            return action
+
+        source = action.get("_source", action.get("doc"))
+        rut_proveedor_ = (
+            source.get("rut_proveedor_") if isinstance(source, dict) else None
+        )
+        if rut_proveedor_ is not None:
+            routing = Sku.build_routing(rut_proveedor_)
+        elif action.get("_op_type") in ("update", "delete"):
+            routing = Sku.routing_from_id(action.get("_id"))
+        else:
+            routing = None
+
+        if routing is not None:
+            action["_routing"] = routing
+        return action
 
     @staticmethod
     def prepare_bulk_dsl(
@@ -607,7 +2110,7 @@ class BulkInsertUpdateDelete(Base):
             document = conversor(document)
             document["_op_type"] = op_type
             make_body(document)
-            yield document
+            yield BulkInsertUpdateDelete._with_routing(document)
 
     def prepare_bulk_raw(
         self, documents: Iterable[dict], op_type: str, with_ids: bool
@@ -621,12 +2124,20 @@ class BulkInsertUpdateDelete(Base):
 
                 document = {"_id": AlgunValor, "_source": source}
 
+                Un `delete` no requiere `_source`. El documento puede traer
+                su `_routing`; si no, se calcula (ver :meth:`_with_routing`).
+
             En otro caso:
 
                 El documento solo corresponde al diccionario source
 
                 document = source
 
+                También se acepta `{"_source": source}`, sin `_id`.
+
+        Ver :func:`laholio.utils.ndjson.split_document`, que también usa
+        :class:`~laholio.utils.ndjson.BulkEncoder`.
+
         Args:
             documents: Iterable/Generador de documentos con el formato descrito
                 anteriormente.
@@ -646,39 +2157,54 @@ class BulkInsertUpdateDelete(Base):
         source_key = "doc" if op_type == "update" else "_source"
 
         def body(document):
-            return {
+            _id, source = split_document(document, op_type, with_ids)
+            action = {
                 "_index": self.index_name,
-                source_key: document["_source"],
-                "_optype": op_type,
+                source_key: source,
+                "_op_type": op_type,
                 "_type": "doc",
             }
+            if with_ids:
+                action["_id"] = _id
+                if "_routing" in document:
+                    action["_routing"] = document["_routing"]
+            return action
+
+        for document in documents:
+            yield self._with_routing(body(document))
 
-        def body_id(document):
-            return {**body(document), "_id": document["_id"]}
+    @staticmethod
+    def _track_providers(objects: Iterable[dict], providers: set):
+        """Registra en `providers` el rut de cada acción que pasa.
 
-        make_body = body_id if with_ids else body
+        Se agrega `None` cuando la acción no permite saber el proveedor
+        (por ejemplo, un `delete` sin `_source`), lo que obliga a invalidar
+        el índice completo en :mod:`laholio.utils.cache`.
 
-        for document in documents:
-            document = make_body(document)
-            yield document
+        """
+        for action in objects:
+            source = action.get("_source", action.get("doc"))
+            providers.add(
+                source.get("rut_proveedor_")
+                if isinstance(source, dict)
+                else None
+            )
+            yield action
 
-    def bulk_request(
+    def _prepare_actions(
         self,
         documents: Union[Iterable[Document], Iterable[dict]],
-        document_type: str = "dsl",
-        op_type: str = "index",
-        with_ids: bool = True,
-        **kwargs,
-    ):
-        """Inserta un iterable/generator de documentos en su Index.
+        document_type: str,
+        op_type: str,
+        with_ids: bool,
+        providers: set,
+    ) -> Iterable[dict]:
+        """Acciones de la bulk API para `documents`.
 
-        Args:
-            documents: Documentos a insertar
-            document_type: `dsl` sin los documentos son instancias de
-                `Document` o `raw` si son diccionarios puros.
+        Registra en `providers` los ruts escritos y entrega cada acción a
+        los listeners. Ver :meth:`bulk_request`.
 
         """
-        logger.info("Enviando bulk request en el iterable/generator")
         if document_type not in ("raw", "dsl"):
             raise ValueError("`document_type` puede ser `raw` o `dsl`")
 
@@ -692,23 +2218,44 @@ class BulkInsertUpdateDelete(Base):
                 documents, op_type=op_type, with_ids=with_ids
             )
 
-        _kwargs = dict(
-            client=self.connection,
-            actions=objects,
-            raise_on_exception=False,
-            raise_on_error=False,
-            stats_only=False,
-        )
+        objects = self._track_providers(objects, providers)
+        if self.listeners:
+            objects = self._notify(objects, self.listeners)
 
-        _kwargs.update(**kwargs)
+        return objects
+
+    def _parallel_bulk(
+        self, objects: Iterable[dict], thread_count: int, **kwargs
+    ) -> Tuple[int, List[dict]]:
+        """Envía `objects` con :func:`elasticsearch.helpers.parallel_bulk`.
+
+        Returns:
+            Los documentos exitosos y la lista de fallas.
 
-        res_succ, res_err = bulk(**_kwargs)
+        """
+        res_succ, res_err = 0, []
+        for ok, item in parallel_bulk(
+            self.connection, objects, thread_count=thread_count, **kwargs
+        ):
+            if ok:
+                res_succ += 1
+            else:
+                res_err.append(item)
+        return res_succ, helpers_failures(res_err)
 
+    @staticmethod
+    def _log_result(
+        op_type: str, res_succ: int, res_err: List[dict], elapsed: float
+    ):
+        """Registra el resultado y el throughput de una bulk request."""
+        total = res_succ + len(res_err)
         logger.info(
             "Enviada la bulk request.",
             tipo=op_type,
             total_exitosos=res_succ,
             total_fallados=res_err,
+            segundos=round(elapsed, 3),
+            documentos_por_segundo=round(total / elapsed) if elapsed else None,
         )
 
         for res in res_err:
@@ -719,3 +2266,371 @@ class BulkInsertUpdateDelete(Base):
                     "LAHOLIO.EXCEPTION": str(res),
                 },
             )
+
+    def bulk_request(
+        self,
+        documents: Union[Iterable[Document], Iterable[dict]],
+        document_type: str = "dsl",
+        op_type: str = "index",
+        with_ids: bool = True,
+        thread_count: int = 1,
+        adaptive: Optional[AdaptiveChunking] = None,
+        max_retries: int = 0,
+        **kwargs,
+    ) -> Tuple[int, List[dict]]:
+        """Inserta un iterable/generator de documentos en su Index.
+
+        Args:
+            documents: Documentos a insertar
+            document_type: `dsl` sin los documentos son instancias de
+                `Document` o `raw` si son diccionarios puros.
+            thread_count: Si es mayor a 1, los chunks se envían en
+                paralelo desde un pool de `thread_count` threads. El pool
+                de conexiones del cliente (`maxsize`, 10 por defecto)
+                debe ser al menos de ese tamaño.
+            adaptive: Si se entrega, ajusta el tamaño de los chunks y las
+                requests en vuelo (hasta `thread_count`) según la latencia
+                y los rechazos del cluster. Ver
+                :class:`~laholio.utils.adaptive_bulk.AdaptiveChunking`.
+            max_retries: Reintentos, con backoff exponencial con jitter,
+                de los documentos rechazados con status 429.
+            kwargs: Ver :func:`elasticsearch.helpers.bulk` (e.g.
+                `chunk_size`) y, con `adaptive` o `max_retries`,
+                :func:`~laholio.utils.adaptive_bulk.adaptive_bulk` (e.g.
+                `initial_backoff`). `max_chunk_bytes` es por defecto
+                :attr:`MAX_CHUNK_BYTES`.
+
+        Al terminar se invalidan, para los proveedores escritos, los
+        cachés de resultados del proceso (ver
+        :class:`~laholio.utils.cache.SearchResultCache`).
+
+        Returns:
+            El número de acciones exitosas y la lista de fallas
+            definitivas, una por documento (ver
+            :func:`~laholio.utils.adaptive_bulk.failure`).
+
+        """
+        logger.info("Enviando bulk request en el iterable/generator")
+
+        providers: set = set()
+        objects = self._prepare_actions(
+            documents, document_type, op_type, with_ids, providers
+        )
+
+        _kwargs = dict(max_chunk_bytes=self.MAX_CHUNK_BYTES)
+        if adaptive is None and not max_retries:
+            _kwargs.update(raise_on_exception=False, raise_on_error=False)
+
+        _kwargs.update(**kwargs)
+
+        start = time.perf_counter()
+        try:
+            if adaptive is not None or max_retries:
+                res_succ, res_err = adaptive_bulk(
+                    self.connection,
+                    objects,
+                    thread_count=thread_count,
+                    controller=adaptive,
+                    max_retries=max_retries,
+                    **_kwargs,
+                )
+            elif thread_count > 1:
+                res_succ, res_err = self._parallel_bulk(
+                    objects, thread_count, **_kwargs
+                )
+            else:
+                _kwargs.setdefault("stats_only", False)
+                res_succ, res_err = bulk(self.connection, objects, **_kwargs)
+                res_err = helpers_failures(res_err)
+        finally:
+            result_cache.invalidate(
+                self.index_name, None if None in providers else providers
+            )
+
+        self._log_result(
+            op_type, res_succ, res_err, time.perf_counter() - start
+        )
+        return res_succ, res_err
+
+    def bulk_request_encoded(  # pylint: disable=too-many-arguments
+        self,
+        documents: Iterable[Union[dict, Sequence]],
+        op_type: str = "index",
+        with_ids: bool = True,
+        columns: Optional[Sequence[str]] = None,
+        id_column: Optional[str] = None,
+        fast_json: bool = False,
+        chunk_size: int = 500,
+        **kwargs,
+    ) -> Tuple[int, List[dict]]:
+        """Inserta diccionarios o filas codificándolos directo a NDJSON.
+
+        Evita los diccionarios de acción intermedios de
+        :meth:`bulk_request` y de `elasticsearch.helpers`. Ver
+        :class:`~laholio.utils.ndjson.BulkEncoder`, que recibe `op_type`,
+        `with_ids`, `columns`, `id_column` y `fast_json`. Se invalidan los
+        cachés y se notifica a los listeners igual que en
+        :meth:`bulk_request`.
+
+        Los errores de transporte se propagan.
+
+        Args:
+            documents: Documentos en el formato de :meth:`prepare_bulk_raw`
+                o, con `columns`, filas.
+            chunk_size: Máximo de documentos por request.
+            kwargs: Parámetros de `connection.bulk` (e.g. `refresh`).
+
+        Returns:
+            El número de acciones exitosas y la lista de fallas (ver
+            :func:`~laholio.utils.adaptive_bulk.failure`).
+
+        """
+        logger.info("Enviando bulk request codificada")
+
+        providers: set = set()
+        source_key = "doc" if op_type == "update" else "_source"
+
+        def on_document(_id, source):
+            providers.add(source.get("rut_proveedor_"))
+            if self.listeners:
+                action = {"_op_type": op_type, "_id": _id, source_key: source}
+                for listener in self.listeners:
+                    listener(action)
+
+        encoder = BulkEncoder(
+            self.index_name,
+            op_type=op_type,
+            with_ids=with_ids,
+            columns=columns,
+            id_column=id_column,
+            fast_json=fast_json,
+            chunk_size=chunk_size,
+            max_chunk_bytes=self.MAX_CHUNK_BYTES,
+            on_document=on_document,
+        )
+
+        res_succ, res_err = 0, []
+        start = time.perf_counter()
+        try:
+            for body, _ in encoder.chunks(documents):
+                response = self.connection.bulk(body, **kwargs)
+                for item_op_type, item in map(
+                    methodcaller("popitem"), response["items"]
+                ):
+                    if 200 <= item.get("status", 500) < 300:
+                        res_succ += 1
+                    else:
+                        res_err.append(failure(item_op_type, item, 1))
+        finally:
+            result_cache.invalidate(
+                self.index_name, None if None in providers else providers
+            )
+
+        self._log_result(
+            op_type, res_succ, res_err, time.perf_counter() - start
+        )
+        return res_succ, res_err
+
+    def _mapping_meta(self) -> dict:
+        """`_meta` del mapping del índice."""
+        response = self.connection.indices.get_mapping(index=self.index_name)
+        if len(response) != 1:
+            raise ValueError("La carga masiva requiere un solo índice")
+        [mapping] = response.values()
+        return dict(mapping["mappings"].get("doc", {}).get("_meta", {}))
+
+    def _put_mapping_meta(self, meta: dict):
+        """Reemplaza el `_meta` del mapping del índice."""
+        self.connection.indices.put_mapping(
+            index=self.index_name, doc_type="doc", body={"_meta": meta}
+        )
+
+    def start_bulk_load(self) -> dict:
+        """Prepara el índice para una carga masiva.
+
+        Aplica :attr:`BULK_LOAD_SETTINGS` (sin refresh, sin réplicas y con
+        el translog asíncrono), luego de guardar los settings actuales en
+        el `_meta` del mapping. Si ya había settings guardados, de una
+        carga que no terminó, se conservan esos.
+
+        Returns:
+            Los settings que se restaurarán al terminar.
+
+        """
+        meta = self._mapping_meta()
+        original = meta.get(self.BULK_LOAD_META)
+
+        if original is None:
+            response = self.connection.indices.get_settings(
+                index=self.index_name,
+                name=list(self.BULK_LOAD_SETTINGS),
+                include_defaults=True,
+                flat_settings=True,
+            )
+            [state] = response.values()
+            original = {
+                name: state["settings"].get(
+                    name, state.get("defaults", {}).get(name)
+                )
+                for name in self.BULK_LOAD_SETTINGS
+            }
+            self._put_mapping_meta({**meta, self.BULK_LOAD_META: original})
+
+        self.connection.indices.put_settings(
+            index=self.index_name, body=self.BULK_LOAD_SETTINGS
+        )
+        logger.info("Modo carga masiva", index=self.index_name, **original)
+        return original
+
+    def finish_bulk_load(
+        self, force_merge: bool = False, max_num_segments: int = 1
+    ) -> bool:
+        """Termina una carga masiva restaurando los settings guardados.
+
+        Luego hace un refresh y, si se pide, un force merge. Los settings
+        guardados se borran del `_meta` al final, de manera que si el
+        proceso se cae antes, se puede volver a llamar. Llamarlo al
+        partir después de una caída restaura el índice.
+
+        Args:
+            force_merge: Si es `True`, deja el índice en
+                `max_num_segments` segmentos.
+            max_num_segments: Ver `force_merge`.
+
+        Returns:
+            Si había una carga masiva que terminar.
+
+        """
+        meta = self._mapping_meta()
+        original = meta.pop(self.BULK_LOAD_META, None)
+        if original is None:
+            return False
+
+        self.connection.indices.put_settings(
+            index=self.index_name, body=original
+        )
+        self.connection.indices.refresh(index=self.index_name)
+        if force_merge:
+            self.connection.indices.forcemerge(
+                index=self.index_name,
+                max_num_segments=max_num_segments,
+                request_timeout=self.FORCE_MERGE_TIMEOUT,
+            )
+        self._put_mapping_meta(meta)
+
+        logger.info("Fin modo carga masiva", index=self.index_name)
+        return True
+
+    @contextmanager
+    def bulk_load_mode(
+        self, force_merge: bool = False, max_num_segments: int = 1
+    ):
+        """Context manager de una carga masiva.
+
+        Ver :meth:`start_bulk_load` y :meth:`finish_bulk_load`. Si la carga
+        falla, se restauran los settings sin force merge::
+
+            with inserter.bulk_load_mode(force_merge=True):
+                inserter.bulk_request(documents)
+
+        """
+        self.start_bulk_load()
+        try:
+            yield self
+        except BaseException:
+            self.finish_bulk_load()
+            raise
+        self.finish_bulk_load(
+            force_merge=force_merge, max_num_segments=max_num_segments
+        )
+
+
+class AsyncBulkInsertUpdateDelete(BulkInsertUpdateDelete):
+    """Insertador sobre una conexión asincrónica.
+
+    Igual a :class:`BulkInsertUpdateDelete`, pero :meth:`bulk_request` es
+    una corrutina que no bloquea el event loop. El modo carga masiva
+    (:meth:`bulk_load_mode`) requiere una conexión sincrónica.
+
+    Args:
+        connection: Conexión asincrónica a ES.
+
+    """
+
+    def __init__(self, connection: Elasticsearch, *args, **kwargs):
+        super().__init__(connection, *args, **kwargs)
+        if not isinstance(self.connection.transport, AsyncTransport):
+            raise NotAsyncEsConnection(connection=self.connection)
+
+    async def bulk_request(  # pylint: disable=invalid-overridden-method
+        self,
+        documents: Union[
+            Iterable[Document],
+            Iterable[dict],
+            AsyncIterable[Document],
+            AsyncIterable[dict],
+        ],
+        document_type: str = "dsl",
+        op_type: str = "index",
+        with_ids: bool = True,
+        chunk_size: int = 500,
+        concurrency: int = 4,
+        adaptive: Optional[AdaptiveChunking] = None,
+        max_retries: int = 0,
+        **kwargs,
+    ) -> Tuple[int, List[dict]]:
+        """Inserta documentos con hasta `concurrency` chunks en vuelo.
+
+        Ver :meth:`BulkInsertUpdateDelete.bulk_request`. Los documentos se
+        leen a medida que se liberan requests, por lo que `documents`
+        puede ser un generador asincrónico (e.g. de un archivo subido) sin
+        cargarlo completo en memoria.
+
+        Args:
+            chunk_size: Máximo de documentos por request.
+            concurrency: Máximo de requests en vuelo.
+            adaptive: Si se entrega, reemplaza `chunk_size` y
+                `concurrency`. Ver
+                :meth:`BulkInsertUpdateDelete.bulk_request`.
+            max_retries: Ver :meth:`BulkInsertUpdateDelete.bulk_request`.
+            kwargs: Ver :func:`laholio.utils.async_bulk.async_bulk`.
+
+        Returns:
+            El número de acciones exitosas y la lista de fallas.
+
+        """
+        logger.info("Enviando bulk request asincrónica")
+        if document_type not in ("raw", "dsl"):
+            raise ValueError("`document_type` puede ser `raw` o `dsl`")
+
+        providers: set = set()
+        objects = (
+            action
+            async for batch in batches(documents, chunk_size)
+            for action in self._prepare_actions(
+                batch, document_type, op_type, with_ids, providers
+            )
+        )
+
+        kwargs.setdefault("max_chunk_bytes", self.MAX_CHUNK_BYTES)
+
+        start = time.perf_counter()
+        try:
+            res_succ, res_err = await async_bulk(
+                self.connection,
+                objects,
+                chunk_size=chunk_size,
+                concurrency=concurrency,
+                controller=adaptive,
+                max_retries=max_retries,
+                **kwargs,
+            )
+        finally:
+            result_cache.invalidate(
+                self.index_name, None if None in providers else providers
+            )
+
+        self._log_result(
+            op_type, res_succ, res_err, time.perf_counter() - start
+        )
+        return res_succ, res_err
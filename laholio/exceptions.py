@@ -68,3 +68,24 @@ class NotAsyncEsConnection(LaholioErrorMixin, NameError):
     """Levantar cuando se use conexión  no asíncrona en métodos asíncronos."""
 
     msg_template = "La conexión `{connection}` no es asíncrona."
+
+
+class InvalidCursor(LaholioErrorMixin, ValueError):
+    """Levantar cuando un cursor de paginación no es válido."""
+
+    msg_template = "El cursor de paginación no es válido: {reason}."
+
+
+class AliasIsIndex(LaholioErrorMixin, ValueError):
+    """Levantar cuando el nombre de un alias corresponde a un índice."""
+
+    msg_template = (
+        "`{alias}` es un índice y no un alias. Usar `replace_index=True` "
+        "para reemplazarlo por el alias."
+    )
+
+
+class IndexNotReady(LaholioErrorMixin, RuntimeError):
+    """Levantar cuando un índice no alcanza el estado de salud esperado."""
+
+    msg_template = "El índice `{index}` no alcanzó el estado `{status}`."
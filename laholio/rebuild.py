@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+"""Reconstrucción del catálogo sin downtime (blue/green).
+
+El catálogo se busca a través del alias `S.CATALOGO_INDEX_NAME`. Cada
+reconstrucción crea un índice físico versionado, lo carga en modo carga
+masiva mientras las búsquedas siguen sobre la versión anterior, y recién
+cuando está listo y precalentado mueve el alias de manera atómica::
+
+    rebuild = CatalogRebuild(connection)
+    with rebuild.loading() as inserter:
+        inserter.bulk_request(documents)
+    rebuild.publish()
+
+Las últimas versiones se conservan, por lo que volver a la anterior es
+solo mover el alias (ver :func:`rollback`).
+
+Al mover el alias se invalida el caché de resultados del proceso (ver
+:mod:`laholio.utils.cache`); en los demás procesos los resultados de la
+versión anterior expiran con su TTL. Los índices locales construidos
+desde el catálogo quedan describiendo la versión anterior hasta que cada
+proceso llame a :meth:`laholio.crud.SkuSearch.reload_local_indexes`.
+
+"""
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Iterable
+from typing import List
+from typing import Optional
+
+from elasticsearch import Elasticsearch
+from elasticsearch_dsl.document import IndexMeta
+
+from laholio import logger
+from laholio.crud import BulkInsertUpdateDelete
+from laholio.exceptions import IndexNotExists
+from laholio.exceptions import IndexNotReady
+from laholio.schemas import VERSION_FORMAT
+from laholio.schemas import Sku
+from laholio.schemas import create_versioned_index
+from laholio.schemas import index_versions
+from laholio.schemas import put_alias
+from laholio.schemas import versioned_index_name
+from laholio.settings import IndexProfile
+from laholio.utils import cache as result_cache
+
+WARMERS = (
+    {"size": 0, "query": {"match_all": {}}},
+    {"size": 1, "sort": [{"sku_id.raw": "asc"}]},
+)
+"""Búsquedas con las que se precalienta un índice de :class:`Sku` antes
+de publicarlo.
+
+La segunda carga los doc values del desempate de la paginación. Otros
+docs deben entregar sus propios `warmers`.
+
+"""
+
+
+class CatalogRebuild:
+    """Reconstrucción de un índice detrás de su alias.
+
+    Args:
+        connection: Conexión sincrónica a ES.
+        doc: Doc del índice. El alias es `doc.Index.name`.
+        keep: Versiones que se conservan al publicar, contando la nueva.
+        version: Versión del índice nuevo, por defecto la fecha y hora.
+        profile: Dimensionamiento del índice nuevo. Ver
+            :func:`laholio.schemas.create_versioned_index`.
+        warmers: Búsquedas con las que se precalienta el índice nuevo.
+            Obligatorio si `doc` no es :class:`Sku`, por defecto
+            :data:`WARMERS`.
+
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        connection: Elasticsearch,
+        doc: IndexMeta = Sku,
+        keep: int = 2,
+        version: Optional[str] = None,
+        profile: Optional[IndexProfile] = None,
+        warmers: Optional[Iterable[dict]] = None,
+    ):
+        if keep < 1:
+            raise ValueError("`keep` debe ser >= 1")
+        if warmers is None:
+            if not issubclass(doc, Sku):
+                raise ValueError("`warmers` es obligatorio si `doc` no es Sku")
+            warmers = WARMERS
+
+        self.connection = connection
+        self.doc = doc
+        self.alias = doc.Index.name
+        self.keep = keep
+        self.version = version or datetime.utcnow().strftime(VERSION_FORMAT)
+        self.profile = profile
+        self.warmers = tuple(warmers)
+        self.index_name = versioned_index_name(self.alias, self.version)
+        self.inserter = None  # type: Optional[BulkInsertUpdateDelete]
+
+    def create(self) -> str:
+        """Crea el índice versionado, vacío y sin alias.
+
+        Deja en `inserter` un insertador para el índice nuevo.
+
+        """
+        create_versioned_index(
+            self.connection, self.doc, self.version, self.profile
+        )
+        self.inserter = BulkInsertUpdateDelete(
+            self.connection, self.index_name
+        )
+        logger.info("Índice versionado creado", index=self.index_name)
+        return self.index_name
+
+    @contextmanager
+    def loading(self, force_merge: bool = True):
+        """Crea el índice y entrega su insertador en modo carga masiva.
+
+        Al salir se restauran los settings del índice y se hace el force
+        merge. Ver
+        :meth:`laholio.crud.BulkInsertUpdateDelete.bulk_load_mode`.
+
+        """
+        self.create()
+        with self.inserter.bulk_load_mode(force_merge=force_merge):
+            yield self.inserter
+
+    def warm(self, warmers: Optional[Iterable[dict]] = None):
+        """Ejecuta `warmers` (por defecto :attr:`warmers`) en el índice."""
+        for body in self.warmers if warmers is None else warmers:
+            self.connection.search(
+                index=self.index_name, body=body, request_cache=False
+            )
+
+    def publish(
+        self,
+        wait_for_status: str = "green",
+        timeout: str = "10m",
+        warmers: Optional[Iterable[dict]] = None,
+        replace_index: bool = False,
+    ) -> List[str]:
+        """Pone el índice nuevo detrás del alias.
+
+        Espera a que el índice tenga todas sus réplicas, lo precalienta,
+        mueve el alias, invalida el caché de resultados del alias y borra
+        las versiones que sobran. Ver la nota del módulo sobre los demás
+        procesos y los índices locales.
+
+        Args:
+            wait_for_status: Salud del índice que se espera antes de
+                publicarlo.
+            timeout: Tiempo máximo de espera.
+            warmers: Ver :meth:`warm`.
+            replace_index: Ver :func:`laholio.schemas.put_alias`.
+
+        Returns:
+            Los índices a los que apuntaba antes el alias.
+
+        """
+        health = self.connection.cluster.health(
+            index=self.index_name,
+            wait_for_status=wait_for_status,
+            timeout=timeout,
+        )
+        if health.get("timed_out"):
+            raise IndexNotReady(index=self.index_name, status=wait_for_status)
+
+        self.warm(warmers)
+
+        previous = put_alias(
+            self.connection,
+            self.index_name,
+            self.alias,
+            replace_index=replace_index,
+        )
+        result_cache.invalidate(self.alias)
+        logger.info(
+            "Alias publicado",
+            alias=self.alias,
+            index=self.index_name,
+            previous=previous,
+        )
+
+        self.cleanup()
+        return previous
+
+    def cleanup(self) -> List[str]:
+        """Borra las versiones más antiguas que las últimas `keep`.
+
+        Nunca borra un índice que tenga el alias.
+
+        Returns:
+            Los índices borrados.
+
+        """
+        aliased = set()
+        if self.connection.indices.exists_alias(name=self.alias):
+            aliased = set(self.connection.indices.get_alias(name=self.alias))
+
+        versions = index_versions(self.connection, self.alias)
+        deleted = [
+            name for name in versions[: -self.keep] if name not in aliased
+        ]
+        for name in deleted:
+            self.connection.indices.delete(index=name)
+            logger.info("Versión borrada", index=name)
+
+        return deleted
+
+
+def rollback(connection: Elasticsearch, alias: str = Sku.Index.name) -> str:
+    """Vuelve el alias a la versión anterior a la actual.
+
+    Invalida el caché de resultados del alias, igual que
+    :meth:`CatalogRebuild.publish`.
+
+    Returns:
+        El índice al que apunta ahora el alias.
+
+    """
+    if not connection.indices.exists_alias(name=alias):
+        raise IndexNotExists(index=alias)
+
+    current = min(connection.indices.get_alias(name=alias))
+    older = [
+        name for name in index_versions(connection, alias) if name < current
+    ]
+    if not older:
+        raise IndexNotExists(index="anterior a " + current)
+
+    put_alias(connection, older[-1], alias)
+    result_cache.invalidate(alias)
+    logger.warning("Rollback del alias", alias=alias, index=older[-1])
+    return older[-1]
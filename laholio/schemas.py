@@ -1,6 +1,11 @@
 # -*- coding: utf-8 -*-
 """Definición de documento Sku."""
+from datetime import datetime
 from enum import Enum
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Union
 
 from elasticsearch import Elasticsearch
 from elasticsearch_dsl.document import \
@@ -8,10 +13,14 @@ from elasticsearch_dsl.document import \
 from elasticsearch_dsl.document import InnerDoc
 
 from laholio import S
+from laholio import logger
 from laholio.analyzers import INDEX_ANALYZER_DESCRIPTION
 from laholio.analyzers import INDEX_ANALYZER_SKU
 from laholio.analyzers import SEARCH_ANALYZER
 from laholio.analyzers import SUGGESTER_ANALYZER_DESCRIPTION
+from laholio.exceptions import AliasIsIndex
+from laholio.settings import IndexProfile
+from laholio.templates import put_search_templates
 from laholio.utils._elasticsearch import Document
 from laholio.utils._elasticsearch import EnumText
 from laholio.utils._fields import Boolean  # pylint: disable=no-name-in-module
@@ -51,7 +60,11 @@ class CatalogoQualityStatus(Enum):
 class Sku(Document):
     """Definición documento Sku."""
 
-    sku_id = Text(required=True, description="Id del almacenamiento")
+    sku_id = Text(
+        required=True,
+        fields={"raw": Keyword()},
+        description="Id del almacenamiento",
+    )
     sku = Text(
         required=True,
         analyzer=INDEX_ANALYZER_SKU,
@@ -110,7 +123,7 @@ class Sku(Document):
         """Index catálogo."""
 
         name = S.CATALOGO_INDEX_NAME
-        settings = {"number_of_shards": 1, "number_of_replicas": 0}
+        settings = S.SKU_INDEX_PROFILE.index_settings()
 
     def save(
         self, **kwargs
@@ -121,6 +134,9 @@ class Sku(Document):
         ):  # No se permitirán skus con id generado aleatorio
             raise ValueError("El campo sku_id es obligatorio")
         self.meta.id = self.sku_id
+        routing = self.build_routing(self.rut_proveedor_)
+        if routing is not None:
+            self.meta.routing = routing
         return super().save(**kwargs)
 
     def to_dict_with_custom_id(self, **kwargs):
@@ -148,6 +164,46 @@ class Sku(Document):
     def build_sku_id(rut_proveedor_: int, sku: str):
         return "_".join((str(rut_proveedor_), str(sku)))
 
+    @staticmethod
+    def build_routing(
+        rut_proveedor_: Optional[Union[int, Iterable[int]]]
+    ) -> Optional[str]:
+        """Routing de los skus de `rut_proveedor_`.
+
+        Solo si `S.ROUTING_BY_PROVIDER` está habilitado; en otro caso los
+        documentos se rutean por su `_id`.
+
+        Args:
+            rut_proveedor_: Rut, o ruts en el caso de una búsqueda.
+
+        Returns:
+            El valor del parámetro `routing`, o `None` si no se rutea.
+
+        """
+        if not S.ROUTING_BY_PROVIDER or rut_proveedor_ is None:
+            return None
+        if isinstance(rut_proveedor_, int):
+            return str(rut_proveedor_)
+        return ",".join(str(rut) for rut in rut_proveedor_) or None
+
+    @classmethod
+    def routing_from_id(cls, sku_id: Optional[str]) -> Optional[str]:
+        """Routing de un sku a partir de su `sku_id`.
+
+        Para borrar o actualizar un sku sin tener su `rut_proveedor_`. El
+        `sku_id` siempre se construye con :meth:`build_sku_id`, por lo que
+        empieza con el rut.
+
+        Returns:
+            El valor del parámetro `routing`, o `None` si no se rutea o si
+            `sku_id` no tiene la forma `<rut>_<sku>`.
+
+        """
+        rut, separator, _ = str(sku_id).partition("_")
+        if sku_id is None or not separator or not rut.isdigit():
+            return None
+        return cls.build_routing(int(rut))
+
 
 class SkuYellow(Sku):
     """Clase auxiliar para transformar a pydantic con campos más relajados."""
@@ -201,7 +257,7 @@ class CatalogoUpload(Document):
         """Index para el status de la carga de excel de catalogos."""
 
         name = "catalogo_upload"
-        settings = {"number_of_shards": 1, "number_of_replicas": 0}
+        settings = S.CATALOGO_UPLOAD_INDEX_PROFILE.index_settings()
 
     def to_dict_with_custom_id(self, **kwargs):
         """Override el método to_dict para agragar el _id field.
@@ -241,12 +297,33 @@ class SkuCopy(Sku):  # pylint: disable=R0903
         settings = {"number_of_shards": 1, "number_of_replicas": 0}
 
 
-def init_schema(connection: Elasticsearch, doc: IndexMeta = Sku, **meta_kw):
+def init_schema(
+    connection: Elasticsearch,
+    doc: IndexMeta = Sku,
+    templates: bool = True,
+    profile: Optional[IndexProfile] = None,
+    **meta_kw
+):
     """Construye el indice y los mappings si aún no existen.
 
+    Además registra las plantillas de búsqueda de
+    :mod:`laholio.templates`, una vez por conexión.
+
     Args:
         connection : Conexión a ES
         doc: Doc asociado al índice por crear.
+        templates: Si es `False` no se registran las plantillas.
+        profile: Dimensionamiento con el que se crea el índice. Por
+            defecto el de `doc.Index.settings`, que para :class:`Sku` y
+            :class:`CatalogoUpload` es el de los settings (e.g.
+            `S.SKU_INDEX_PROFILE`).
+
+    Con `S.ROUTING_BY_PROVIDER` el mapping del :class:`Sku` exige
+    `routing` en cada escritura.
+
+    Si el índice de un :class:`Sku` ya existe y no tiene `sku_id.raw`,
+    solo se advierte en el log: la migración es una operación explícita
+    (ver :func:`migrate_sku_id_raw`).
 
     meta_kw:
 
@@ -256,10 +333,191 @@ def init_schema(connection: Elasticsearch, doc: IndexMeta = Sku, **meta_kw):
     """
 
     if not connection.indices.exists(doc.Index.name):
-        meta_kw.setdefault("dynamic", "strict")
-        doc.extra_meta_field(**meta_kw)
-        doc.init(using=connection)
+        _extra_meta_field(doc, **meta_kw)
+        # Sobre una copia, para que el perfil no quede en `doc`
+        index = doc._index.clone()  # pylint: disable=protected-access
+        if profile is not None:
+            index.settings(**profile.index_settings())
+        index.save(using=connection)
+    elif issubclass(doc, Sku) and not _has_sku_id_raw(
+        connection, doc.Index.name
+    ):
+        logger.warning(
+            "El índice no tiene `sku_id.raw` y la paginación no es "
+            "confiable; se migra con `migrate_sku_id_raw`",
+            index=doc.Index.name,
+        )
+
+    if templates:
+        put_search_templates(connection)
+
+
+def _has_sku_id_raw(connection: Elasticsearch, index: str) -> bool:
+    """Indica si todos los índices tras `index` tienen `sku_id.raw`."""
+    response = connection.indices.get_field_mapping(
+        index=index, doc_type="doc", fields="sku_id.raw"
+    )
+    return all(
+        data["mappings"].get("doc", {}).get("sku_id.raw")
+        for data in response.values()
+    )
+
+
+def migrate_sku_id_raw(
+    connection: Elasticsearch, index: str = Sku.Index.name
+) -> Optional[str]:
+    """Agrega `sku_id.raw` a un índice de :class:`Sku` creado sin él.
+
+    El subcampo keyword es el desempate de la paginación (ver
+    :attr:`laholio.crud.SkuSearch.TIEBREAKER`); en un índice que no lo
+    tiene, los documentos quedan sin valor de orden y las páginas se
+    repiten o se saltan documentos. Se agrega al mapping y se reindexan
+    en el lugar, con un `update_by_query` en segundo plano, solo los
+    documentos que aún no lo tienen, por lo que repetir la migración no
+    tiene costo. Hasta que la tarea termine, la paginación del índice no
+    es confiable.
+
+    Recorre el índice completo, por lo que no se ejecuta al iniciar: se
+    llama explícitamente, una vez por índice. :func:`init_schema` solo
+    advierte si falta el subcampo.
+
+    Args:
+        connection: Conexión a ES.
+        index: Índice o alias a migrar.
+
+    Returns:
+        El id de la tarea del `update_by_query`, o `None` si todos los
+        documentos ya tienen el subcampo.
+
+    """
+    mapping = Sku._doc_type.mapping  # pylint: disable=protected-access
+    connection.indices.put_mapping(
+        index=index,
+        doc_type="doc",
+        body={"properties": {"sku_id": mapping["sku_id"].to_dict()}},
+    )
+
+    missing = {"bool": {"must_not": {"exists": {"field": "sku_id.raw"}}}}
+    if not connection.count(index=index, body={"query": missing})["count"]:
+        return None
+
+    response = connection.update_by_query(
+        index=index,
+        body={"query": missing},
+        conflicts="proceed",
+        wait_for_completion=False,
+    )
+    return response["task"]
+
+
+def _extra_meta_field(doc: IndexMeta, **meta_kw):
+    """Meta fields del mapping de `doc` al crear su índice."""
+    meta_kw.setdefault("dynamic", "strict")
+    if S.ROUTING_BY_PROVIDER and issubclass(doc, Sku):
+        # Una escritura sin routing quedaría en el shard equivocado
+        meta_kw.setdefault("_routing", {"required": True})
+    doc.extra_meta_field(**meta_kw)
+
+
+VERSION_FORMAT = "%Y%m%d%H%M%S"
+"""Formato de la versión de los índices de :func:`create_versioned_index`."""
+
+
+def versioned_index_name(alias: str, version: Optional[str] = None) -> str:
+    """Nombre del índice físico `version` detrás de `alias`.
+
+    Por defecto la versión es la fecha y hora UTC actual, de manera que
+    los nombres se ordenan por antigüedad.
+
+    """
+    version = version or datetime.utcnow().strftime(VERSION_FORMAT)
+    return "{}_v{}".format(alias, version)
+
+
+def index_versions(connection: Elasticsearch, alias: str) -> List[str]:
+    """Índices versionados de `alias`, del más antiguo al más reciente."""
+    return sorted(
+        connection.indices.get(index=versioned_index_name(alias, "*"))
+    )
+
+
+def create_versioned_index(
+    connection: Elasticsearch,
+    doc: IndexMeta = Sku,
+    version: Optional[str] = None,
+    profile: Optional[IndexProfile] = None,
+    **meta_kw
+) -> str:
+    """Crea un índice físico versionado con el mapping de `doc`.
+
+    El índice no recibe búsquedas hasta que se le asigna el alias con
+    :func:`put_alias`. Ver :mod:`laholio.rebuild`.
+
+    Args:
+        connection: Conexión a ES.
+        doc: Doc cuyo mapping, analizadores y settings se usan. El alias
+            es `doc.Index.name`.
+        version: Versión del índice, por defecto la fecha y hora actual.
+        profile: Dimensionamiento, por defecto el de `doc.Index.settings`.
+        meta_kw: Ver :func:`init_schema`.
+
+    Returns:
+        El nombre del índice creado.
+
+    """
+    name = versioned_index_name(doc.Index.name, version)
+
+    _extra_meta_field(doc, **meta_kw)
+    index = doc._index.clone(name)  # pylint: disable=protected-access
+    if profile is not None:
+        index.settings(**profile.index_settings())
+    index.create(using=connection)
+
+    return name
+
+
+def put_alias(
+    connection: Elasticsearch,
+    index: str,
+    alias: str = S.CATALOGO_INDEX_NAME,
+    replace_index: bool = False,
+) -> List[str]:
+    """Apunta `alias` a `index`, quitándolo de los demás índices.
+
+    El cambio es atómico: las búsquedas sobre `alias` pasan de un índice a
+    otro sin ver un estado intermedio.
+
+    Args:
+        connection: Conexión a ES.
+        index: Índice al que debe apuntar el alias.
+        alias: Nombre del alias, por defecto el del catálogo.
+        replace_index: Si existe un índice llamado `alias` (e.g. creado
+            por :func:`init_schema` antes de usar índices versionados), lo
+            borra en la misma operación. Sin esto se levanta
+            :class:`~laholio.exceptions.AliasIsIndex`.
+
+    Returns:
+        Los índices a los que apuntaba antes el alias.
+
+    """
+    actions = []
+
+    if connection.indices.exists_alias(name=alias):
+        previous = sorted(connection.indices.get_alias(name=alias))
+    else:
+        previous = []
+        if connection.indices.exists(index=alias):
+            if not replace_index:
+                raise AliasIsIndex(alias=alias)
+            actions.append({"remove_index": {"index": alias}})
+
+    actions.extend(
+        {"remove": {"index": name, "alias": alias}}
+        for name in previous
+        if name != index
+    )
+    actions.append({"add": {"index": index, "alias": alias}})
 
+    connection.indices.update_aliases(body={"actions": actions})
 
-def put_alias():
-    """Implemntar puesta de alias en un índice ya existente."""
+    return previous
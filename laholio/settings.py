@@ -14,9 +14,32 @@ from typing import Optional
 from petri.loggin import LogFormatter
 from petri.loggin import LogLevel
 from petri.settings import BaseSettings
+from pydantic import BaseModel
 from pydantic.types import SecretStr
 
 
+class IndexProfile(BaseModel):
+    """Dimensionamiento de un índice, con los nombres de sus settings en ES.
+
+    Ver :func:`laholio.utils.sizing.estimate_shard_count` para elegir el
+    número de shards.
+
+    """
+
+    number_of_shards: int = 1
+    number_of_replicas: int = 0
+    refresh_interval: str = "1s"
+    codec: str = "default"
+    """`default` (LZ4) o `best_compression` (DEFLATE)."""
+
+    max_result_window: int = 10000
+    """Máximo de `from + size` de una búsqueda."""
+
+    def index_settings(self) -> dict:
+        """Settings del índice para crearlo o actualizarlo."""
+        return self.dict()
+
+
 class Settings(BaseSettings):
     """Valores comunes definidos aquí.
 
@@ -45,6 +68,50 @@ class Settings(BaseSettings):
 
     CATALOGO_INDEX_NAME: str
     """Nombre que define el índice del catálogo"""
+
+    CURSOR_SECRET: Optional[SecretStr] = None
+    """Llave con la que se firman los cursores de paginación.
+
+    Debe ser la misma en todos los workers que atienden búsquedas. Es
+    obligatoria en :class:`Production`; en otros ambientes, si no se
+    configura, cada proceso usa una llave aleatoria y sus cursores solo
+    son válidos en él.
+
+    """
+    QUERY_LOG_SAMPLE: int = 1
+    """Se loggea una de cada `QUERY_LOG_SAMPLE` queries de cada forma."""
+
+    QUERY_LOG_RATE: Optional[float] = None
+    """Máximo de queries loggeadas por segundo por forma de query."""
+
+    LOG_QUEUE: bool = False
+    """Formatea y escribe los logs en un hilo aparte del event loop.
+
+    Ver :func:`laholio.utils.query_log.install_queue_logging`.
+
+    """
+    SKU_INDEX_PROFILE: IndexProfile = IndexProfile()
+    """Dimensionamiento del índice de :class:`~laholio.schemas.Sku`.
+
+    Se aplica al crear el índice. Cambiar `number_of_shards` requiere
+    reindexar; los demás valores se pueden actualizar en caliente.
+
+    """
+    CATALOGO_UPLOAD_INDEX_PROFILE: IndexProfile = IndexProfile()
+    """Dimensionamiento del índice de :class:`~laholio.schemas.CatalogoUpload`.
+
+    Ver `SKU_INDEX_PROFILE`.
+
+    """
+
+    ROUTING_BY_PROVIDER: bool = False
+    """Guarda los skus de cada proveedor en un mismo shard.
+
+    Los documentos se rutean por `rut_proveedor_`, y las búsquedas
+    filtradas por proveedor solo consultan sus shards. Cambiarlo requiere
+    reindexar. Ver :meth:`laholio.schemas.Sku.build_routing`.
+
+    """
     # TODO: Agregar validador en pydantic para que el nombre sea valido
     # en es. No cualquier nombre es permitido en es, y ademas cuando uno
     # escribe A-B, en es se guarda como A_B. Ver una manera de escribir
@@ -56,6 +123,16 @@ class Production(Settings):
 
     LOG_FORMAT = LogFormatter.JSON
     LOG_LEVEL = LogLevel.TRACE
+    LOG_QUEUE = True
+    CURSOR_SECRET: SecretStr
+    """Obligatoria: con llaves aleatorias por proceso, un cursor creado
+    en un worker es inválido en los demás.
+
+    """
+    QUERY_LOG_SAMPLE = 100
+    QUERY_LOG_RATE = 10.0
+    SKU_INDEX_PROFILE = IndexProfile(number_of_shards=3, number_of_replicas=1)
+    CATALOGO_UPLOAD_INDEX_PROFILE = IndexProfile(number_of_replicas=1)
 
 
 class Development(Settings):
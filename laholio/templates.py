@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""Plantillas de búsqueda (search templates) guardadas en el cluster.
+
+Los cuerpos de las búsquedas más frecuentes de
+:class:`laholio.crud.SkuSearch` se guardan como plantillas mustache, de
+manera que cada búsqueda viaje solo como `{id, params}` sin construir ni
+serializar el árbol de `elasticsearch_dsl`.
+
+Los `id` llevan versión: al cambiar una plantilla se debe cambiar su
+`id`, para que las versiones anteriores de laholio sigan usando la suya.
+
+Ver:
+    https://www.elastic.co/guide/en/elasticsearch/reference/6.8/search-template.html
+
+"""
+import time
+import weakref
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Union
+
+from elasticsearch import Elasticsearch
+from elasticsearch.exceptions import TransportError
+
+SKU_SEARCH = "laholio-sku-search-v1"
+"""Búsqueda por texto de :meth:`laholio.crud.SkuSearch._search_product`."""
+
+SKU_SUGGEST = "laholio-sku-suggest-v1"
+"""Sugerencia de :meth:`laholio.crud.BaseAsyncSearch.suggest`."""
+
+SKU_LIST_ALL = "laholio-sku-list-all-v1"
+"""Listado de :meth:`laholio.crud.SkuSearch.list_all`."""
+
+TEMPLATES = {
+    SKU_SEARCH: """{
+  "query": {
+    "bool": {
+      "must": [{
+        "multi_match": {
+          "query": {{#toJson}}text{{/toJson}},
+          "operator": "{{operator}}",
+          "fields": {{#toJson}}fields{{/toJson}}
+        }
+      }],
+      "filter": {{#toJson}}filter{{/toJson}}
+    }
+  },
+  "_source": {
+    "includes": {{#toJson}}includes{{/toJson}},
+    "excludes": {{#toJson}}excludes{{/toJson}}
+  },
+  "size": {{size}}
+}""",
+    SKU_SUGGEST: """{
+  "suggest": {
+    "{{name}}": {
+      "text": {{#toJson}}text{{/toJson}},
+      "{{type}}": {"field": "{{field}}", "max_errors": 3}
+    }
+  }
+}""",
+    SKU_LIST_ALL: """{
+  "query": {
+    "bool": {
+      "filter": {{#toJson}}filter{{/toJson}},
+      "must": [{"match_all": {}}]
+    }
+  },
+  "_source": {
+    "includes": {{#toJson}}includes{{/toJson}},
+    "excludes": {{#toJson}}excludes{{/toJson}}
+  },
+  {{#keyset}}
+  "sort": {{#toJson}}sort{{/toJson}},
+  {{#after}}"search_after": [{{#toJson}}after{{/toJson}}],{{/after}}
+  {{/keyset}}
+  "from": {{from}},
+  "size": {{size}}
+}""",
+}
+"""Fuente mustache de cada plantilla, por `id`."""
+
+_REGISTERED = weakref.WeakKeyDictionary()  # type: ignore
+"""Conexiones en las que ya se registraron las plantillas."""
+
+
+def provider_filter(
+    rut_proveedor_: Optional[Union[int, List[int]]]
+) -> List[dict]:
+    """Filtro por proveedor, igual a `SkuSearch._filter_brand`."""
+    if rut_proveedor_ is None:
+        return []
+    return [
+        {
+            "term"
+            if isinstance(rut_proveedor_, int)
+            else "terms": {"rut_proveedor_": rut_proveedor_}
+        }
+    ]
+
+
+def put_search_templates(
+    connection: Elasticsearch,
+    templates: Optional[Dict[str, str]] = None,
+    force: bool = False,
+):
+    """Registra las plantillas de búsqueda en el cluster.
+
+    Las plantillas se registran una sola vez por conexión, salvo que se
+    use `force`.
+
+    Args:
+        connection: Conexión sincrónica a ES.
+        templates: Plantillas por registrar, por defecto
+            :data:`TEMPLATES`.
+        force: Registra aunque ya se hayan registrado en esta conexión.
+
+    """
+    if not force and connection in _REGISTERED:
+        return
+
+    for template_id, source in (templates or TEMPLATES).items():
+        connection.put_script(
+            id=template_id,
+            body={"script": {"lang": "mustache", "source": source}},
+        )
+
+    _REGISTERED[connection] = True
+
+
+def is_missing_template(exc: TransportError) -> bool:
+    """Indica si el error se debe a que la plantilla no está guardada."""
+    return exc.status_code in (400, 404) and "unable to find script" in str(
+        exc.info
+    )
+
+
+class SearchTemplates:
+    """Decide si una búsqueda usa su plantilla guardada.
+
+    Recuerda las plantillas que el cluster no tiene, para que mientras
+    tanto las búsquedas se hagan con el DSL completo sin pagar el
+    request fallido. Pasado `retry_after` se vuelve a intentar, por si
+    las plantillas fueron registradas.
+
+    Args:
+        ids: Plantillas habilitadas. Por defecto todas las de
+            :data:`TEMPLATES`.
+        retry_after: Segundos que se espera antes de reintentar una
+            plantilla que faltaba.
+        clock: Reloj monotónico, configurable para pruebas.
+
+    """
+
+    def __init__(
+        self,
+        ids: Optional[Iterable[str]] = None,
+        retry_after: float = 60.0,
+        clock=time.monotonic,
+    ):
+        self.ids = set(TEMPLATES if ids is None else ids)
+        self.retry_after = retry_after
+        self._clock = clock
+        self._missing: Dict[str, float] = {}
+
+    def enabled(self, template_id: str) -> bool:
+        """Indica si se debe intentar la plantilla `template_id`."""
+        if template_id not in self.ids:
+            return False
+        since = self._missing.get(template_id)
+        return since is None or self._clock() - since >= self.retry_after
+
+    def found(self, template_id: str):
+        """Registra que el cluster tiene la plantilla."""
+        self._missing.pop(template_id, None)
+
+    def missing(self, template_id: str):
+        """Registra que el cluster no tiene la plantilla."""
+        self._missing[template_id] = self._clock()
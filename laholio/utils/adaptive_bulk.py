@@ -0,0 +1,377 @@
+# -*- coding: utf-8 -*-
+"""Control adaptivo de la bulk API.
+
+Cuando la cola de escritura del cluster se llena, ES rechaza documentos
+con status 429. :class:`AdaptiveChunking` ajusta el tamaño de los chunks
+y las requests en vuelo a partir de la latencia y los rechazos
+observados (AIMD: crece de a poco mientras el cluster responde bien y se
+reduce a la mitad ante una señal de sobrecarga), y los documentos
+rechazados se reintentan con backoff exponencial con jitter.
+
+Ver :meth:`laholio.crud.BulkInsertUpdateDelete.bulk_request` y
+:func:`laholio.utils.async_bulk.async_bulk`.
+
+"""
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
+from itertools import islice
+from operator import methodcaller
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from elasticsearch import Elasticsearch
+from elasticsearch.exceptions import TransportError
+from elasticsearch.helpers.actions import _chunk_actions
+from elasticsearch.helpers.actions import expand_action
+
+from laholio import logger
+
+RETRY_STATUS = 429
+"""Status de los documentos rechazados que se reintentan."""
+
+
+class AdaptiveChunking:
+    """Controlador AIMD del tamaño de chunk y la concurrencia.
+
+    Con cada request respondida sin rechazos y bajo `target_latency`, el
+    chunk crece en `increase` documentos hasta `max_chunk_size`, y desde
+    ahí se suma una request en vuelo hasta `max_concurrency`. Una request
+    lenta multiplica el chunk por `decrease`; una con rechazos además
+    divide la concurrencia a la mitad.
+
+    Es seguro usarlo desde varios threads.
+
+    Args:
+        chunk_size: Tamaño inicial de los chunks.
+        concurrency: Requests en vuelo iniciales.
+        target_latency: Segundos que se espera que tome una request.
+
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        chunk_size: int = 500,
+        min_chunk_size: int = 50,
+        max_chunk_size: int = 5000,
+        concurrency: int = 2,
+        max_concurrency: int = 8,
+        target_latency: float = 1.0,
+        increase: int = 100,
+        decrease: float = 0.5,
+    ):
+        if not 1 <= min_chunk_size <= chunk_size <= max_chunk_size:
+            raise ValueError(
+                "Se requiere 1 <= min_chunk_size <= chunk_size "
+                "<= max_chunk_size"
+            )
+        if not 1 <= concurrency <= max_concurrency:
+            raise ValueError("Se requiere 1 <= concurrency <= max_concurrency")
+        if not 0 < decrease < 1 or increase < 1 or target_latency <= 0:
+            raise ValueError(
+                "`decrease` debe estar entre 0 y 1, `increase` y "
+                "`target_latency` deben ser positivos"
+            )
+
+        self.chunk_size = chunk_size
+        self.min_chunk_size = min_chunk_size
+        self.max_chunk_size = max_chunk_size
+        self.concurrency = concurrency
+        self.max_concurrency = max_concurrency
+        self.target_latency = target_latency
+        self.increase = increase
+        self.decrease = decrease
+        self._lock = threading.Lock()
+
+    def record(self, latency: float, count: int, rejected: int = 0):
+        """Ajusta el controlador con el resultado de una request.
+
+        Args:
+            latency: Segundos que tomó la request.
+            count: Documentos enviados.
+            rejected: Documentos rechazados con status 429.
+
+        """
+        with self._lock:
+            previous = (self.chunk_size, self.concurrency)
+
+            if rejected or latency > self.target_latency:
+                self.chunk_size = max(
+                    self.min_chunk_size, int(self.chunk_size * self.decrease)
+                )
+                if rejected:
+                    self.concurrency = max(1, self.concurrency // 2)
+            elif self.chunk_size < self.max_chunk_size:
+                self.chunk_size = min(
+                    self.max_chunk_size, self.chunk_size + self.increase
+                )
+            else:
+                self.concurrency = min(
+                    self.max_concurrency, self.concurrency + 1
+                )
+
+            if (self.chunk_size, self.concurrency) != previous:
+                logger.debug(
+                    "Ajuste de la bulk API",
+                    chunk_size=self.chunk_size,
+                    concurrency=self.concurrency,
+                    latencia=round(latency, 3),
+                    documentos=count,
+                    rechazados=rejected,
+                )
+
+
+def backoff_delay(
+    attempt: int, initial: float = 0.5, maximum: float = 30.0
+) -> float:
+    """Segundos de espera antes del reintento `attempt` (desde 0).
+
+    Backoff exponencial con jitter completo: un valor al azar entre 0 y
+    `initial * 2 ** attempt`, acotado por `maximum`, para que los
+    clientes rechazados a la vez no reintenten a la vez.
+
+    """
+    return random.uniform(0, min(maximum, initial * 2 ** attempt))
+
+
+def failure(
+    op_type: str,
+    item: dict,
+    attempts: int,
+    exception: Optional[Exception] = None,
+) -> dict:
+    """Falla de un documento, en un formato plano.
+
+    Returns:
+        Un diccionario con `_index`, `_id`, `op_type`, `status`, `error`
+        y `attempts` (las veces que se envió el documento).
+
+    """
+    return {
+        "_index": item.get("_index"),
+        "_id": item.get("_id"),
+        "op_type": op_type,
+        "status": item.get("status"),
+        "error": item.get("error") if exception is None else str(exception),
+        "attempts": attempts,
+    }
+
+
+def helpers_failures(errors: List[dict]) -> List[dict]:
+    """Fallas de :func:`elasticsearch.helpers.bulk` en el formato plano."""
+    return [failure(*error.copy().popitem(), attempts=1) for error in errors]
+
+
+def split_response(
+    bulk_data: list, response: dict, attempts: int, retry: bool
+) -> Tuple[int, list, List[dict]]:
+    """Separa la respuesta de la bulk API.
+
+    Args:
+        bulk_data: Acciones enviadas, como las arma
+            `elasticsearch.helpers.actions._chunk_actions`.
+        response: Respuesta de la bulk API.
+        attempts: Veces que se ha enviado el chunk.
+        retry: Si es `False`, los rechazos se cuentan como fallas.
+
+    Returns:
+        Los documentos exitosos, las acciones rechazadas con status 429
+        (en el formato de `bulk_data`) y las fallas definitivas (ver
+        :func:`failure`).
+
+    """
+    success, rejected, failures = 0, [], []
+    for data, (op_type, item) in zip(
+        bulk_data, map(methodcaller("popitem"), response["items"])
+    ):
+        status = item.get("status", 500)
+        if 200 <= status < 300:
+            success += 1
+        elif status == RETRY_STATUS and retry:
+            rejected.append(data)
+        else:
+            failures.append(failure(op_type, item, attempts))
+    return success, rejected, failures
+
+
+def transport_failures(
+    bulk_data: list, exception: Exception, attempts: int
+) -> List[dict]:
+    """Fallas de todas las acciones de un chunk cuya request falló."""
+    failures = []
+    for data in bulk_data:
+        op_type, action = data[0].copy().popitem()
+        item = {**action, "status": getattr(exception, "status_code", None)}
+        failures.append(failure(op_type, item, attempts, exception))
+    return failures
+
+
+def serialize(bulk_data: list, serializer) -> List[str]:
+    """Líneas de la bulk API para reenviar `bulk_data`."""
+    return [serializer.dumps(line) for data in bulk_data for line in data]
+
+
+def send_with_retries(  # pylint: disable=too-many-arguments
+    client: Elasticsearch,
+    bulk_data: list,
+    bulk_actions: List[str],
+    controller: Optional[AdaptiveChunking] = None,
+    max_retries: int = 0,
+    initial_backoff: float = 0.5,
+    max_backoff: float = 30.0,
+    **kwargs,
+) -> Tuple[int, List[dict]]:
+    """Envía un chunk, reintentando solo los documentos rechazados.
+
+    Un error de transporte con status 429 reintenta el chunk completo;
+    cualquier otro marca como fallidas todas sus acciones.
+
+    Args:
+        client: Conexión sincrónica a ES.
+        bulk_data: Ver :func:`split_response`.
+        bulk_actions: Líneas serializadas de `bulk_data`.
+        controller: Si se entrega, registra cada request.
+        max_retries: Reintentos de los documentos rechazados.
+        initial_backoff: Ver :func:`backoff_delay`.
+        max_backoff: Ver :func:`backoff_delay`.
+        kwargs: Parámetros de `client.bulk`.
+
+    Returns:
+        Los documentos exitosos y las fallas definitivas.
+
+    """
+    success, failures = 0, []
+    for attempt in range(max_retries + 1):
+        if attempt:
+            time.sleep(
+                backoff_delay(attempt - 1, initial_backoff, max_backoff)
+            )
+            bulk_actions = serialize(bulk_data, client.transport.serializer)
+
+        retry = attempt < max_retries
+        start = time.perf_counter()
+        try:
+            response = client.bulk("\n".join(bulk_actions) + "\n", **kwargs)
+        except TransportError as exc:
+            if exc.status_code == RETRY_STATUS and retry:
+                if controller is not None:
+                    controller.record(
+                        time.perf_counter() - start,
+                        len(bulk_data),
+                        len(bulk_data),
+                    )
+                continue
+            failures.extend(transport_failures(bulk_data, exc, attempt + 1))
+            break
+
+        chunk_success, bulk_data, chunk_failures = split_response(
+            bulk_data, response, attempt + 1, retry
+        )
+        if controller is not None:
+            controller.record(
+                time.perf_counter() - start,
+                chunk_success + len(bulk_data) + len(chunk_failures),
+                len(bulk_data),
+            )
+        success += chunk_success
+        failures.extend(chunk_failures)
+        if not bulk_data:
+            break
+
+    return success, failures
+
+
+def adaptive_bulk(  # pylint: disable=too-many-arguments,too-many-locals
+    client: Elasticsearch,
+    actions: Iterable[dict],
+    chunk_size: int = 500,
+    max_chunk_bytes: int = 100 * 1024 * 1024,
+    thread_count: int = 1,
+    controller: Optional[AdaptiveChunking] = None,
+    max_retries: int = 0,
+    initial_backoff: float = 0.5,
+    max_backoff: float = 30.0,
+    **kwargs,
+) -> Tuple[int, List[dict]]:
+    """Bulk API sincrónica con chunks adaptivos y reintentos.
+
+    Ver :func:`send_with_retries`. Si se entrega `controller`, el tamaño
+    de los chunks y las requests en vuelo son los suyos, con a lo más
+    `thread_count` requests en vuelo; si no, se usan `chunk_size` y
+    `thread_count`.
+
+    Returns:
+        Los documentos exitosos y las fallas definitivas (ver
+        :func:`failure`).
+
+    """
+    if thread_count < 1:
+        raise ValueError("`thread_count` debe ser >= 1")
+
+    def size() -> int:
+        if controller is None:
+            return chunk_size
+        return controller.chunk_size
+
+    def limit() -> int:
+        if controller is None:
+            return thread_count
+        return min(controller.concurrency, thread_count)
+
+    actions = iter(actions)
+    serializer = client.transport.serializer
+    pending: set = set()
+    success, failures = 0, []
+
+    def collect(done):
+        nonlocal success
+        for future in done:
+            chunk_success, chunk_failures = future.result()
+            success += chunk_success
+            failures.extend(chunk_failures)
+
+    with ThreadPoolExecutor(thread_count) as pool:
+        try:
+            while True:
+                batch = list(islice(actions, size()))
+                if not batch:
+                    break
+                for bulk_data, bulk_actions in _chunk_actions(
+                    map(expand_action, batch),
+                    len(batch),
+                    max_chunk_bytes,
+                    serializer,
+                ):
+                    pending.add(
+                        pool.submit(
+                            send_with_retries,
+                            client,
+                            bulk_data,
+                            bulk_actions,
+                            controller,
+                            max_retries,
+                            initial_backoff,
+                            max_backoff,
+                            **kwargs,
+                        )
+                    )
+                    # Se espera antes de leer el siguiente chunk, para que
+                    # su tamaño considere las respuestas recibidas
+                    while len(pending) >= limit():
+                        done, pending = wait(
+                            pending, return_when=FIRST_COMPLETED
+                        )
+                        collect(done)
+
+            collect(wait(pending).done)
+            pending = set()
+        finally:
+            for future in pending:
+                future.cancel()
+
+    return success, failures
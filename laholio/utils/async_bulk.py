@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""Bulk API sobre una conexión asincrónica.
+
+Equivalente a :func:`elasticsearch.helpers.bulk` para `AsyncTransport`,
+que no tiene helpers propios. Los chunks se arman igual que en el helper
+sincrónico (por número de acciones y por bytes) y se envían hasta
+`concurrency` a la vez, o según un
+:class:`~laholio.utils.adaptive_bulk.AdaptiveChunking`.
+
+"""
+import asyncio
+from typing import AsyncIterable
+from typing import AsyncIterator
+from typing import Callable
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Tuple
+from typing import Union
+
+from elasticsearch import Elasticsearch
+from elasticsearch.exceptions import TransportError
+from elasticsearch.helpers.actions import _chunk_actions
+from elasticsearch.helpers.actions import expand_action
+
+from laholio.utils.adaptive_bulk import RETRY_STATUS
+from laholio.utils.adaptive_bulk import AdaptiveChunking
+from laholio.utils.adaptive_bulk import backoff_delay
+from laholio.utils.adaptive_bulk import serialize
+from laholio.utils.adaptive_bulk import split_response
+from laholio.utils.adaptive_bulk import transport_failures
+
+MAX_CHUNK_BYTES = 100 * 1024 * 1024
+"""Tamaño máximo de un request, el mismo del helper sincrónico."""
+
+
+async def batches(
+    iterable: Union[Iterable, AsyncIterable],
+    size: Union[int, Callable[[], int]],
+) -> AsyncIterator[list]:
+    """Agrupa `iterable`, sincrónico o asincrónico, en listas de `size`.
+
+    `size` puede ser una función, que se consulta al empezar cada lista.
+
+    """
+    get_size = size if callable(size) else lambda: size
+    if get_size() < 1:
+        raise ValueError("`size` debe ser >= 1")
+
+    batch: list = []
+    if hasattr(iterable, "__aiter__"):
+        async for item in iterable:
+            batch.append(item)
+            if len(batch) >= get_size():
+                yield batch
+                batch = []
+    else:
+        for item in iterable:
+            batch.append(item)
+            if len(batch) >= get_size():
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+async def send_chunk(  # pylint: disable=too-many-arguments
+    client: Elasticsearch,
+    bulk_data: list,
+    bulk_actions: List[str],
+    controller: Optional[AdaptiveChunking] = None,
+    max_retries: int = 0,
+    initial_backoff: float = 0.5,
+    max_backoff: float = 30.0,
+    **kwargs,
+) -> Tuple[int, List[dict]]:
+    """Envía un chunk serializado y cuenta sus resultados.
+
+    Versión asincrónica de
+    :func:`laholio.utils.adaptive_bulk.send_with_retries`: los
+    documentos rechazados con status 429 se reintentan hasta
+    `max_retries` veces y cualquier otro error de transporte marca como
+    fallidas todas las acciones del chunk.
+
+    Returns:
+        Los documentos exitosos y las fallas definitivas (ver
+        :func:`laholio.utils.adaptive_bulk.failure`).
+
+    """
+    loop = asyncio.get_event_loop()
+    success, failures = 0, []
+    for attempt in range(max_retries + 1):
+        if attempt:
+            await asyncio.sleep(
+                backoff_delay(attempt - 1, initial_backoff, max_backoff)
+            )
+            bulk_actions = serialize(bulk_data, client.transport.serializer)
+
+        retry = attempt < max_retries
+        start = loop.time()
+        try:
+            response = await client.bulk(
+                "\n".join(bulk_actions) + "\n", **kwargs
+            )
+        except TransportError as exc:
+            if exc.status_code == RETRY_STATUS and retry:
+                if controller is not None:
+                    controller.record(
+                        loop.time() - start, len(bulk_data), len(bulk_data)
+                    )
+                continue
+            failures.extend(transport_failures(bulk_data, exc, attempt + 1))
+            break
+
+        chunk_success, bulk_data, chunk_failures = split_response(
+            bulk_data, response, attempt + 1, retry
+        )
+        if controller is not None:
+            controller.record(
+                loop.time() - start,
+                chunk_success + len(bulk_data) + len(chunk_failures),
+                len(bulk_data),
+            )
+        success += chunk_success
+        failures.extend(chunk_failures)
+        if not bulk_data:
+            break
+
+    return success, failures
+
+
+async def async_bulk(  # pylint: disable=too-many-arguments,too-many-locals
+    client: Elasticsearch,
+    actions: Union[Iterable[dict], AsyncIterable[dict]],
+    chunk_size: int = 500,
+    max_chunk_bytes: int = MAX_CHUNK_BYTES,
+    concurrency: int = 4,
+    controller: Optional[AdaptiveChunking] = None,
+    max_retries: int = 0,
+    initial_backoff: float = 0.5,
+    max_backoff: float = 30.0,
+    **kwargs,
+) -> Tuple[int, List[dict]]:
+    """Envía `actions` con la bulk API, con `concurrency` chunks a la vez.
+
+    Las acciones se consumen a medida que se liberan requests, por lo que
+    en memoria hay a lo más `concurrency` chunks.
+
+    Args:
+        client: Conexión asincrónica a ES.
+        actions: Acciones en el formato de
+            :func:`elasticsearch.helpers.bulk`.
+        chunk_size: Máximo de acciones por request.
+        max_chunk_bytes: Máximo de bytes por request.
+        concurrency: Máximo de requests en vuelo.
+        controller: Si se entrega, el tamaño de los chunks y las requests
+            en vuelo son los suyos en vez de `chunk_size` y
+            `concurrency`. Ver
+            :class:`~laholio.utils.adaptive_bulk.AdaptiveChunking`.
+        max_retries: Reintentos de los documentos rechazados con 429.
+        initial_backoff: Ver
+            :func:`~laholio.utils.adaptive_bulk.backoff_delay`.
+        max_backoff: Ver
+            :func:`~laholio.utils.adaptive_bulk.backoff_delay`.
+        kwargs: Parámetros de `client.bulk` (e.g. `refresh`).
+
+    Returns:
+        Las acciones exitosas y la lista de fallas definitivas.
+
+    """
+    if concurrency < 1:
+        raise ValueError("`concurrency` debe ser >= 1")
+
+    def size() -> int:
+        if controller is None:
+            return chunk_size
+        return controller.chunk_size
+
+    def limit() -> int:
+        if controller is None:
+            return concurrency
+        return controller.concurrency
+
+    serializer = client.transport.serializer
+    pending: set = set()
+    success, failures = 0, []
+
+    def collect(done):
+        nonlocal success
+        for task in done:
+            chunk_success, chunk_failures = task.result()
+            success += chunk_success
+            failures.extend(chunk_failures)
+
+    try:
+        async for batch in batches(actions, size):
+            for bulk_data, bulk_actions in _chunk_actions(
+                map(expand_action, batch),
+                len(batch),
+                max_chunk_bytes,
+                serializer,
+            ):
+                pending.add(
+                    asyncio.ensure_future(
+                        send_chunk(
+                            client,
+                            bulk_data,
+                            bulk_actions,
+                            controller,
+                            max_retries,
+                            initial_backoff,
+                            max_backoff,
+                            **kwargs,
+                        )
+                    )
+                )
+                # Se espera antes de leer el siguiente chunk, para que su
+                # tamaño considere las respuestas recibidas
+                while len(pending) >= limit():
+                    done, pending = await asyncio.wait(
+                        pending, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    collect(done)
+
+        if pending:
+            done, pending = await asyncio.wait(pending)
+            collect(done)
+    finally:
+        for task in pending:
+            task.cancel()
+
+    return success, failures
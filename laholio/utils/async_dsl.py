@@ -1,9 +1,23 @@
 # -*- coding: utf-8 -*-
 """Clases del `elasticsearch_dsl` soportando métodos async."""
 import asyncio
+import copy
+import json
+from typing import Awaitable
+from typing import Callable
+from typing import Dict
+from typing import Hashable
+from typing import List
 
+from elasticsearch.exceptions import TransportError
+from elasticsearch_dsl import MultiSearch
 from elasticsearch_dsl import Search
 from elasticsearch_dsl.connections import connections
+from elasticsearch_dsl.response import Response
+
+
+_SCAN_DONE = object()
+"""Marca que deja cada tajada de :meth:`AsyncSearch.scan` al terminar."""
 
 
 class AsyncTasks:
@@ -36,21 +50,125 @@ class AsyncTasks:
         return result
 
 
+class SingleFlight:
+    """Comparte una única ejecución entre llamadas concurrentes idénticas.
+
+    La primera llamada con una llave lanza la tarea; las que llegan
+    mientras está en vuelo esperan el mismo resultado (o excepción). Cada
+    llamador espera a través de :func:`asyncio.shield`, por lo que
+    cancelar a uno no cancela la tarea compartida. La tarea solo se
+    cancela cuando todos sus llamadores fueron cancelados.
+
+    Si la ejecución se compartió, cada llamador recibe su propia copia
+    del resultado, de manera que puede modificarlo (e.g. al serializar
+    una respuesta de :meth:`AsyncSearch.execute_raw`) sin afectar a los
+    demás. Si no, recibe el resultado sin copiar.
+
+    No hay caché: una vez terminada la tarea, la llave se olvida.
+
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, List] = {}
+
+    def __len__(self):
+        return len(self._inflight)
+
+    def _forget(self, key: Hashable, entry: List):
+        if self._inflight.get(key) is entry:
+            del self._inflight[key]
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable]):
+        """Ejecuta `factory()` o se une a la ejecución en vuelo de `key`."""
+        entry = self._inflight.get(key)
+        if entry is None:
+            task = asyncio.ensure_future(factory())
+            # Tarea, llamadores esperando y si es que se compartió
+            entry = [task, 0, False]
+            self._inflight[key] = entry
+            task.add_done_callback(
+                lambda _, entry=entry: self._forget(key, entry)
+            )
+        else:
+            entry[2] = True
+
+        task = entry[0]
+        entry[1] += 1
+        try:
+            result = await asyncio.shield(task)
+            return copy.deepcopy(result) if entry[2] else result
+        finally:
+            entry[1] -= 1
+            if not entry[1] and not task.done():
+                self._forget(key, entry)
+                task.cancel()
+
+
 class AsyncSearch(Search):
     """Implementa `execute`, `count` y `scan` de manera asíncrona."""
 
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._single_flight = None
+
+    def _clone(self):
+        s = super()._clone()
+        s._single_flight = self._single_flight
+        return s
+
+    def single_flight(self, group: SingleFlight):
+        """Coalesce las ejecuciones concurrentes idénticas en `group`.
+
+        Dos búsquedas son idénticas si apuntan a la misma conexión e
+        índice, y tienen el mismo cuerpo y parámetros.
+
+        """
+        s = self._clone()
+        s._single_flight = group
+        return s
+
+    def _flight_key(self, es, body: dict) -> Hashable:
+        return (
+            id(es),
+            tuple(self._index or ()),
+            json.dumps(body, sort_keys=True, default=str),
+            json.dumps(self._params, sort_keys=True, default=str),
+        )
+
+    async def _request(self) -> dict:
+        es = connections.get_connection(self._using)
+        body = self.to_dict()
+
+        def request():
+            return es.search(index=self._index, body=body, **self._params)
+
+        if self._single_flight is None:
+            return await request()
+        return await self._single_flight.do(
+            self._flight_key(es, body), request
+        )
+
     async def execute(self, ignore_cache=False):
         """Ejecuta de manera asincrónica la busqueda."""
         if ignore_cache or not hasattr(self, "_response"):
-            es = connections.get_connection(self._using)
-
-            response = await es.search(
-                index=self._index, body=self.to_dict(), **self._params
-            )
-
+            response = await self._request()
             self._response = self._response_class(self, response)
         return self._response
 
+    async def execute_raw(self) -> dict:
+        """Ejecuta la búsqueda y retorna la respuesta JSON sin envolver.
+
+        Evita construir la :class:`elasticsearch_dsl.response.Response` y
+        los `Hit` de cada documento: la respuesta es el diccionario que
+        entrega el transporte. Pensado para las búsquedas cuyos resultados
+        solo se serializan. La respuesta no queda guardada en la búsqueda.
+
+        Con single-flight, cada llamador coalescido recibe su propia copia
+        del diccionario. Ver :class:`SingleFlight`.
+
+        """
+        return await self._request()
+
     async def count(self):
         """Retorna el número de matches de manera asincrónica."""
         if hasattr(self, "_response"):
@@ -64,7 +182,214 @@ class AsyncSearch(Search):
 
         return count["count"]
 
-    def scan(self):
-        # TODO : Este método usa el scan de elasticsearch-py, la conversión
-        # asincrona debe ser estudiada.
-        raise NotImplementedError("Este método debe ser convertido a async")
+    async def _scan_slice(  # pylint: disable=too-many-arguments
+        self, es, body: dict, params: dict, scroll: str, queue: asyncio.Queue
+    ):
+        """Recorre una tajada del scroll dejando cada página en `queue`.
+
+        Al terminar deja `_SCAN_DONE`, o la excepción si es que hubo una.
+        El contexto de scroll se libera siempre, incluso si la tarea es
+        cancelada.
+
+        """
+        scroll_id = None
+        try:
+            response = await es.search(
+                index=self._index, body=body, scroll=scroll, **params
+            )
+            while True:
+                scroll_id = response.get("_scroll_id")
+                hits = response["hits"]["hits"]
+                if not hits:
+                    break
+                await queue.put(hits)
+                response = await es.scroll(
+                    body={"scroll_id": scroll_id, "scroll": scroll}
+                )
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:  # pylint: disable=broad-except
+            await queue.put(exc)
+        else:
+            await queue.put(_SCAN_DONE)
+        finally:
+            if scroll_id is not None:
+                await es.clear_scroll(
+                    body={"scroll_id": [scroll_id]}, ignore=(404,)
+                )
+
+    async def scan(
+        self, size: int = 1000, scroll: str = "5m", slices: int = 1
+    ):
+        """Recorre de manera asincrónica todos los matches de la búsqueda.
+
+        Generador asíncrono equivalente a
+        :meth:`elasticsearch_dsl.Search.scan`: usa la scroll API ordenando
+        por `_doc` (a menos que la búsqueda tenga un orden propio).
+
+        Con `slices > 1` el scroll se divide en tajadas (sliced scroll) que
+        se consumen de manera concurrente y se mezclan en un solo iterador,
+        sin orden entre tajadas. Cada tajada deja sus páginas en una cola
+        acotada, por lo que en memoria hay a lo más del orden de `slices`
+        páginas: si el consumidor es lento, las tajadas esperan. Al
+        terminar, fallar o ser cancelado el recorrido se liberan todos los
+        contextos de scroll. Si el consumidor sale antes del `async for`,
+        debe llamar a `aclose()` del generador para liberarlos de
+        inmediato y no al ser recolectado.
+
+        Args:
+            size: Documentos por página de cada tajada.
+            scroll: Tiempo que se mantiene abierto cada contexto entre
+                páginas.
+            slices: Número de tajadas a consumir en paralelo.
+
+        Ver:
+            https://www.elastic.co/guide/en/elasticsearch/reference/6.8/search-request-scroll.html#sliced-scroll
+
+        """
+        if slices < 1:
+            raise ValueError("`slices` debe ser >= 1")
+
+        es = connections.get_connection(self._using)
+
+        body = self.to_dict()
+        body.setdefault("sort", ["_doc"])
+        body["size"] = size
+
+        params = dict(self._params)
+        for name in ("size", "from_", "scroll"):
+            params.pop(name, None)
+
+        queue: asyncio.Queue = asyncio.Queue(maxsize=slices)
+
+        def slice_body(slice_id):
+            if slices == 1:
+                return body
+            return {**body, "slice": {"id": slice_id, "max": slices}}
+
+        tasks = [
+            asyncio.ensure_future(
+                self._scan_slice(
+                    es, slice_body(slice_id), params, scroll, queue
+                )
+            )
+            for slice_id in range(slices)
+        ]
+
+        pending = slices
+        try:
+            while pending:
+                page = await queue.get()
+                if page is _SCAN_DONE:
+                    pending -= 1
+                    continue
+                if isinstance(page, Exception):
+                    raise page
+                for hit in page:
+                    yield self._get_result(hit)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+class AsyncMultiSearch(MultiSearch):
+    """Implementa `execute` de manera asíncrona.
+
+    A diferencia de :class:`elasticsearch_dsl.MultiSearch`, los parámetros
+    de cada búsqueda que no son válidos en la cabecera de `_msearch`
+    (`size` y `from_`) se mueven al cuerpo de la búsqueda, de manera que
+    las búsquedas construidas con `.params(size=...)` se puedan agrupar.
+
+    Por omisión, una búsqueda que falla no hace fallar a las demás: su
+    posición en la respuesta lleva la :class:`TransportError`, que se
+    levanta solo al pasarla por :meth:`raise_for_error`.
+
+    """
+
+    HEADER_PARAMS = (
+        "routing",
+        "preference",
+        "search_type",
+        "request_cache",
+        "allow_partial_search_results",
+    )
+    BODY_PARAMS = {"size": "size", "from_": "from"}
+
+    def to_dict(self):
+        out = []
+        for s in self._searches:
+            meta = {}
+            if s._index:
+                meta["index"] = s._index
+            if s._doc_type:
+                meta["type"] = s._get_doc_type()
+
+            body = s.to_dict()
+            for name, value in s._params.items():
+                if name in self.HEADER_PARAMS:
+                    meta[name] = value
+                elif name in self.BODY_PARAMS:
+                    body.setdefault(self.BODY_PARAMS[name], value)
+                else:
+                    raise ValueError(
+                        "Parámetro `{}` no soportado en `_msearch`".format(
+                            name
+                        )
+                    )
+
+            out.append(meta)
+            out.append(body)
+
+        return out
+
+    @staticmethod
+    def raise_for_error(response):
+        """Levanta el error de una respuesta de :meth:`execute`, si lo es.
+
+        Args:
+            response: Un elemento de la lista que retorna :meth:`execute`.
+
+        Returns:
+            La misma respuesta, si no es un error.
+
+        """
+        if isinstance(response, TransportError):
+            raise response
+        return response
+
+    async def execute(self, ignore_cache=False, raise_on_error=False):
+        """Ejecuta de manera asincrónica las búsquedas en un request.
+
+        Args:
+            ignore_cache: Vuelve a consultar aunque ya haya respuesta.
+            raise_on_error: Si es `True`, cualquier búsqueda fallida levanta
+                su error. Si no, el error queda en su posición.
+
+        Returns:
+            Una :class:`Response` o una :class:`TransportError` por búsqueda.
+
+        """
+        if ignore_cache or not hasattr(self, "_response"):
+            es = connections.get_connection(self._using)
+
+            responses = await es.msearch(
+                index=self._index,
+                doc_type=self._get_doc_type(),
+                body=self.to_dict(),
+                **self._params,
+            )
+
+            out = []
+            for s, r in zip(self._searches, responses["responses"]):
+                if r.get("error", False):
+                    r = TransportError("N/A", r["error"]["type"], r["error"])
+                    if raise_on_error:
+                        raise r
+                else:
+                    r = Response(s, r)
+                out.append(r)
+
+            self._response = out
+
+        return self._response
@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""Filtro de Bloom para descartar códigos sku que no existen.
+
+Un filtro de Bloom responde si una llave *puede* estar en el conjunto o
+si *seguro no está*, con una tasa acotada de falsos positivos y sin
+falsos negativos. Los borrados no se pueden quitar: un sku borrado sigue
+contando como posible, lo que solo cuesta una búsqueda.
+
+El filtro se puede guardar en un archivo y abrir con `mmap`, de manera
+que todos los workers de la API compartan las mismas páginas en memoria.
+
+Un filtro es una foto del índice: las llaves agregadas después por otros
+procesos no están en él, por lo que un "seguro no está" solo vale para
+los documentos escritos antes de :attr:`BloomFilter.created`. Ver
+:meth:`BloomFilter.age` y :meth:`BloomFilter.changed`.
+
+Ver:
+    https://en.wikipedia.org/wiki/Bloom_filter
+
+"""
+import hashlib
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import Iterable
+from typing import Optional
+from typing import Tuple
+
+_HEADER = struct.Struct("<4sBQIQd")
+"""Firma, versión, número de bits, número de hashes, llaves agregadas y
+fecha de creación."""
+
+_MAGIC = b"LHBF"
+_VERSION = 2
+
+
+class BloomFilter:
+    """Filtro de Bloom sobre llaves de texto.
+
+    Args:
+        capacity: Llaves que se espera agregar. Con más llaves la tasa de
+            falsos positivos sube por sobre `error_rate`.
+        error_rate: Tasa de falsos positivos con `capacity` llaves.
+
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        if capacity < 1:
+            raise ValueError("`capacity` debe ser >= 1")
+        if not 0 < error_rate < 1:
+            raise ValueError("`error_rate` debe estar entre 0 y 1")
+
+        num_bits = math.ceil(
+            -capacity * math.log(error_rate) / math.log(2) ** 2
+        )
+        num_hashes = max(1, round(num_bits / capacity * math.log(2)))
+
+        self._init(
+            num_bits,
+            num_hashes,
+            0,
+            bytearray((num_bits + 7) // 8),
+            time.time(),
+        )
+
+    def _init(  # pylint: disable=too-many-arguments
+        self, num_bits: int, num_hashes: int, count: int, bits, created: float
+    ):
+        self.num_bits = num_bits
+        self.num_hashes = num_hashes
+        self.count = count
+        # Las llaves escritas desde este momento pueden faltar
+        self.created = created
+        self.path: Optional[str] = None
+        self._bits = bits
+        self._mmap: Optional[mmap.mmap] = None
+        self._stat: Optional[Tuple[int, int]] = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self.count
+
+    def _positions(self, key: str) -> Iterable[int]:
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.num_hashes):
+            yield (first + i * second) % self.num_bits
+
+    def add(self, key: str):
+        """Agrega `key` al filtro."""
+        with self._lock:
+            for position in self._positions(key):
+                self._bits[position >> 3] |= 1 << (position & 7)
+            self.count += 1
+
+    def update(self, keys: Iterable[str]):
+        """Agrega todas las `keys` al filtro."""
+        for key in keys:
+            self.add(key)
+
+    def __contains__(self, key: str) -> bool:
+        bits = self._bits
+        return all(
+            bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(key)
+        )
+
+    def error_rate(self) -> float:
+        """Tasa de falsos positivos estimada con las llaves agregadas."""
+        return (
+            1 - math.exp(-self.num_hashes * self.count / self.num_bits)
+        ) ** self.num_hashes
+
+    def nbytes(self) -> int:
+        """Bytes del arreglo de bits."""
+        return len(self._bits)
+
+    def age(self) -> float:
+        """Segundos desde :attr:`created`."""
+        return time.time() - self.created
+
+    def changed(self) -> bool:
+        """Si el archivo de :meth:`open` fue reemplazado por otro filtro."""
+        if self.path is None:
+            return False
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        return (stat.st_ino, stat.st_mtime_ns) != self._stat
+
+    def save(self, path: str):
+        """Guarda el filtro en `path`.
+
+        Se escribe un archivo temporal que luego reemplaza a `path`, de
+        manera que los procesos que lo tengan abierto sigan viendo la
+        versión anterior completa.
+
+        """
+        tmp_path = "{}.{}.tmp".format(path, os.getpid())
+        with self._lock:
+            with open(tmp_path, "wb") as file:
+                file.write(
+                    _HEADER.pack(
+                        _MAGIC,
+                        _VERSION,
+                        self.num_bits,
+                        self.num_hashes,
+                        self.count,
+                        self.created,
+                    )
+                )
+                file.write(self._bits)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def open(cls, path: str) -> "BloomFilter":
+        """Abre el filtro guardado en `path` mapeándolo a memoria.
+
+        Las páginas se comparten entre los procesos que abran el mismo
+        archivo. Las llaves que se agreguen después (e.g. con
+        :meth:`bulk_listener`) copian solo las páginas que modifican y no
+        se escriben en el archivo, por lo que cada proceso solo ve las
+        suyas.
+
+        """
+        with open(path, "rb") as file:
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_COPY)
+            stat = os.fstat(file.fileno())
+
+        try:
+            header = _HEADER.unpack_from(mapped)
+        except struct.error:
+            header = (None,) * 6
+        magic, version, num_bits, num_hashes, count, created = header
+        if magic != _MAGIC or version != _VERSION:
+            mapped.close()
+            raise ValueError("{} no es un filtro de Bloom".format(path))
+
+        bloom = cls.__new__(cls)
+        bloom._init(
+            num_bits,
+            num_hashes,
+            count,
+            memoryview(mapped)[
+                _HEADER.size : _HEADER.size + (num_bits + 7) // 8  # noqa: E203
+            ],
+            created,
+        )
+        bloom.path = path
+        bloom._mmap = mapped
+        bloom._stat = (stat.st_ino, stat.st_mtime_ns)
+        return bloom
+
+    def close(self):
+        """Libera el archivo mapeado, si es que hay."""
+        if self._mmap is not None:
+            self._bits.release()
+            self._mmap.close()
+            self._mmap = None
+
+    def bulk_listener(self, action: dict):
+        """Listener de :meth:`laholio.crud.BulkInsertUpdateDelete.add_listener`.
+
+        Agrega el `_id` de cada documento indexado o actualizado. Solo
+        actualiza el filtro de este proceso.
+
+        """
+        if action.get("_op_type") == "delete":
+            return
+        source = action.get("_source", action.get("doc"))
+        key = action.get("_id")
+        if key is None and isinstance(source, dict):
+            key = source.get("sku_id")
+        if key is not None:
+            self.add(str(key))
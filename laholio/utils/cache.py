@@ -0,0 +1,325 @@
+# -*- coding: utf-8 -*-
+"""Caché en memoria para resultados de búsquedas."""
+import copy
+import json
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Any
+from typing import Dict
+from typing import Hashable
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Set
+from typing import Tuple
+from typing import Union
+
+_CACHES = weakref.WeakSet()  # type: ignore
+"""Cachés vivos del proceso, usados por :func:`invalidate`."""
+
+ALL_PROVIDERS = "*"
+"""Marca de las entradas que no están filtradas por proveedor."""
+
+MISSING = object()
+"""Centinela que retorna :meth:`SearchResultCache.get` cuando no hay hit."""
+
+
+class StampedKey(tuple):
+    """Llave con la generación de sus entradas al momento de crearla.
+
+    La generación no participa de la igualdad ni del hash: la llave
+    encuentra las mismas entradas que la tupla original. Ver
+    :meth:`SearchResultCache.stamp`.
+
+    """
+
+    generation: Tuple[int, ...] = ()
+
+
+def normalize_text(text: str) -> str:
+    """Normaliza el texto de búsqueda para usarlo como llave.
+
+    Replica lo que hace el `SEARCH_ANALYZER` antes de tokenizar:
+    minúsculas y separación por espacios.
+
+    """
+    return " ".join(text.lower().split())
+
+
+def _as_tuple(value: Optional[Union[Any, Iterable[Any]]]) -> Tuple:
+    if value is None:
+        return tuple()
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return tuple(sorted(value, key=str))
+    return (value,)
+
+
+class CacheStats:  # pylint: disable=too-few-public-methods
+    """Contadores del caché."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.stale_sets = 0
+
+    def as_dict(self) -> Dict[str, int]:
+        """Contadores como diccionario, útil para loggear."""
+        return dict(
+            hits=self.hits,
+            misses=self.misses,
+            evictions=self.evictions,
+            expirations=self.expirations,
+            invalidations=self.invalidations,
+            stale_sets=self.stale_sets,
+        )
+
+
+class SearchResultCache:
+    """Caché LRU acotado en bytes y con TTL para resultados de búsqueda.
+
+    Las entradas se registran por índice y proveedor, de manera que una
+    escritura sobre un proveedor solo invalida las búsquedas que pueden
+    verse afectadas por ella. Las búsquedas sin filtro de proveedor se
+    invalidan frente a cualquier escritura en el índice.
+
+    El caché es local al proceso: la invalidación la gatilla
+    :meth:`laholio.crud.BulkInsertUpdateDelete.bulk_request` en el mismo
+    proceso mediante :func:`invalidate`.
+
+    Una búsqueda que empezó antes de una invalidación puede terminar
+    después y guardar un resultado anterior a la escritura. Para evitarlo
+    cada invalidación avanza la generación del índice o de los
+    proveedores afectados; la llave se marca con :meth:`stamp` antes de
+    consultar y :meth:`set` descarta el valor si la generación cambió
+    entretanto.
+
+    Las escrituras solo son visibles para las búsquedas luego del refresh
+    del índice. Para que una búsqueda posterior a la invalidación no
+    guarde el estado anterior, escribir con `refresh="wait_for"`: la
+    invalidación ocurre al terminar el bulk, después del refresh.
+
+    Args:
+        max_bytes: Tamaño máximo aproximado (JSON serializado) de los
+            valores almacenados.
+        ttl: Segundos de vida de cada entrada.
+        clock: Reloj monotónico, configurable para pruebas.
+
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 32 * 1024 * 1024,
+        ttl: float = 60.0,
+        clock=time.monotonic,
+    ):
+        if max_bytes <= 0:
+            raise ValueError("`max_bytes` debe ser positivo")
+        if ttl <= 0:
+            raise ValueError("`ttl` debe ser positivo")
+
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, Tuple[Any, int, float]]" = (
+            OrderedDict()
+        )
+        self._by_provider: Dict[Tuple[str, Any], Set[Hashable]] = {}
+        self._generations: Dict[Tuple[str, Any], int] = {}
+        self._nbytes = 0
+
+        _CACHES.add(self)
+
+    @staticmethod
+    def make_key(  # pylint: disable=too-many-arguments
+        index_name: str,
+        text: str,
+        operator: str,
+        rut_proveedor_: Optional[Union[int, List[int]]] = None,
+        includes: Optional[List[str]] = None,
+        excludes: Optional[List[str]] = None,
+        size: Optional[int] = None,
+        **extra,
+    ) -> Tuple:
+        """Construye la llave de una búsqueda.
+
+        El primer elemento es el índice y el cuarto la tupla de
+        proveedores, ambos usados en la invalidación.
+
+        """
+        return (
+            index_name,
+            normalize_text(text),
+            operator,
+            _as_tuple(rut_proveedor_),
+            _as_tuple(includes),
+            _as_tuple(excludes),
+            size,
+            tuple(sorted(extra.items())),
+        )
+
+    @staticmethod
+    def _sizeof(value: Any) -> int:
+        return len(json.dumps(value, default=str))
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes aproximados ocupados por los valores."""
+        return self._nbytes
+
+    def _provider_slots(self, key: Tuple) -> List[Tuple[str, Any]]:
+        index_name, providers = key[0], key[3]
+        return [(index_name, p) for p in providers or (ALL_PROVIDERS,)]
+
+    def _generation(self, key: Tuple) -> Tuple[int, ...]:
+        slots = [(key[0], None)] + self._provider_slots(key)
+        return tuple(self._generations.get(slot, 0) for slot in slots)
+
+    def stamp(self, key: Tuple) -> StampedKey:
+        """Marca `key` con la generación actual de sus entradas.
+
+        Se llama antes de consultar el cluster, de manera que :meth:`set`
+        pueda descartar el resultado si entretanto hubo una invalidación
+        que lo afecta.
+
+        """
+        stamped = StampedKey(key)
+        with self._lock:
+            stamped.generation = self._generation(key)
+        return stamped
+
+    def _drop(self, key: Hashable):
+        _, nbytes, _ = self._entries.pop(key)
+        self._nbytes -= nbytes
+        for slot in self._provider_slots(key):  # type: ignore
+            keys = self._by_provider.get(slot)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_provider[slot]
+
+    def get(self, key: Tuple, default: Any = MISSING) -> Any:
+        """Retorna una copia del valor asociado a `key`, o `default`."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats.misses += 1
+                return default
+
+            value, _, expires = entry
+            if expires <= self._clock():
+                self._drop(key)
+                self.stats.expirations += 1
+                self.stats.misses += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+
+        return copy.deepcopy(value)
+
+    def set(self, key: Tuple, value: Any, nbytes: Optional[int] = None):
+        """Guarda `value` bajo `key`, desalojando las entradas más antiguas.
+
+        Si `key` fue marcada con :meth:`stamp` y desde entonces hubo una
+        invalidación que la afecta, el valor no se guarda.
+
+        Args:
+            key: Llave construida con :meth:`make_key`.
+            value: Valor a guardar.
+            nbytes: Tamaño del valor. Si no se entrega, se estima con el
+                largo de su serialización JSON.
+
+        """
+        nbytes = self._sizeof(value) if nbytes is None else nbytes
+        if nbytes > self.max_bytes:
+            return
+
+        value = copy.deepcopy(value)
+
+        with self._lock:
+            if isinstance(key, StampedKey) and key.generation != (
+                self._generation(key)
+            ):
+                self.stats.stale_sets += 1
+                return
+            key = tuple(key)
+
+            if key in self._entries:
+                self._drop(key)
+
+            while self._entries and self._nbytes + nbytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.stats.evictions += 1
+
+            self._entries[key] = (value, nbytes, self._clock() + self.ttl)
+            self._nbytes += nbytes
+            for slot in self._provider_slots(key):
+                self._by_provider.setdefault(slot, set()).add(key)
+
+    def invalidate(
+        self, index_name: str, providers: Optional[Iterable[int]] = None
+    ) -> int:
+        """Invalida las entradas afectadas por una escritura.
+
+        También avanza la generación de lo invalidado, aunque no tenga
+        entradas, para las búsquedas en curso. Ver :meth:`stamp`.
+
+        Args:
+            index_name: Índice en el que se escribió.
+            providers: Ruts escritos. Si es `None` se invalida todo el
+                índice.
+
+        Returns:
+            Número de entradas invalidadas.
+
+        """
+        with self._lock:
+            if providers is None:
+                slots = [(index_name, None)]
+                keys = {key for key in self._entries if key[0] == index_name}
+            else:
+                slots = [(index_name, ALL_PROVIDERS)]
+                slots.extend((index_name, p) for p in providers)
+                keys = set(
+                    self._by_provider.get((index_name, ALL_PROVIDERS), ())
+                )
+                for provider in providers:
+                    keys.update(
+                        self._by_provider.get((index_name, provider), ())
+                    )
+
+            for slot in slots:
+                self._generations[slot] = self._generations.get(slot, 0) + 1
+            for key in keys:
+                self._drop(key)
+            self.stats.invalidations += len(keys)
+
+        return len(keys)
+
+    def clear(self):
+        """Vacía el caché sin tocar los contadores."""
+        with self._lock:
+            self._entries.clear()
+            self._by_provider.clear()
+            self._nbytes = 0
+
+
+def invalidate(
+    index_name: str, providers: Optional[Iterable[int]] = None
+) -> int:
+    """Invalida en todos los cachés del proceso lo escrito en un índice."""
+    providers = None if providers is None else set(providers)
+    return sum(
+        cache.invalidate(index_name, providers) for cache in list(_CACHES)
+    )
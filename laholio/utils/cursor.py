@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""Cursores de paginación opacos y firmados.
+
+Un cursor guarda todo lo necesario para pedir la página siguiente de una
+búsqueda (cuerpo, parámetros y posición `search_after`), de manera que
+cualquier worker pueda continuarla sin estado compartido. El contenido se
+comprime y se firma con HMAC-SHA256 usando `S.CURSOR_SECRET`, así un
+cliente no puede alterar la búsqueda que viaja en él.
+
+"""
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+import os
+import zlib
+from functools import lru_cache
+from typing import Iterable
+from typing import Optional
+
+from laholio import S
+from laholio import logger
+from laholio.exceptions import InvalidCursor
+
+SIGNATURE_BYTES = 16
+
+
+@lru_cache(maxsize=None)
+def _default_secret() -> bytes:
+    """`S.CURSOR_SECRET`, obligatoria en producción.
+
+    En otros ambientes, si no está configurada, se usa una llave aleatoria
+    del proceso.
+
+    """
+    if S.CURSOR_SECRET is None:
+        logger.warning(
+            "CURSOR_SECRET no configurado, los cursores solo son válidos "
+            "en este proceso"
+        )
+        return os.urandom(32)
+    return S.CURSOR_SECRET.get_secret_value().encode()
+
+
+def _sign(payload: bytes, secret: bytes) -> bytes:
+    return hmac.new(secret, payload, hashlib.sha256).digest()[:SIGNATURE_BYTES]
+
+
+def encode_cursor(state: dict, secret: Optional[bytes] = None) -> str:
+    """Codifica `state` como un token url-safe firmado."""
+    secret = secret or _default_secret()
+    payload = zlib.compress(
+        json.dumps(
+            state, separators=(",", ":"), sort_keys=True, default=str
+        ).encode()
+    )
+    token = base64.urlsafe_b64encode(_sign(payload, secret) + payload)
+    return token.rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(token: str, secret: Optional[bytes] = None) -> dict:
+    """Valida la firma de `token` y retorna el estado que contiene.
+
+    Raises:
+        InvalidCursor: Si el token está mal formado o su firma no
+            corresponde.
+
+    """
+    secret = secret or _default_secret()
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+    except (binascii.Error, TypeError, ValueError):
+        raise InvalidCursor(reason="formato")
+
+    signature, payload = raw[:SIGNATURE_BYTES], raw[SIGNATURE_BYTES:]
+    if not hmac.compare_digest(signature, _sign(payload, secret)):
+        raise InvalidCursor(reason="firma")
+
+    return json.loads(zlib.decompress(payload).decode())
+
+
+class SearchPage(list):
+    """Página de resultados serializados.
+
+    Es una lista común con el atributo `cursor`: el token para continuar
+    la paginación con :meth:`laholio.crud.SkuSearch.see_more`, o `None`
+    si no hay más resultados.
+
+    """
+
+    def __init__(self, results: Iterable = (), cursor: Optional[str] = None):
+        super().__init__(results)
+        self.cursor = cursor
@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""Codificación directa de documentos al cuerpo NDJSON de la bulk API.
+
+:meth:`laholio.crud.BulkInsertUpdateDelete.bulk_request` arma un
+diccionario de acción por documento, que `elasticsearch.helpers` vuelve a
+copiar y separar en las líneas de acción y de fuente antes de
+serializarlas. :class:`BulkEncoder` escribe esas líneas directamente en
+bytes desde los diccionarios (o filas) de entrada, con la parte fija de la
+línea de acción precalculada.
+
+Con el backend `json` estándar, los bytes son idénticos a los que envía
+`bulk_request(documents, document_type="raw")`, con cualquier `op_type`
+y `with_ids`, incluidos los cortes de los chunks. Ambos caminos separan
+el `_id` y la fuente con :func:`split_document`.
+
+"""
+import json
+from typing import Callable
+from typing import Iterable
+from typing import Iterator
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+from elasticsearch.serializer import JSONSerializer
+
+from laholio.schemas import Sku
+from laholio.utils.async_bulk import MAX_CHUNK_BYTES
+from laholio.utils.serializer import JSON_BACKEND
+from laholio.utils.serializer import _json
+
+_DEFAULT = JSONSerializer().default
+
+
+def dumps(data) -> bytes:
+    """Igual a `JSONSerializer.dumps` de `elasticsearch-py`, en UTF-8."""
+    return json.dumps(
+        data, default=_DEFAULT, ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8", "surrogatepass")
+
+
+def fast_dumps(data) -> bytes:
+    """Serializa con `orjson` si está instalado.
+
+    El JSON es equivalente, pero no necesariamente idéntico byte a byte
+    al de :func:`dumps` (e.g. en la notación de algunos `float`).
+
+    """
+    return _json.dumps(data, default=_DEFAULT)
+
+
+def split_document(
+    document: dict, op_type: str, with_ids: bool
+) -> Tuple[object, Optional[dict]]:
+    """`_id` y fuente de un documento de la bulk API.
+
+    Ver el formato en
+    :meth:`laholio.crud.BulkInsertUpdateDelete.prepare_bulk_raw`. Sin
+    `_id`, el documento es la fuente, aunque también se acepta
+    `{"_source": source}`.
+
+    Returns:
+        El `_id` (`None` sin `with_ids`) y la fuente, que puede ser `None`
+        en un `delete`.
+
+    """
+    if with_ids:
+        if op_type == "delete":
+            return document["_id"], document.get("_source")
+        return document["_id"], document["_source"]
+    if "_source" in document:
+        return None, document["_source"]
+    return None, document
+
+
+class BulkEncoder:
+    """Codifica documentos en chunks de la bulk API listos para enviar.
+
+    Los documentos tienen el formato de
+    :meth:`laholio.crud.BulkInsertUpdateDelete.prepare_bulk_raw`, o son
+    filas con los valores de `columns`.
+
+    Args:
+        index_name: Índice en el que se escribe.
+        op_type: `index`, `update` o `delete`.
+        with_ids: Si los documentos traen `_id`.
+        columns: Si se entrega, los documentos son filas (secuencias) con
+            estos campos, en ese orden.
+        id_column: Con `columns`, campo cuyo valor es el `_id`. El campo
+            se mantiene en el documento.
+        fast_json: Si es `True` y `orjson` está instalado, se serializa
+            con :func:`fast_dumps`.
+        chunk_size: Máximo de documentos por chunk.
+        max_chunk_bytes: Máximo de bytes por chunk.
+        on_document: Función que recibe el `_id` y la fuente de cada
+            documento codificado.
+
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        index_name: str,
+        op_type: str = "index",
+        with_ids: bool = True,
+        columns: Optional[Sequence[str]] = None,
+        id_column: Optional[str] = None,
+        fast_json: bool = False,
+        chunk_size: int = 500,
+        max_chunk_bytes: int = MAX_CHUNK_BYTES,
+        on_document: Optional[Callable[[object, dict], None]] = None,
+    ):
+        if op_type not in ("index", "update", "delete"):
+            raise ValueError(
+                "`op_type` pueder ser `index`, `update` o `delete`"
+            )
+        if columns is not None and with_ids and id_column not in columns:
+            raise ValueError("`id_column` debe estar en `columns`")
+
+        self.op_type = op_type
+        self.with_ids = with_ids
+        self.columns = tuple(columns) if columns is not None else None
+        self.id_column = id_column
+        self.chunk_size = chunk_size
+        self.max_chunk_bytes = max_chunk_bytes
+        self.on_document = on_document
+        self.dumps: Callable[[object], bytes] = (
+            fast_dumps if fast_json and JSON_BACKEND == "orjson" else dumps
+        )
+
+        # Mismo orden de llaves que `elasticsearch.helpers.expand_action`
+        self._action_head = b'{"%s":{"_index":%s' % (
+            op_type.encode(),
+            dumps(index_name),
+        )
+        self._action_type = b',"_type":"doc"'
+        self._buffer = bytearray()
+
+    def _split(self, document) -> Tuple[object, dict]:
+        """`_id` y fuente de `document`."""
+        if self.columns is not None:
+            source = dict(zip(self.columns, document))
+            return source.get(self.id_column), source
+        return split_document(document, self.op_type, self.with_ids)
+
+    def _routing(self, document, _id, source) -> Optional[str]:
+        """Routing de `document`. Ver
+        :meth:`laholio.crud.BulkInsertUpdateDelete._with_routing`.
+
+        """
+        if self.columns is None and self.with_ids and "_routing" in document:
+            return document["_routing"]
+        rut_proveedor_ = (
+            source.get("rut_proveedor_") if isinstance(source, dict) else None
+        )
+        if rut_proveedor_ is None and self.op_type != "index":
+            return Sku.routing_from_id(_id)
+        return Sku.build_routing(rut_proveedor_)
+
+    def encode(self, document) -> Tuple[bytes, Optional[bytes]]:
+        """Líneas de acción y de fuente de `document`, sin el salto final.
+
+        La fuente es `None` en un `delete`.
+
+        """
+        _id, source = self._split(document)
+        if self.on_document is not None:
+            self.on_document(_id, source)
+
+        action = self._action_head
+        routing = self._routing(document, _id, source)
+        if routing is not None:
+            action += b',"_routing":' + dumps(routing)
+        action += self._action_type
+        if self.with_ids:
+            action += b',"_id":' + dumps(_id)
+        action += b"}}"
+
+        if self.op_type == "delete":
+            return action, None
+        if self.op_type == "update":
+            source = {"doc": source}
+        return action, self.dumps(source)
+
+    def chunks(self, documents: Iterable) -> Iterator[Tuple[bytes, int]]:
+        """Cuerpos de la bulk API para `documents`.
+
+        Los chunks se cortan igual que en `elasticsearch.helpers`: al
+        llegar a `chunk_size` documentos o cuando el siguiente documento
+        haría pasar el chunk de `max_chunk_bytes`.
+
+        Returns:
+            Un iterador de pares con el cuerpo y su número de documentos.
+
+        """
+        buffer = self._buffer
+        del buffer[:]
+        count = 0
+        for document in documents:
+            action, source = self.encode(document)
+            # +1 por cada salto de línea
+            size = len(action) + 1
+            if source is not None:
+                size += len(source) + 1
+
+            if count and (
+                len(buffer) + size > self.max_chunk_bytes
+                or count == self.chunk_size
+            ):
+                yield bytes(buffer), count
+                del buffer[:]
+                count = 0
+
+            buffer += action
+            buffer += b"\n"
+            if source is not None:
+                buffer += source
+                buffer += b"\n"
+            count += 1
+
+        if count:
+            yield bytes(buffer), count
+            del buffer[:]
@@ -0,0 +1,397 @@
+# -*- coding: utf-8 -*-
+"""Índice en memoria de prefijos de códigos sku.
+
+Responde el autocompletado de códigos (`sku` y `sku_fabricante`) sin ir
+al cluster. Los códigos se guardan normalizados en arreglos ordenados,
+uno por proveedor y uno global, y un prefijo se resuelve con búsqueda
+binaria.
+
+Replica el análisis del campo `sku`: `INDEX_ANALYZER_SKU` indexa los
+edge n-grams (de 3 a 20 caracteres, en minúsculas) de cada palabra del
+código, y `SEARCH_ANALYZER` separa la búsqueda por espacios.
+
+Las escrituras no reordenan los arreglos completos: van a un arreglo
+delta pequeño, que se mezcla con el base al consultar, y los códigos
+que dejan de valer en el base solo se marcan. El base se reconstruye
+cuando el delta pasa de :data:`COMPACT_MIN` códigos y de una fracción
+:data:`COMPACT_RATIO` del base, en una escritura y nunca al consultar.
+
+"""
+import sys
+import threading
+from bisect import bisect_left
+from bisect import bisect_right
+from heapq import merge
+from typing import AbstractSet
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Set
+from typing import Tuple
+
+from laholio.utils.spelling import normalize_word
+
+MIN_GRAM = 3
+"""Prefijo más corto que se responde, igual que el `min_gram` del sku."""
+
+MAX_GRAM = 20
+"""Prefijo más largo que se responde, igual que el `max_gram` del sku."""
+
+CODE_FIELDS = ("sku", "sku_fabricante")
+"""Campos del :class:`laholio.schemas.Sku` que se indexan."""
+
+COMPACT_MIN = 4096
+"""Escrituras pendientes en un arreglo bajo las que nunca se compacta."""
+
+COMPACT_RATIO = 8
+"""Se compacta cuando lo pendiente pasa de `1 / COMPACT_RATIO` del base."""
+
+
+class _SortedCodes:
+    """Códigos ordenados con un valor asociado a cada uno."""
+
+    __slots__ = ("codes", "values")
+
+    def __init__(self):
+        self.codes: List[str] = []
+        self.values: List[str] = []
+
+    def __len__(self):
+        return len(self.codes)
+
+    def extend(
+        self,
+        pairs: Iterable[Tuple[str, str]],
+        without: Optional[AbstractSet[str]] = None,
+    ):
+        """Agrega muchos códigos de una vez, reordenando una sola vez.
+
+        Los códigos ya guardados quedan antes que los nuevos iguales. El
+        orden es casi total, por lo que el costo es lineal más el de
+        ordenar `pairs`.
+
+        Args:
+            pairs: Pares de código y valor a agregar.
+            without: Valores cuyos códigos se quitan antes de agregar.
+
+        """
+        current = zip(self.codes, self.values)
+        if without:
+            current = (pair for pair in current if pair[1] not in without)
+        merged = sorted(list(current) + list(pairs), key=lambda pair: pair[0])
+        self.codes = [code for code, _ in merged]
+        self.values = [value for _, value in merged]
+
+    def insert(self, code: str, value: str):
+        """Agrega un código, después de los iguales ya guardados."""
+        position = bisect_right(self.codes, code)
+        self.codes.insert(position, code)
+        self.values.insert(position, value)
+
+    def discard(self, code: str, value: str):
+        """Quita el código `code` con valor `value`, si es que está."""
+        position = bisect_left(self.codes, code)
+        while position < len(self.codes) and self.codes[position] == code:
+            if self.values[position] == value:
+                del self.codes[position]
+                del self.values[position]
+                return
+            position += 1
+
+    def prefix(self, prefix: str) -> Iterable[Tuple[str, str]]:
+        """Códigos que empiezan con `prefix` y sus valores, en orden."""
+        position = bisect_left(self.codes, prefix)
+        while position < len(self.codes) and self.codes[position].startswith(
+            prefix
+        ):
+            yield self.codes[position], self.values[position]
+            position += 1
+
+    def nbytes(self) -> int:
+        return sys.getsizeof(self.codes) + sys.getsizeof(self.values)
+
+
+class _LayeredCodes:
+    """Arreglo base de códigos más las escrituras que aún no se mezclan.
+
+    Los valores de `hidden` no se leen del base; si se volvieron a
+    agregar, están en `delta`. Guarda cuántos códigos del base oculta
+    cada valor.
+
+    """
+
+    __slots__ = ("base", "delta", "hidden", "_hidden_codes")
+
+    def __init__(self):
+        self.base = _SortedCodes()
+        self.delta = _SortedCodes()
+        self.hidden: Dict[str, int] = {}
+        self._hidden_codes = 0
+
+    def __len__(self):
+        return len(self.base) - self._hidden_codes + len(self.delta)
+
+    def add(self, value: str, tokens: Tuple[str, ...]):
+        """Agrega los códigos de `value`, que no debe estar vigente."""
+        self.hidden.setdefault(value, 0)
+        for token in tokens:
+            self.delta.insert(token, value)
+
+    def remove(self, value: str, tokens: Tuple[str, ...]):
+        """Quita los códigos vigentes `tokens` de `value`."""
+        if value in self.hidden:
+            for token in tokens:
+                self.delta.discard(token, value)
+        else:
+            self.hidden[value] = len(tokens)
+            self._hidden_codes += len(tokens)
+
+    def needs_compaction(self) -> bool:
+        pending = len(self.delta) + len(self.hidden)
+        return pending > max(COMPACT_MIN, len(self.base) // COMPACT_RATIO)
+
+    def compact(self, pairs: Iterable[Tuple[str, str]] = ()):
+        """Mezcla el delta y `pairs` en el base, reordenando una vez."""
+        delta = zip(self.delta.codes, self.delta.values)
+        self.base.extend(list(delta) + list(pairs), without=self.hidden.keys())
+        self.delta = _SortedCodes()
+        self.hidden = {}
+        self._hidden_codes = 0
+
+    def prefix(self, prefix: str) -> Iterable[str]:
+        """Valores de los códigos que empiezan con `prefix`, en orden."""
+        base = (
+            pair
+            for pair in self.base.prefix(prefix)
+            if pair[1] not in self.hidden
+        )
+        for _, value in merge(
+            base, self.delta.prefix(prefix), key=lambda pair: pair[0]
+        ):
+            yield value
+
+    def codes(self) -> Iterable[str]:
+        return self.base.codes + self.delta.codes
+
+    def nbytes(self) -> int:
+        return (
+            self.base.nbytes()
+            + self.delta.nbytes()
+            + sys.getsizeof(self.hidden)
+        )
+
+
+def code_tokens(*codes: Optional[str]) -> Tuple[str, ...]:
+    """Palabras normalizadas de los códigos, sin repetir."""
+    tokens: List[str] = []
+    for code in codes:
+        for token in str(code or "").split():
+            token = normalize_word(token)
+            if token not in tokens:
+                tokens.append(token)
+    return tuple(tokens)
+
+
+class SkuPrefixIndex:
+    """Índice de prefijos de códigos sku por proveedor.
+
+    Se puede actualizar mientras se consulta: las escrituras y lecturas
+    toman un lock, que solo se disputa durante un `bulk_request`.
+
+    Las escrituras (:meth:`add` y :meth:`remove`) se aplican al delta
+    de cada arreglo afectado, sin reordenar el base, y una lectura
+    nunca reconstruye un arreglo. Solo la escritura que deja el delta
+    sobre el umbral lo compacta (ver :data:`COMPACT_RATIO`).
+
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._all = _LayeredCodes()
+        self._by_provider: Dict[int, _LayeredCodes] = {}
+        self._docs: Dict[str, Tuple[int, str, Tuple[str, ...]]] = {}
+
+    def __len__(self):
+        return len(self._docs)
+
+    @staticmethod
+    def is_code(text: str) -> bool:
+        """Indica si `text` es un prefijo de código que el índice responde."""
+        text = text.strip()
+        return bool(text) and len(text.split()) == 1
+
+    def _remove(self, sku_id: str):
+        """Quita los códigos vigentes de `sku_id`. Con el lock tomado."""
+        previous = self._docs.pop(sku_id, None)
+        if previous is None:
+            return
+        rut_proveedor_, _, tokens = previous
+        self._all.remove(sku_id, tokens)
+        provider = self._by_provider.get(rut_proveedor_)
+        if provider is None:
+            return
+        provider.remove(sku_id, tokens)
+        if not provider:
+            del self._by_provider[rut_proveedor_]
+        elif provider.needs_compaction():
+            provider.compact()
+
+    def add(self, sku_id: str, rut_proveedor_: int, sku: str, *codes: str):
+        """Agrega o reemplaza los códigos del sku `sku_id`."""
+        tokens = code_tokens(sku, *codes)
+        with self._lock:
+            self._remove(sku_id)
+            self._docs[sku_id] = (rut_proveedor_, sku, tokens)
+            provider = self._by_provider.setdefault(
+                rut_proveedor_, _LayeredCodes()
+            )
+            for codes in (self._all, provider):
+                codes.add(sku_id, tokens)
+                if codes.needs_compaction():
+                    codes.compact()
+
+    def remove(self, sku_id: str):
+        """Quita el sku `sku_id`, si es que está."""
+        with self._lock:
+            self._remove(sku_id)
+            if self._all.needs_compaction():
+                self._all.compact()
+
+    def add_many(self, documents: Iterable[dict]):
+        """Carga masiva de documentos, ordenando los arreglos una vez.
+
+        Los documentos deben tener `sku_id`, `rut_proveedor_` y `sku`, y
+        opcionalmente `sku_fabricante`. Los `sku_id` deben ser nuevos.
+
+        """
+        pairs: List[Tuple[str, str]] = []
+        by_provider: Dict[int, List[Tuple[str, str]]] = {}
+        with self._lock:
+            for document in documents:
+                sku_id = str(document["sku_id"])
+                rut_proveedor_ = document["rut_proveedor_"]
+                tokens = code_tokens(
+                    *(document.get(field) for field in CODE_FIELDS)
+                )
+                self._docs[sku_id] = (rut_proveedor_, document["sku"], tokens)
+                for token in tokens:
+                    pairs.append((token, sku_id))
+                    by_provider.setdefault(rut_proveedor_, []).append(
+                        (token, sku_id)
+                    )
+
+            self._all.compact(pairs)
+            for rut_proveedor_, provider_pairs in by_provider.items():
+                self._by_provider.setdefault(
+                    rut_proveedor_, _LayeredCodes()
+                ).compact(provider_pairs)
+
+    def complete(
+        self,
+        prefix: str,
+        rut_proveedor_: Optional[Iterable[int]] = None,
+        size: int = 10,
+    ) -> List[dict]:
+        """Skus con algún código que empieza con `prefix`.
+
+        Args:
+            prefix: Prefijo de código, una sola palabra.
+            rut_proveedor_: Rut o ruts por los que filtrar.
+            size: Máximo de resultados.
+
+        Returns:
+            Lista de `{"sku_id", "sku", "rut_proveedor_"}`, ordenada por
+            el código que calza.
+
+        """
+        prefix = normalize_word(prefix.strip())
+        if not MIN_GRAM <= len(prefix) <= MAX_GRAM:
+            return []
+
+        if rut_proveedor_ is None:
+            ruts = None
+        elif isinstance(rut_proveedor_, int):
+            ruts = [rut_proveedor_]
+        else:
+            ruts = list(rut_proveedor_)
+
+        with self._lock:
+            if ruts is None:
+                candidates = [self._all]
+            else:
+                candidates = [
+                    self._by_provider[rut]
+                    for rut in ruts
+                    if rut in self._by_provider
+                ]
+
+            seen: Set[str] = set()
+            results = []
+            for codes in candidates:
+                for sku_id in codes.prefix(prefix):
+                    if sku_id in seen:
+                        continue
+                    seen.add(sku_id)
+                    rut, sku, _ = self._docs[sku_id]
+                    results.append(
+                        {"sku_id": sku_id, "sku": sku, "rut_proveedor_": rut}
+                    )
+                    if len(results) >= size and len(candidates) == 1:
+                        return results
+
+        return results[:size]
+
+    def nbytes(self) -> int:
+        """Memoria aproximada del índice, en bytes."""
+        with self._lock:
+            strings = set(self._all.codes()) | set(self._docs)
+            total = sum(sys.getsizeof(string) for string in strings)
+            total += self._all.nbytes() + sys.getsizeof(self._docs)
+            total += sum(
+                codes.nbytes() + sys.getsizeof(codes)
+                for codes in self._by_provider.values()
+            )
+            total += sum(
+                sys.getsizeof(entry) + sys.getsizeof(entry[2])
+                for entry in self._docs.values()
+            )
+        return total
+
+    def stats(self) -> dict:
+        """Tamaño del índice, útil para loggear."""
+        return dict(
+            skus=len(self._docs),
+            codigos=len(self._all),
+            proveedores=len(self._by_provider),
+            nbytes=self.nbytes(),
+        )
+
+    def bulk_listener(self, action: dict):
+        """Listener de :meth:`laholio.crud.BulkInsertUpdateDelete.add_listener`.
+
+        Indexa los documentos escritos y quita los borrados. Los `update`
+        parciales solo se aplican si traen el `sku`.
+
+        """
+        op_type = action.get("_op_type", "index")
+        sku_id = action.get("_id")
+
+        if op_type == "delete":
+            if sku_id is not None:
+                self.remove(str(sku_id))
+            return
+
+        source = action.get("_source", action.get("doc"))
+        if not isinstance(source, dict) or not source.get("sku"):
+            return
+        sku_id = source.get("sku_id", sku_id)
+        if sku_id is None or source.get("rut_proveedor_") is None:
+            return
+
+        self.add(
+            str(sku_id),
+            source["rut_proveedor_"],
+            source["sku"],
+            *(source.get(field) for field in CODE_FIELDS[1:]),
+        )
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""Log de queries perezoso, muestreado y fuera del event loop.
+
+:class:`QueryLog` decide si una query se loggea *antes* de serializarla:
+solo se llama a `to_dict()` si el nivel está habilitado y la query salió
+en la muestra. El muestreo es por forma de query (`shape`): una de cada
+`sample`, y opcionalmente a lo más `rate` por segundo.
+
+:func:`install_queue_logging` mueve el formateo y la escritura de todos
+los logs a un hilo, de manera que el event loop solo encola el record.
+
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+from logging.handlers import QueueHandler
+from logging.handlers import QueueListener
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Union
+
+from laholio import S
+from laholio import logger
+
+
+class DeferredQueueHandler(QueueHandler):
+    """`QueueHandler` que deja todo el formateo al hilo del listener.
+
+    El `QueueHandler` estándar formatea el record antes de encolarlo, lo
+    que en el caso de structlog renderiza el JSON en el hilo que loggea.
+    Aquí el record se encola tal cual; los handlers originales lo
+    formatean en el hilo de :class:`logging.handlers.QueueListener`.
+
+    Si la cola está llena el record se descarta y se cuenta en
+    `dropped`: bajo ráfagas se pierden logs en vez de bloquear.
+
+    """
+
+    def __init__(self, queue_):
+        super().__init__(queue_)
+        self.dropped = 0
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_LISTENER: Optional[QueueListener] = None
+
+
+def install_queue_logging(maxsize: int = 10000) -> QueueListener:
+    """Reemplaza los handlers del root logger por una cola.
+
+    Los handlers actuales del root logger (los que configura petri)
+    pasan a un :class:`logging.handlers.QueueListener`, que los ejecuta
+    en su propio hilo. Se puede llamar más de una vez: solo la primera
+    tiene efecto. El listener se detiene al salir del proceso, escribiendo
+    lo que quede en la cola.
+
+    Args:
+        maxsize: Records que caben en la cola antes de descartar.
+
+    Returns:
+        El listener.
+
+    """
+    global _LISTENER  # pylint: disable=global-statement
+
+    if _LISTENER is not None:
+        return _LISTENER
+
+    root = logging.getLogger()
+    queue_ = queue.Queue(maxsize)  # type: ignore
+
+    _LISTENER = QueueListener(
+        queue_, *root.handlers, respect_handler_level=True
+    )
+    root.handlers = [DeferredQueueHandler(queue_)]
+
+    _LISTENER.start()
+    atexit.register(_LISTENER.stop)
+
+    return _LISTENER
+
+
+class QueryLog:
+    """Loggea queries de manera perezosa y muestreada.
+
+    Args:
+        sample: Se loggea una de cada `sample` queries de cada forma.
+        rate: Máximo de queries por segundo de cada forma. Sin límite si
+            es `None`.
+        level: Nivel de los logs, como nombre del método del logger.
+        name: Nombre del logger de la librería estándar.
+        clock: Reloj monotónico, configurable para pruebas.
+
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        sample: int = 1,
+        rate: Optional[float] = None,
+        level: str = "info",
+        name: str = "laholio",
+        clock=time.monotonic,
+    ):
+        if sample < 1:
+            raise ValueError("`sample` debe ser >= 1")
+        if rate is not None and rate <= 0:
+            raise ValueError("`rate` debe ser positivo")
+
+        self.sample = sample
+        self.rate = rate
+        self.level = level
+        self._levelno = logging.getLevelName(level.upper())
+        self._stdlib_logger = logging.getLogger(name)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._seen: Dict[str, int] = {}
+        self._buckets: Dict[str, List[float]] = {}
+
+    def _allowed(self, shape: str) -> bool:
+        """Aplica el muestreo y el límite por segundo de `shape`."""
+        with self._lock:
+            seen = self._seen.get(shape, 0)
+            self._seen[shape] = seen + 1
+            if seen % self.sample:
+                return False
+
+            if self.rate is None:
+                return True
+
+            # Token bucket con capacidad de un segundo de queries
+            now = self._clock()
+            tokens, last = self._buckets.get(shape, (self.rate, now))
+            tokens = min(self.rate, tokens + (now - last) * self.rate)
+            if tokens < 1:
+                self._buckets[shape] = [tokens, now]
+                return False
+            self._buckets[shape] = [tokens - 1, now]
+            return True
+
+    def log(
+        self,
+        shape: str,
+        query: Union[dict, Callable[[], dict]],
+        event: str = "Query",
+        **kwargs,
+    ) -> bool:
+        """Loggea la query si corresponde.
+
+        Args:
+            shape: Forma de la query, e.g. el método y operador que la
+                construyen. El muestreo es independiente por forma.
+            query: La query, o una función que la construye (e.g.
+                `search.to_dict`), que solo se llama si se loggea.
+            event: Evento del log.
+            kwargs: Campos adicionales del log.
+
+        Returns:
+            Si se loggeó la query.
+
+        """
+        if not self._stdlib_logger.isEnabledFor(self._levelno):
+            return False
+        if not self._allowed(shape):
+            return False
+
+        if callable(query):
+            query = query()
+
+        getattr(logger, self.level)(event, shape=shape, query=query, **kwargs)
+        return True
+
+
+QUERY_LOG = QueryLog(sample=S.QUERY_LOG_SAMPLE, rate=S.QUERY_LOG_RATE)
+"""Log de queries de :mod:`laholio.crud`, configurado en los settings."""
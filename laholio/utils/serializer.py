@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""Serializador JSON para el transporte de `elasticsearch-py`.
+
+Las respuestas del cluster se decodifican con el decodificador JSON más
+rápido disponible: `orjson`, luego `ujson` y por último el módulo
+estándar `json`. Ninguno de los dos primeros es dependencia de laholio;
+basta con instalarlos para que se usen.
+
+"""
+import json
+
+from elasticsearch.exceptions import SerializationError
+from elasticsearch.serializer import JSONSerializer
+
+try:
+    import orjson as _json  # pylint: disable=import-error
+
+    JSON_BACKEND = "orjson"
+except ImportError:  # pragma: no cover
+    try:
+        import ujson as _json  # type: ignore # pylint: disable=import-error
+
+        JSON_BACKEND = "ujson"
+    except ImportError:
+        _json = json  # type: ignore
+        JSON_BACKEND = "json"
+
+
+class FastJSONSerializer(JSONSerializer):
+    """`JSONSerializer` que decodifica con :data:`JSON_BACKEND`.
+
+    Solo cambia la decodificación de las respuestas. La codificación de
+    los requests se mantiene igual a la de `elasticsearch-py`, que sabe
+    convertir fechas, `Decimal` y `UUID`.
+
+    """
+
+    def loads(self, s):
+        try:
+            return _json.loads(s)
+        except (ValueError, TypeError) as e:
+            raise SerializationError(s, e)
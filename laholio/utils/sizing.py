@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""Estimación del dimensionamiento de un índice.
+
+Ver :class:`laholio.settings.IndexProfile`.
+
+"""
+import math
+
+GB = 1024 ** 3
+
+TARGET_SHARD_SIZE = 20 * GB
+"""Tamaño objetivo de cada shard.
+
+Para búsquedas de baja latencia se recomiendan shards de entre 10 GB y
+50 GB: más chicos suman overhead por shard, más grandes hacen lentas las
+búsquedas y la recuperación.
+
+"""
+
+
+def estimate_shard_count(
+    doc_count: int,
+    avg_doc_size: float,
+    target_shard_size: float = TARGET_SHARD_SIZE,
+    growth: float = 1.5,
+    max_shards: int = 64,
+) -> int:
+    """Número de shards primarios para un índice.
+
+    Args:
+        doc_count: Documentos que se espera indexar.
+        avg_doc_size: Bytes en disco por documento, incluyendo los campos
+            analizados (e.g. `store.size / docs.count` de `_cat/indices`
+            de un índice con el mismo mapping).
+        target_shard_size: Tamaño objetivo de cada shard, en bytes.
+        growth: Margen de crecimiento sobre `doc_count`, pues el número de
+            shards no se puede cambiar sin reindexar.
+        max_shards: Máximo de shards que se recomiendan.
+
+    Returns:
+        El número de shards, entre 1 y `max_shards`.
+
+    """
+    if doc_count < 0 or avg_doc_size < 0:
+        raise ValueError(
+            "`doc_count` y `avg_doc_size` no pueden ser negativos"
+        )
+    if target_shard_size <= 0 or growth < 1 or max_shards < 1:
+        raise ValueError(
+            "`target_shard_size` y `max_shards` deben ser positivos "
+            "y `growth` >= 1"
+        )
+
+    total_size = doc_count * avg_doc_size * growth
+    return min(max(math.ceil(total_size / target_shard_size), 1), max_shards)
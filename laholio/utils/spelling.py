@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+"""Corrector ortográfico en memoria construido desde el catálogo.
+
+Implementa el algoritmo *symmetric delete* de SymSpell: cada palabra del
+vocabulario se indexa bajo todas las variantes que resultan de borrarle
+hasta `max_edit_distance` caracteres (de su prefijo). Para corregir una
+palabra se generan sus propias variantes por borrado y se buscan en el
+índice, de manera que solo se calcula la distancia de edición contra unos
+pocos candidatos.
+
+Ver:
+    https://github.com/wolfgarbe/SymSpell
+
+"""
+import re
+import threading
+import unicodedata
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+from typing import Set
+
+_COMBINING = re.compile("[\u0300-\u036f]")
+
+
+def normalize_word(word: str) -> str:
+    """Minúsculas y sin tildes, como el `SEARCH_ANALYZER` del catálogo."""
+    return _COMBINING.sub("", unicodedata.normalize("NFKD", word.lower()))
+
+
+def tokenize(text: str) -> List[str]:
+    """Separa por espacios y normaliza cada palabra."""
+    return [normalize_word(word) for word in text.split()]
+
+
+def edit_distance(source: str, target: str, max_distance: int) -> int:
+    """Distancia de Damerau-Levenshtein (transposición de adyacentes).
+
+    Returns:
+        La distancia, o `max_distance + 1` si es mayor que
+        `max_distance`.
+
+    """
+    if abs(len(source) - len(target)) > max_distance:
+        return max_distance + 1
+
+    previous_previous: List[int] = []
+    previous = list(range(len(target) + 1))
+    for i, source_char in enumerate(source, 1):
+        current = [i] + [0] * len(target)
+        for j, target_char in enumerate(target, 1):
+            cost = source_char != target_char
+            current[j] = min(
+                previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost
+            )
+            if (
+                i > 1
+                and j > 1
+                and source_char == target[j - 2]
+                and source[i - 2] == target_char
+            ):
+                current[j] = min(current[j], previous_previous[j - 2] + 1)
+        # Las filas siguientes dependen de esta y de la anterior
+        if min(min(current), min(previous)) > max_distance:
+            return max_distance + 1
+        previous_previous, previous = previous, current
+
+    return min(previous[-1], max_distance + 1)
+
+
+class Suggestion(NamedTuple):
+    """Candidato de corrección de una palabra."""
+
+    term: str
+    distance: int
+    count: int
+
+
+class SymSpell:
+    """Índice de borrados simétricos sobre el vocabulario del catálogo.
+
+    Las palabras se pueden agregar en cualquier momento (por ejemplo
+    luego de un `bulk_request`, ver :meth:`bulk_listener`); las
+    consultas no toman el lock.
+
+    Args:
+        max_edit_distance: Distancia máxima de las correcciones.
+        prefix_length: Largo del prefijo de cada palabra que se indexa.
+            Limita la memoria sin perder correcciones de palabras largas,
+            cuyos errores se detectan en el resto de la palabra.
+        min_length: Las palabras más cortas no se corrigen.
+
+    """
+
+    def __init__(
+        self,
+        max_edit_distance: int = 2,
+        prefix_length: int = 7,
+        min_length: int = 3,
+    ):
+        if prefix_length <= max_edit_distance:
+            raise ValueError("`prefix_length` debe ser mayor a la distancia")
+
+        self.max_edit_distance = max_edit_distance
+        self.prefix_length = prefix_length
+        self.min_length = min_length
+        self._words: Dict[str, int] = {}
+        self._deletes: Dict[str, List[str]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._words)
+
+    def __contains__(self, word: str):
+        return normalize_word(word) in self._words
+
+    def _edits(self, word: str, distance: int, edits: Set[str]) -> Set[str]:
+        distance += 1
+        if len(word) > 1:
+            for i in range(len(word)):
+                delete = word[:i] + word[i + 1 :]  # noqa: E203
+                if delete not in edits:
+                    edits.add(delete)
+                    if distance < self.max_edit_distance:
+                        self._edits(delete, distance, edits)
+        return edits
+
+    def _prefix_edits(self, word: str) -> Set[str]:
+        prefix = word[: self.prefix_length]
+        return self._edits(prefix, 0, {prefix})
+
+    def add_word(self, word: str, count: int = 1):
+        """Agrega `count` apariciones de `word` al vocabulario."""
+        word = normalize_word(word)
+        if len(word) < self.min_length:
+            return
+
+        with self._lock:
+            if word in self._words:
+                self._words[word] += count
+                return
+            self._words[word] = count
+            for delete in self._prefix_edits(word):
+                self._deletes.setdefault(delete, []).append(word)
+
+    def add_text(self, text: str):
+        """Agrega las palabras de `text` al vocabulario."""
+        for word in tokenize(text):
+            self.add_word(word)
+
+    def lookup(
+        self, word: str, max_edit_distance: Optional[int] = None
+    ) -> List[Suggestion]:
+        """Candidatos de corrección de `word`.
+
+        Returns:
+            Candidatos ordenados por distancia y luego por frecuencia. Si
+            la palabra está en el vocabulario, solo ella.
+
+        """
+        max_distance = (
+            self.max_edit_distance
+            if max_edit_distance is None
+            else min(max_edit_distance, self.max_edit_distance)
+        )
+        word = normalize_word(word)
+
+        count = self._words.get(word)
+        if count is not None:
+            return [Suggestion(word, 0, count)]
+        if len(word) < self.min_length:
+            return []
+
+        candidates: Dict[str, Suggestion] = {}
+        for delete in self._prefix_edits(word):
+            for term in self._deletes.get(delete, ()):
+                if term in candidates:
+                    continue
+                distance = edit_distance(word, term, max_distance)
+                if distance <= max_distance:
+                    candidates[term] = Suggestion(
+                        term, distance, self._words[term]
+                    )
+
+        return sorted(
+            candidates.values(), key=lambda s: (s.distance, -s.count, s.term)
+        )
+
+    def correct(self, text: str) -> Optional[str]:
+        """Corrige cada palabra de `text` que no está en el vocabulario.
+
+        Returns:
+            El texto corregido, o `None` si no hay ninguna corrección
+            (todas las palabras son conocidas o no tienen candidatos).
+
+        """
+        corrected, changed = [], False
+        for word in tokenize(text):
+            suggestions = self.lookup(word)
+            if suggestions and suggestions[0].term != word:
+                corrected.append(suggestions[0].term)
+                changed = True
+            else:
+                corrected.append(word)
+        return " ".join(corrected) if changed else None
+
+    def bulk_listener(self, field: str):
+        """Listener que agrega al vocabulario el `field` de cada acción.
+
+        Ver :meth:`laholio.crud.BulkInsertUpdateDelete.add_listener`.
+
+        """
+
+        def listener(action: dict):
+            source = action.get("_source", action.get("doc"))
+            if isinstance(source, dict) and source.get(field):
+                self.add_text(source[field])
+
+        return listener
+
+
+def build(texts: Iterable[str], **kwargs) -> SymSpell:
+    """Construye un :class:`SymSpell` con las palabras de `texts`."""
+    corrector = SymSpell(**kwargs)
+    for text in texts:
+        corrector.add_text(text)
+    return corrector
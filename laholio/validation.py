@@ -0,0 +1,515 @@
+# -*- coding: utf-8 -*-
+"""Validación columnar de cargas de catálogo contra :class:`~.Sku`.
+
+Validar un catálogo fila a fila con los modelos de
+:meth:`~laholio.utils._elasticsearch.Document.to_pydantic` crea un objeto
+por fila y por esquema. :class:`ColumnarValidator` deriva las mismas
+reglas de los campos de `Sku` y `SkuYellow` (requeridos, tipos, el enum
+de `status` y las `properties` de los objetos) y revisa cada columna
+completa de una vez: una pasada por el tipo de cada valor, y solo los
+valores de tipos poco comunes pasan por la conversión exacta.
+
+Una fila que no cumple `Sku` pero sí `SkuYellow` tiene un error
+`TypeSkuError.missing`; si tampoco cumple `SkuYellow`, el error es
+`TypeSkuError.fatal`. El detalle de cada error tiene el formato de
+`pydantic.ValidationError.errors()`, sin las alternativas
+`value is not none` que pydantic agrega en los campos opcionales.
+
+A diferencia de pydantic, las llaves que no están en las `properties` de
+un objeto `dynamic="strict"` (e.g. `imagenes`) son un error, ya que ES
+rechazaría el documento.
+
+"""
+import json
+from collections import defaultdict
+from decimal import Decimal
+from enum import Enum
+from itertools import chain
+from operator import itemgetter
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Mapping
+from typing import NamedTuple
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+from typing import Type
+
+from elasticsearch_dsl import Field
+
+from laholio.schemas import Sku
+from laholio.schemas import SkuErrors
+from laholio.schemas import SkuYellow
+from laholio.schemas import TypeSkuError
+from laholio.utils._elasticsearch import Document
+from laholio.utils._elasticsearch import EnumText
+from laholio.utils._fields import Float  # pylint: disable=no-name-in-module
+from laholio.utils._fields import Integer  # pylint: disable=no-name-in-module
+from laholio.utils._fields import Keyword  # pylint: disable=no-name-in-module
+from laholio.utils._fields import Nested  # pylint: disable=no-name-in-module
+from laholio.utils._fields import Object  # pylint: disable=no-name-in-module
+from laholio.utils._fields import Text  # pylint: disable=no-name-in-module
+
+MISSING = object()
+"""Valor de una columna en las filas que no traen el campo."""
+
+KINDS = {Text: "str", Keyword: "str", Integer: "int", Float: "float"}
+"""Tipo de valor de cada clase de campo simple."""
+
+# Tipos que se aceptan sin revisar el valor
+_FAST_TYPES = {
+    "str": frozenset((str, int, float, Decimal, bool)),
+    "int": frozenset((int, bool)),
+    "float": frozenset((float, int, bool)),
+    "mapping": frozenset((dict,)),
+    "object": frozenset((dict,)),
+}
+
+_STR_ERROR = ("str type expected", "type_error.str")
+_NONE_ERROR = ("none is not an allowed value", "type_error.none.not_allowed")
+_INT_ERROR = ("value is not a valid integer", "type_error.integer")
+_FLOAT_ERROR = ("value is not a valid float", "type_error.float")
+_DICT_ERROR = ("value is not a valid dict", "type_error.dict")
+_MISSING_ERROR = ("field required", "value_error.missing")
+_EXTRA_ERROR = ("extra fields not permitted", "value_error.extra")
+
+Errors = Dict[int, List[dict]]
+"""Errores por fila (posición en la columna)."""
+
+
+class FieldRule(NamedTuple):
+    """Regla de validación de un campo.
+
+    `kind` es `str`, `int`, `float`, `enum`, `mapping` (objeto dinámico,
+    de llaves y valores `str`) u `object` (objeto con `properties`).
+
+    """
+
+    name: str
+    kind: str
+    required: bool
+    enum_class: Optional[Type[Enum]] = None
+    properties: Tuple["FieldRule", ...] = ()
+    strict: bool = False
+
+
+class ColumnCheck(NamedTuple):
+    """Resultado de revisar una columna, sin considerar si es requerida.
+
+    `missing` son las filas sin el campo y `none` los errores de las filas
+    con `None`, que solo aplican si el campo es requerido.
+
+    """
+
+    loc: tuple
+    missing: List[int]
+    none: Errors
+    errors: Errors
+
+
+def field_rule(name: str, field: Field, required: bool) -> FieldRule:
+    """Regla de `field`, con las mismas conversiones que `to_pydantic`."""
+    if isinstance(field, EnumText):
+        return FieldRule(name, "enum", required, enum_class=field.conversion)
+    if isinstance(field, Nested):
+        raise NotImplementedError("Campos `Nested` no soportados")
+    if isinstance(field, Object):
+        properties = schema_rules(field._doc_class)  # pylint: disable=W0212
+        if not properties:
+            return FieldRule(name, "mapping", required)
+        return FieldRule(
+            name,
+            "object",
+            required,
+            properties=tuple(properties),
+            strict=field.to_dict().get("dynamic") == "strict",
+        )
+    try:
+        return FieldRule(name, KINDS[type(field)], required)
+    except KeyError:
+        raise NotImplementedError(
+            "Campo `{}` de tipo `{}` no soportado".format(
+                name, type(field).__name__
+            )
+        )
+
+
+def schema_rules(document: Type[Document]) -> List[FieldRule]:
+    """Reglas de los campos de `document`.
+
+    Los objetos van primero, en el mismo orden de los campos del modelo
+    de pydantic, para que los errores queden en el mismo orden.
+
+    """
+    fields = Document._get_fields(  # pylint: disable=W0212
+        document_meta=document
+    )
+    rules = [field_rule(*field) for field in fields]
+    return [rule for rule in rules if rule.kind in ("mapping", "object")] + [
+        rule for rule in rules if rule.kind not in ("mapping", "object")
+    ]
+
+
+def _error(loc: tuple, error: Tuple[str, str]) -> dict:
+    return {"loc": loc, "msg": error[0], "type": error[1]}
+
+
+def _str_error(value) -> Optional[Tuple[str, str]]:
+    """Igual a `pydantic.validators.str_validator` (más `not_none`)."""
+    if isinstance(value, str):
+        return _STR_ERROR if isinstance(value, Enum) else None
+    if value is None:
+        return _NONE_ERROR
+    if isinstance(value, (float, int, Decimal)):
+        return None
+    if isinstance(value, (bytes, bytearray)):
+        try:
+            value.decode()
+        except UnicodeDecodeError as exc:
+            return str(exc), "value_error.unicodedecode"
+        return None
+    return _STR_ERROR
+
+
+def _int_error(value) -> Optional[Tuple[str, str]]:
+    """Igual a `pydantic.validators.int_validator`.
+
+    Los `float` infinitos son un error (pydantic deja pasar la excepción).
+
+    """
+    try:
+        int(value)
+    except (TypeError, ValueError, OverflowError):
+        return _INT_ERROR
+    return None
+
+
+def _float_error(value) -> Optional[Tuple[str, str]]:
+    """Igual a `pydantic.validators.float_validator`."""
+    try:
+        float(value)
+    except (TypeError, ValueError):
+        return _FLOAT_ERROR
+    return None
+
+
+def _as_dict(value) -> Optional[dict]:
+    """Igual a `pydantic.validators.dict_validator`, o `None` si falla."""
+    if isinstance(value, dict):
+        return value
+    try:
+        return dict(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _enum_error(enum_class: Type[Enum]):
+    message = "value is not a valid enumeration member; permitted: {}".format(
+        ", ".join(repr(member.value) for member in enum_class)
+    )
+
+    def error(value) -> Optional[Tuple[str, str]]:
+        try:
+            enum_class(value)
+        except ValueError:
+            return message, "type_error.enum"
+        return None
+
+    return error
+
+
+def _mapping_errors(mapping: dict, loc: tuple) -> List[dict]:
+    """Errores de un objeto dinámico: llaves y valores `str`."""
+    errors = []
+    for key, value in mapping.items():
+        error = None if type(key) is str else _str_error(key)
+        if error is not None:
+            errors.append(_error(loc + ("__key__",), error))
+            continue
+        error = None if type(value) is str else _str_error(value)
+        if error is not None:
+            errors.append(_error(loc + (key,), error))
+    return errors
+
+
+def _odd_rows(rule: FieldRule, column: Sequence) -> Sequence[int]:
+    """Filas cuyos valores hay que validar uno a uno.
+
+    Si todos los valores son de tipos de `_FAST_TYPES` (o del enum), la
+    revisión se hace con operaciones de conjuntos, sin recorrer la
+    columna en Python.
+
+    """
+    if rule.kind == "enum":
+        valid = {member.value for member in rule.enum_class}
+        valid.update(rule.enum_class)
+        try:
+            if valid.issuperset(column):
+                return ()
+            return [i for i, value in enumerate(column) if value not in valid]
+        except TypeError:  # valores no hasheables
+            return range(len(column))
+
+    fast = _FAST_TYPES[rule.kind]
+    if fast.issuperset(map(type, column)):
+        return ()
+    return [i for i, value in enumerate(column) if type(value) not in fast]
+
+
+def check_column(
+    rule: FieldRule, column: Optional[Sequence], size: int, loc: tuple = ()
+) -> ColumnCheck:
+    """Revisa la columna de `rule` (`None` si no viene en la carga).
+
+    Solo los valores de :func:`_odd_rows` se validan uno a uno. Los
+    objetos se revisan juntos, como columnas de sus llaves.
+
+    """
+    loc = loc + (rule.name,)
+    if column is None:
+        return ColumnCheck(loc, list(range(size)), {}, {})
+
+    missing: List[int] = []
+    none: Errors = {}
+    errors: Errors = {}
+    # Filas con objetos y sus diccionarios
+    rows: List[int] = []
+    mappings: List[dict] = []
+
+    odd = _odd_rows(rule, column)
+    if rule.kind == "enum":
+        scalar_error = _enum_error(rule.enum_class)
+    else:
+        scalar_error = {
+            "str": _str_error,
+            "int": _int_error,
+            "float": _float_error,
+        }.get(rule.kind)
+
+    if scalar_error is None:
+        # Los `dict` pasan directo a la revisión de sus llaves
+        skip = set(odd)
+        rows = [i for i in range(size) if i not in skip]
+        mappings = [column[i] for i in rows]
+
+    for i in odd:
+        value = column[i]
+        if value is MISSING:
+            missing.append(i)
+        elif scalar_error is not None:
+            error = scalar_error(value)
+            if error is not None:
+                (none if value is None else errors)[i] = [_error(loc, error)]
+        elif value is None:
+            none[i] = [_error(loc, _DICT_ERROR)]
+        else:
+            mapping = _as_dict(value)
+            if mapping is None:
+                errors[i] = [_error(loc, _DICT_ERROR)]
+            else:
+                rows.append(i)
+                mappings.append(mapping)
+
+    if mappings:
+        if rule.kind == "mapping":
+            _check_mappings(rows, mappings, loc, errors)
+        else:
+            _check_objects(rule, rows, mappings, loc, errors)
+    return ColumnCheck(loc, missing, none, errors)
+
+
+def _check_mappings(
+    rows: List[int], mappings: List[dict], loc: tuple, errors: Errors
+):
+    """Revisa los objetos dinámicos de `rows`."""
+    fast = _FAST_TYPES["str"]
+    if fast.issuperset(
+        map(type, chain.from_iterable(mappings))
+    ) and fast.issuperset(
+        map(type, chain.from_iterable(map(dict.values, mappings)))
+    ):
+        return
+    for i, mapping in zip(rows, mappings):
+        mapping_errors = _mapping_errors(mapping, loc)
+        if mapping_errors:
+            errors[i] = mapping_errors
+
+
+def _check_objects(
+    rule: FieldRule,
+    rows: List[int],
+    mappings: List[dict],
+    loc: tuple,
+    errors: Errors,
+):
+    """Revisa los objetos de `rows` como columnas de sus `properties`."""
+    for prop in rule.properties:
+        column = [mapping.get(prop.name, MISSING) for mapping in mappings]
+        check = check_column(prop, column, len(column), loc)
+        for j, prop_errors in apply_rule(prop, check).items():
+            errors.setdefault(rows[j], []).extend(prop_errors)
+
+    names = {prop.name for prop in rule.properties}
+    if not rule.strict or names.issuperset(chain.from_iterable(mappings)):
+        return
+    for i, mapping in zip(rows, mappings):
+        if not mapping.keys() <= names:
+            errors.setdefault(i, []).extend(
+                _error(loc + (key,), _EXTRA_ERROR)
+                for key in mapping
+                if key not in names
+            )
+
+
+def apply_rule(rule: FieldRule, check: ColumnCheck) -> Errors:
+    """Errores de la columna según si el campo es requerido."""
+    if not rule.required:
+        return check.errors
+    errors = dict(check.errors)
+    errors.update(check.none)
+    missing = [_error(check.loc, _MISSING_ERROR)]
+    errors.update((i, missing) for i in check.missing)
+    return errors
+
+
+def as_columns(
+    data, names: Optional[Iterable[str]] = None
+) -> Tuple[Dict[str, Sequence], int]:
+    """Columnas de `data` y su largo.
+
+    Args:
+        data: Un diccionario de columnas (listas, o arreglos con
+            `tolist`), un `pandas.DataFrame` (sus `NaN` se consideran
+            `None`) o un iterable de filas (diccionarios). En las filas, un
+            campo ausente es :data:`MISSING`.
+        names: Si se entrega, de las filas solo se arman estas columnas.
+
+    """
+    if hasattr(data, "columns") and hasattr(data, "notna"):
+        # pandas.DataFrame, sin importar pandas
+        columns = {
+            name: data[name]
+            .astype(object)
+            .where(data[name].notna(), None)
+            .tolist()
+            for name in data.columns
+        }
+        return columns, len(data)
+
+    if isinstance(data, Mapping):
+        columns = {
+            name: column.tolist() if hasattr(column, "tolist") else column
+            for name, column in data.items()
+        }
+        sizes = {len(column) for column in columns.values()}
+        if len(sizes) > 1:
+            raise ValueError("Las columnas deben tener el mismo largo")
+        return columns, sizes.pop() if sizes else 0
+
+    rows = data if isinstance(data, list) else list(data)
+    if names is None:
+        names = dict.fromkeys(chain.from_iterable(rows))
+    columns = {}
+    for name in names:
+        try:
+            columns[name] = list(map(itemgetter(name), rows))
+        except KeyError:
+            column = [row.get(name, MISSING) for row in rows]
+            # Un campo que no trae ninguna fila queda como columna ausente
+            if column.count(MISSING) < len(column):
+                columns[name] = column
+    return columns, len(rows)
+
+
+class ColumnarValidator:
+    """Valida cargas de catálogo columna a columna.
+
+    Args:
+        schema: Documento que debe cumplir una fila completa.
+        relaxed: Documento con los requisitos mínimos de una fila; las
+            que no lo cumplen tienen un error fatal.
+
+    """
+
+    def __init__(
+        self,
+        schema: Type[Document] = Sku,
+        relaxed: Type[Document] = SkuYellow,
+    ):
+        self.rules = schema_rules(schema)
+        self.relaxed_rules = schema_rules(relaxed)
+        self.names = {rule.name for rule in self.rules + self.relaxed_rules}
+
+    def _row_errors(
+        self, columns: Dict[str, Sequence], size: int
+    ) -> Tuple[Errors, Errors]:
+        """Errores por fila contra `schema` y contra `relaxed`."""
+        checks: Dict[FieldRule, ColumnCheck] = {}
+
+        def errors_of(rules: List[FieldRule]) -> Errors:
+            row_errors: Errors = defaultdict(list)
+            for rule in rules:
+                # La revisión no depende de si el campo es requerido
+                key = rule._replace(required=True)
+                if key not in checks:
+                    checks[key] = check_column(
+                        rule, columns.get(rule.name), size
+                    )
+                for i, errors in apply_rule(rule, checks[key]).items():
+                    row_errors[i].extend(errors)
+            return row_errors
+
+        return errors_of(self.rules), errors_of(self.relaxed_rules)
+
+    def classify(self, data) -> List[Optional[TypeSkuError]]:
+        """Tipo de error de cada fila de `data`, o `None` si es válida.
+
+        Ver :func:`as_columns` para los formatos de `data`.
+
+        """
+        columns, size = as_columns(data, self.names)
+        errors, relaxed_errors = self._row_errors(columns, size)
+        classes: List[Optional[TypeSkuError]] = [None] * size
+        for i in errors:
+            classes[i] = (
+                TypeSkuError.fatal
+                if i in relaxed_errors
+                else TypeSkuError.missing
+            )
+        return classes
+
+    def validate(
+        self, data, first_row: int = 0
+    ) -> Tuple[List[SkuErrors], List[SkuErrors]]:
+        """Errores de las filas de `data`.
+
+        Args:
+            data: Ver :func:`as_columns`.
+            first_row: Número de fila de la primera fila de `data` (e.g.
+                2 en un excel con encabezado).
+
+        Returns:
+            Los errores `missing` y los `fatal`, como los campos
+            `incomplete_errors` y `fatal_errors` de
+            :class:`~laholio.schemas.CatalogoUpload`. El detalle de un
+            error `missing` son los errores contra `schema`; el de uno
+            `fatal`, los errores contra `relaxed`.
+
+        """
+        columns, size = as_columns(data, self.names)
+        errors, relaxed_errors = self._row_errors(columns, size)
+        incomplete, fatal = [], []
+        for i in sorted(errors):
+            if i in relaxed_errors:
+                target, detail, type_error = fatal, relaxed_errors[i], "fatal"
+            else:
+                target, detail, type_error = incomplete, errors[i], "missing"
+            target.append(
+                SkuErrors(
+                    row=i + first_row,
+                    sku_errors=json.dumps(detail, indent=2, default=str),
+                    type_error=TypeSkuError[type_error].value,
+                )
+            )
+        return incomplete, fatal
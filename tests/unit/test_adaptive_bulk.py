@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""Pruebas del control adaptivo :mod:`laholio.utils.adaptive_bulk`"""
+import pytest
+
+from laholio.utils.adaptive_bulk import AdaptiveChunking
+from laholio.utils.adaptive_bulk import backoff_delay
+from laholio.utils.adaptive_bulk import split_response
+
+
+def controller(**kwargs):
+    params = dict(
+        chunk_size=100,
+        min_chunk_size=10,
+        max_chunk_size=200,
+        concurrency=2,
+        max_concurrency=4,
+        target_latency=1.0,
+        increase=50,
+    )
+    params.update(kwargs)
+    return AdaptiveChunking(**params)
+
+
+def test_crece_el_chunk_y_luego_la_concurrencia():
+    control = controller()
+
+    for _ in range(3):
+        control.record(0.1, 100)
+
+    assert (control.chunk_size, control.concurrency) == (200, 3)
+
+
+def test_request_lenta_reduce_el_chunk():
+    control = controller()
+
+    control.record(5.0, 100)
+
+    assert (control.chunk_size, control.concurrency) == (50, 2)
+
+
+def test_rechazos_reducen_chunk_y_concurrencia():
+    control = controller(chunk_size=15, concurrency=3)
+
+    control.record(0.1, 15, rejected=1)
+    control.record(0.1, 10, rejected=1)
+
+    assert (control.chunk_size, control.concurrency) == (10, 1)
+
+
+@pytest.mark.parametrize(
+    "kwargs", [dict(chunk_size=5), dict(concurrency=5), dict(decrease=1)],
+)
+def test_parametros_invalidos(kwargs):
+    with pytest.raises(ValueError):
+        controller(**kwargs)
+
+
+@pytest.mark.parametrize("attempt, upper", [(0, 0.5), (3, 4.0), (10, 30.0)])
+def test_backoff_con_jitter(attempt, upper):
+    delays = [backoff_delay(attempt) for _ in range(200)]
+
+    assert all(0 <= delay <= upper for delay in delays)
+    assert len(set(delays)) > 1
+
+
+@pytest.mark.parametrize("retry, rejected", [(True, 1), (False, 0)])
+def test_split_response(retry, rejected):
+    bulk_data = [
+        ({"index": {"_id": str(i)}}, {"sku": str(i)}) for i in range(3)
+    ]
+    response = {
+        "items": [
+            {"index": {"_id": "0", "status": 201}},
+            {"index": {"_id": "1", "status": 429}},
+            {"index": {"_id": "2", "status": 400, "error": {"type": "x"}}},
+        ]
+    }
+
+    success, retries, failures = split_response(bulk_data, response, 1, retry)
+
+    assert success == 1
+    assert retries == bulk_data[1:2] * rejected
+    assert [failure["_id"] for failure in failures] == ["1", "2"][rejected:]
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""Pruebas de la bulk API asincrónica :mod:`laholio.utils.async_bulk`"""
+import asyncio
+import json
+
+import pytest
+from elasticsearch.exceptions import ConnectionError
+from elasticsearch.serializer import JSONSerializer
+
+from laholio.utils.adaptive_bulk import AdaptiveChunking
+from laholio.utils.async_bulk import async_bulk
+from laholio.utils.async_bulk import batches
+
+
+class FakeClient:
+    """Cliente que responde la bulk API y registra la concurrencia."""
+
+    def __init__(self, fail_ids=(), broken=False, rejections=None):
+        self.transport = type("Transport", (), {})()
+        self.transport.serializer = JSONSerializer()
+        self.fail_ids = set(fail_ids)
+        self.rejections = dict(rejections or {})
+        self.broken = broken
+        self.bodies = []
+        self.in_flight = self.max_in_flight = 0
+
+    async def bulk(self, body, **kwargs):
+        self.bodies.append(body)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        if self.broken:
+            raise ConnectionError("N/A", "caído", None)
+
+        lines = [json.loads(line) for line in body.splitlines()]
+        items = []
+        for line in lines[::2]:
+            [(op_type, meta)] = line.items()
+            item = {
+                "_index": meta["_index"],
+                "_id": meta["_id"],
+                "status": 201,
+            }
+            if meta["_id"] in self.fail_ids:
+                item["status"] = 400
+            elif self.rejections.get(meta["_id"]):
+                self.rejections[meta["_id"]] -= 1
+                item["status"] = 429
+            items.append({op_type: item})
+        return {"items": items}
+
+
+def actions(n):
+    return [{"_id": str(i), "_index": "i", "sku": str(i)} for i in range(n)]
+
+
+async def agen(items):
+    for item in items:
+        yield item
+
+
+@pytest.mark.asyncio
+async def test_batches_sync_y_async():
+    expected = [[0, 1], [2, 3], [4]]
+
+    assert [batch async for batch in batches(range(5), 2)] == expected
+    assert [batch async for batch in batches(agen(range(5)), 2)] == expected
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("concurrency", [1, 3])
+async def test_concurrencia_acotada(concurrency):
+    client = FakeClient(fail_ids={"7"})
+
+    success, errors = await async_bulk(
+        client, agen(actions(25)), chunk_size=4, concurrency=concurrency
+    )
+
+    assert success == 24
+    assert [(error["_id"], error["status"]) for error in errors] == [
+        ("7", 400)
+    ]
+    assert len(client.bodies) == 7
+    assert client.max_in_flight == concurrency
+
+
+@pytest.mark.asyncio
+async def test_chunks_por_bytes():
+    client = FakeClient()
+
+    await async_bulk(client, actions(10), max_chunk_bytes=200)
+
+    assert len(client.bodies) > 1
+    assert all(len(body.encode()) <= 200 for body in client.bodies)
+
+
+@pytest.mark.asyncio
+async def test_error_de_transporte_falla_el_chunk():
+    client = FakeClient(broken=True)
+
+    success, errors = await async_bulk(client, actions(3))
+
+    assert success == 0
+    assert [error["_id"] for error in errors] == ["0", "1", "2"]
+    assert errors[0]["error"] == str(ConnectionError("N/A", "caído", None))
+
+
+@pytest.mark.asyncio
+async def test_reintenta_solo_los_rechazados():
+    client = FakeClient(rejections={"3": 2})
+
+    success, errors = await async_bulk(
+        client, actions(5), max_retries=2, initial_backoff=0
+    )
+
+    assert (success, errors) == (5, [])
+    assert [body.count("\n") // 2 for body in client.bodies] == [5, 1, 1]
+
+
+@pytest.mark.asyncio
+async def test_rechazos_sin_reintentos_restantes():
+    client = FakeClient(rejections={"3": 5})
+
+    success, errors = await async_bulk(
+        client, actions(5), max_retries=1, initial_backoff=0
+    )
+
+    assert success == 4
+    assert errors == [
+        {
+            "_index": "i",
+            "_id": "3",
+            "op_type": "index",
+            "status": 429,
+            "error": None,
+            "attempts": 2,
+        }
+    ]
+
+
+@pytest.mark.asyncio
+async def test_chunks_adaptivos():
+    client = FakeClient(rejections={"9": 1})
+    controller = AdaptiveChunking(
+        chunk_size=2,
+        min_chunk_size=1,
+        max_chunk_size=4,
+        concurrency=1,
+        max_concurrency=1,
+        increase=1,
+    )
+
+    success, errors = await async_bulk(
+        client,
+        actions(20),
+        controller=controller,
+        max_retries=1,
+        initial_backoff=0,
+    )
+
+    assert (success, errors) == (20, [])
+    sizes = [body.count("\n") // 2 for body in client.bodies]
+    # Crece hasta el máximo; el rechazo del "9" lo reduce a la mitad y
+    # solo ese documento se reenvía
+    assert sizes[:6] == [2, 3, 4, 4, 1, 3]
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""Pruebas para :class:`laholio.utils.async_dsl.AsyncMultiSearch`"""
+import json
+
+import pytest
+from elasticsearch.exceptions import TransportError
+
+from laholio.crud import SkuSearch
+from laholio.utils.async_dsl import AsyncMultiSearch
+from laholio.utils.async_dsl import AsyncSearch
+
+
+def test_size_viaja_en_el_cuerpo_y_routing_en_la_cabecera():
+    search = (
+        AsyncSearch(index="test_index")
+        .query("match", sku="A10N")
+        .params(size=6, routing="1")
+    )
+
+    body = AsyncMultiSearch().add(search).to_dict()
+
+    assert body == [
+        {"index": ["test_index"], "routing": "1"},
+        {"query": {"match": {"sku": "A10N"}}, "size": 6},
+    ]
+
+
+def test_parametro_no_soportado():
+    search = AsyncSearch(index="test_index").params(scroll="1m")
+
+    with pytest.raises(ValueError):
+        AsyncMultiSearch().add(search).to_dict()
+
+
+class FakeConnection:
+    """`msearch` que falla en las búsquedas que piden `sku` en `failing`."""
+
+    def __init__(self, failing=()):
+        self.failing = failing
+        self.bodies = []
+
+    async def msearch(self, body, **kwargs):
+        self.bodies.append(body)
+        return {"responses": [self._response(search) for search in body[1::2]]}
+
+    def _response(self, search):
+        if any(text in json.dumps(search) for text in self.failing):
+            return {"error": {"type": "search_phase_execution_exception"}}
+        source = {"sku_id": "1_A10N", "sku": "A10N"}
+        return {
+            "hits": {
+                "total": 1,
+                "max_score": 1.0,
+                "hits": [{"_id": "1_A10N", "_score": 1.0, "_source": source}],
+            }
+        }
+
+
+def multi_search(connection, *skus):
+    multi = AsyncMultiSearch(using=connection, index="test_index")
+    for sku in skus:
+        multi = multi.add(
+            AsyncSearch(index="test_index").query("match", sku=sku)
+        )
+    return multi
+
+
+@pytest.mark.asyncio
+async def test_error_queda_en_su_posicion():
+    connection = FakeConnection(failing=["B20N"])
+
+    ok, failed = await multi_search(connection, "A10N", "B20N").execute()
+
+    assert ok.hits[0].sku == "A10N"
+    assert isinstance(failed, TransportError)
+    assert AsyncMultiSearch.raise_for_error(ok) is ok
+    with pytest.raises(TransportError):
+        AsyncMultiSearch.raise_for_error(failed)
+
+    with pytest.raises(TransportError):
+        await multi_search(connection, "A10N", "B20N").execute(
+            raise_on_error=True
+        )
+
+
+@pytest.fixture
+def searcher():
+    searcher = SkuSearch.__new__(SkuSearch)
+    searcher.connection = FakeConnection(failing=["falla"])
+    searcher.index_name = "test_index"
+    searcher.single_flight = None
+    return searcher
+
+
+@pytest.mark.asyncio
+async def test_search_products_many_falla_solo_el_texto(searcher):
+    texts = ["arena", "texto que falla", "cemento"]
+
+    results = await searcher.search_products_many(
+        texts, chunk_size=3, return_exceptions=True
+    )
+
+    assert len(searcher.connection.bodies) == 1
+    assert [result[0]["sku"] for result in results[::2]] == ["A10N"] * 2
+    assert isinstance(results[1], TransportError)
+
+    with pytest.raises(TransportError):
+        await searcher.search_products_many(texts, chunk_size=3)
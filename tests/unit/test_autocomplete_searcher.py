@@ -2,6 +2,9 @@
 """ Prueba sobre la funcionalidad del autocompletado """
 import pytest
 
+from laholio.templates import SearchTemplates
+from laholio.templates import put_search_templates
+
 from . import SkuTest
 from . import SkuSearchTest
 from . import SkuInsertTest
@@ -243,3 +246,69 @@ async def test_exact_orderer_match(input_text, expected):
     ]
 
     assert short_descriptions == expected
+
+
+@pytest.mark.asyncio
+async def test_search_products_many_equivale_a_search_product():
+    searcher = SkuSearchTest(connection=ASYNC_CONN)
+
+    texts = [input_text for input_text, _ in TEST_DATA_MATCH_EXACTO]
+
+    results = await searcher.search_products_many(texts, chunk_size=3)
+
+    assert len(results) == len(texts)
+    for text, result in zip(texts, results):
+        assert result == await searcher.search_product(text)
+
+
+@pytest.mark.asyncio
+async def test_plantillas_equivalen_al_dsl():
+    put_search_templates(SYNC_CONN, force=True)
+
+    searcher = SkuSearchTest(connection=ASYNC_CONN)
+    templated = SkuSearchTest(connection=ASYNC_CONN)
+    templated.templates = SearchTemplates()
+
+    for input_text, _ in TEST_DATA_MATCH_EXACTO:
+        expected = await searcher.search_product(input_text)
+        assert await templated.search_product(input_text) == expected
+
+    assert not templated.templates._missing
+
+
+@pytest.mark.parametrize("multi_search", [False, True])
+@pytest.mark.asyncio
+async def test_sugerencia_con_collate_en_un_request(multi_search):
+    searcher = SkuSearchTest(connection=ASYNC_CONN)
+    searcher.collate_suggest = True
+    searcher.multi_search = multi_search
+
+    results = await searcher.search_product("Cemnto")
+
+    assert results
+    assert all("Cemento" in r["descripcion_corta"] for r in results)
+
+
+@pytest.mark.asyncio
+async def test_corrector_local():
+    searcher = SkuSearchTest(connection=ASYNC_CONN)
+
+    corrector = await searcher.load_corrector()
+
+    assert "cemento" in corrector
+    assert await searcher.search_product("Cemnto") == await (
+        searcher._search_product("cemento", search_operator="or")
+    )
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("prefix", ["a10", "BMB", "2000"])
+async def test_indice_de_prefijos_sku(prefix):
+    searcher = SkuSearchTest(connection=ASYNC_CONN)
+    expected = await searcher.complete_sku(prefix, size=100)
+
+    await searcher.load_sku_index()
+
+    assert sorted(r["sku_id"] for r in expected) == sorted(
+        r["sku_id"] for r in await searcher.complete_sku(prefix, size=100)
+    )
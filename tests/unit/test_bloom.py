@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""Pruebas para el filtro de Bloom :mod:`laholio.utils.bloom`"""
+import pytest
+
+from laholio.crud import BulkInsertUpdateDelete
+from laholio.crud import SkuSearch
+from laholio.utils.bloom import BloomFilter
+
+KEYS = ["{}_{}".format(rut, sku) for rut in range(10) for sku in range(100)]
+
+
+def build(capacity=len(KEYS), error_rate=0.01):
+    bloom = BloomFilter(capacity, error_rate=error_rate)
+    bloom.update(KEYS)
+    return bloom
+
+
+def test_sin_falsos_negativos():
+    bloom = build()
+
+    assert all(key in bloom for key in KEYS)
+    assert len(bloom) == len(KEYS)
+
+
+@pytest.mark.parametrize("error_rate", [0.1, 0.01])
+def test_tasa_de_falsos_positivos(error_rate):
+    bloom = build(error_rate=error_rate)
+    absent = [
+        "{}_x{}".format(rut, sku) for rut in range(10) for sku in range(2000)
+    ]
+
+    false_positives = sum(key in bloom for key in absent) / len(absent)
+
+    assert false_positives < 2 * error_rate
+    assert bloom.error_rate() == pytest.approx(error_rate, rel=0.5)
+
+
+def test_guardar_y_abrir(tmp_path):
+    path = str(tmp_path / "skus.bloom")
+    build().save(path)
+
+    bloom = BloomFilter.open(path)
+
+    assert all(key in bloom for key in KEYS)
+    assert len(bloom) == len(KEYS)
+
+    # Las llaves nuevas no se escriben en el archivo
+    bloom.add("nuevo")
+    assert "nuevo" in bloom
+    assert "nuevo" not in BloomFilter.open(path)
+
+    bloom.close()
+
+
+def test_abrir_archivo_invalido(tmp_path):
+    path = tmp_path / "skus.bloom"
+    path.write_bytes(b"\0" * 64)
+
+    with pytest.raises(ValueError):
+        BloomFilter.open(str(path))
+
+
+def test_listener_agrega_ids():
+    bloom = BloomFilter(100)
+    actions = [
+        {"_id": "1_A10N", "_source": {"sku": "A10N"}},
+        {"_op_type": "update", "_id": "1_G40N", "doc": {"precio": 1}},
+        {"_op_type": "delete", "_id": "1_BORRADO"},
+    ]
+
+    sent = list(BulkInsertUpdateDelete._notify(actions, [bloom.bulk_listener]))
+
+    assert sent == actions
+    assert "1_A10N" in bloom and "1_G40N" in bloom
+    assert len(bloom) == 2
+
+
+@pytest.mark.parametrize("capacity, error_rate", [(0, 0.01), (10, 1)])
+def test_parametros_invalidos(capacity, error_rate):
+    with pytest.raises(ValueError):
+        BloomFilter(capacity, error_rate=error_rate)
+
+
+class FakeConnection:
+    """Conexión que responde `_mget` con los `_id` de `existing`."""
+
+    def __init__(self, existing):
+        self.existing = set(existing)
+        self.requested = []
+
+    async def mget(self, body, **kwargs):
+        ids = [doc["_id"] for doc in body["docs"]]
+        self.requested.extend(ids)
+        return {
+            "docs": [
+                {"found": id_ in self.existing, "_source": {"sku_id": id_}}
+                for id_ in ids
+            ]
+        }
+
+
+def searcher(sku_filter, max_age, existing=()):
+    search = SkuSearch.__new__(SkuSearch)
+    search.connection = FakeConnection(existing)
+    search.index_name = "test_index"
+    search.sku_filter = sku_filter
+    search.sku_filter_max_age = max_age
+    return search
+
+
+def test_guardar_conserva_la_fecha(tmp_path):
+    path = str(tmp_path / "skus.bloom")
+    bloom = build()
+    bloom.created -= 100
+    bloom.save(path)
+
+    opened = BloomFilter.open(path)
+
+    assert opened.created == bloom.created
+    assert opened.age() >= 100
+    assert not opened.changed()
+    opened.close()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "max_age, requested", [(None, ["1_NUEVO", "0_0"]), (60, ["0_0"])]
+)
+async def test_get_skus_con_filtro(max_age, requested):
+    search = searcher(build(), max_age, existing={"1_NUEVO", "0_0"})
+
+    results = await search.get_skus([(1, "NUEVO"), (0, "0")])
+
+    # Un filtro en el que no se confía igual pide los descartados
+    assert search.connection.requested == requested
+    assert [result is not None for result in results] == [
+        max_age is None,
+        True,
+    ]
+
+
+@pytest.mark.asyncio
+async def test_filtro_antiguo_no_descarta():
+    bloom = build()
+    bloom.created -= 120
+    search = searcher(bloom, 60, existing={"1_NUEVO"})
+
+    assert await search.get_skus([(1, "NUEVO")]) == [{"sku_id": "1_NUEVO"}]
+
+
+def test_recarga_el_archivo_reemplazado(tmp_path):
+    path = str(tmp_path / "skus.bloom")
+    build().save(path)
+    search = searcher(BloomFilter.open(path), 60)
+    search.sku_filter_listener({"_id": "1_LOCAL", "_source": {}})
+    assert "1_LOCAL" in search.sku_filter
+
+    rebuilt = build()
+    rebuilt.add("1_OTRO_WORKER")
+    rebuilt.save(path)
+
+    assert "1_OTRO_WORKER" in search._fresh_sku_filter()
+    assert search.sku_filter.created == rebuilt.created
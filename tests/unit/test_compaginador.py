@@ -62,3 +62,23 @@ async def test_init_scroll_method():
     results_2, _id = await searcher.next_page(_id)
     results_3, _id = await searcher.next_page(_id)
     assert len(results_1) == 10 and len(results_2) == 10 and results_3 == [] 
+
+
+@pytest.mark.asyncio
+async def test_see_more_con_cursor_desde_otra_instancia():
+    """El cursor permite continuar la búsqueda en cualquier instancia."""
+
+    results = await SkuSearchTest(connection=ASYNC_CONN).search_product(
+        "descripcion", search_size=5
+    )
+
+    assert results.cursor
+
+    pages = [
+        pag
+        async for pag in SkuSearchTest(connection=ASYNC_CONN).see_more(
+            pag_size=10, cursor=results.cursor
+        )
+    ]
+
+    assert [len(pag) for pag in pages] == [10, 10]
@@ -184,3 +184,54 @@ async def test_sku_search_list_all(
     assert len(results) == min((size, 5))
 
     # TODO: asserts for kwargs: includes, excludes, include_meta, etc
+
+
+@pytest.mark.asyncio
+async def test_sku_search_list_all_keyset():
+    """Recorre todos los documentos del proveedor con `after`."""
+
+    searcher = SkuSearchTest(connection=ASYNC_CONN)
+
+    pages, after = [], None
+    while True:
+        page = await searcher.list_all(
+            size=2, rut_proveedor_=76350871, keyset=True, after=after
+        )
+        pages.append([doc["sku_id"] for doc in page])
+        if page.cursor is None:
+            break
+        after = page[-1]["sku_id"]
+
+    assert [len(page) for page in pages] == [2, 2, 1]
+    assert sum(pages, []) == sorted(sum(pages, []), key=str)
+
+    with pytest.raises(ValueError):
+        await searcher.list_all(
+            from_=2, size=2, rut_proveedor_=76350871, keyset=True
+        )
+
+
+@pytest.mark.asyncio
+async def test_sku_search_list_all_keyset_see_more():
+    """`see_more` sin cursor continúa después de la página keyset."""
+
+    searcher = SkuSearchTest(connection=ASYNC_CONN)
+
+    page = await searcher.list_all(
+        size=2, rut_proveedor_=76350871, keyset=True
+    )
+    legacy = [
+        doc["sku_id"]
+        async for results in searcher.see_more(pag_size=2)
+        for doc in results
+    ]
+    with_cursor = [
+        doc["sku_id"]
+        async for results in searcher.see_more(pag_size=2, cursor=page.cursor)
+        for doc in results
+    ]
+
+    assert legacy == with_cursor
+    all_ids = [doc["sku_id"] for doc in page] + legacy
+    assert len(all_ids) == 5
+    assert all_ids == sorted(all_ids, key=str)
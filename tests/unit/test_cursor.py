@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""Pruebas para los cursores de :mod:`laholio.utils.cursor`"""
+import pytest
+
+from laholio.crud import CatalogoUploadSearch
+from laholio.crud import SkuSearch
+from laholio.exceptions import InvalidCursor
+from laholio.settings import Development
+from laholio.settings import Production
+from laholio.utils.async_dsl import AsyncSearch
+from laholio.utils.cursor import SearchPage
+from laholio.utils.cursor import decode_cursor
+from laholio.utils.cursor import encode_cursor
+
+SECRET = b"secreto"
+
+STATE = {
+    "index": "test_index",
+    "body": {"query": {"match_all": {}}, "sort": [{"sku_id.raw": "asc"}]},
+    "params": {"size": 10},
+    "search_after": ["76350871_A10N"],
+}
+
+
+def test_ida_y_vuelta():
+    token = encode_cursor(STATE, SECRET)
+
+    assert decode_cursor(token, SECRET) == STATE
+    assert "=" not in token and token == token.encode("ascii").decode()
+
+
+def test_firma_invalida():
+    token = encode_cursor(STATE, SECRET)
+
+    with pytest.raises(InvalidCursor):
+        decode_cursor(token, b"otro secreto")
+
+
+@pytest.mark.parametrize("token", ["", "no-es-un-cursor", "%%%"])
+def test_token_mal_formado(token):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(token, SECRET)
+
+
+def test_search_page_es_una_lista():
+    page = SearchPage([{"sku": "A10N"}], cursor="abc")
+
+    assert page == [{"sku": "A10N"}] and page.cursor == "abc"
+    assert SearchPage().cursor is None
+
+
+def test_paginar_sin_tiebreaker():
+    searcher = CatalogoUploadSearch.__new__(CatalogoUploadSearch)
+
+    with pytest.raises(NotImplementedError):
+        searcher._page_search(AsyncSearch(), 10)
+
+
+def test_secreto_obligatorio_en_produccion():
+    assert Production.__fields__["CURSOR_SECRET"].required
+    assert not Development.__fields__["CURSOR_SECRET"].required
+
+
+class FakeConnection:
+    """`search` sobre skus en memoria, ordenados por `sku_id`."""
+
+    SKUS = ["1_A", "1_B", "1_C", "1_D", "1_E"]
+
+    async def search(self, index=None, body=None, **params):
+        skus = self.SKUS
+        if "search_after" in body:
+            [after] = body["search_after"]
+            skus = [sku_id for sku_id in skus if sku_id > after]
+        size = body.get("size", params.get("size", 10))
+        return {
+            "hits": {
+                "hits": [
+                    {"_source": {"sku_id": sku_id}, "sort": [sku_id]}
+                    for sku_id in skus[:size]
+                ]
+            }
+        }
+
+
+@pytest.fixture
+def searcher():
+    searcher = SkuSearch.__new__(SkuSearch)
+    searcher.connection = FakeConnection()
+    searcher.index_name = "test_index"
+    searcher.single_flight = None
+    searcher.templates = None
+    return searcher
+
+
+async def see_more(searcher, **kwargs):
+    return [
+        result["sku_id"]
+        async for results in searcher.see_more(pag_size=2, **kwargs)
+        for result in results
+    ]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("after", [None, "1_A"])
+async def test_see_more_continua_list_all_keyset(searcher, after):
+    page = await searcher.list_all(
+        size=2, rut_proveedor_=None, keyset=True, after=after
+    )
+
+    position = FakeConnection.SKUS.index(page[-1]["sku_id"]) + 1
+    rest = FakeConnection.SKUS[position:]
+    assert await see_more(searcher, cursor=page.cursor) == rest
+    assert await see_more(searcher) == rest
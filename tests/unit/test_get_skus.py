@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""Prueba la obtención de skus por `_id` con `_mget`"""
+import pytest
+
+from . import SkuTest
+from . import SkuSearchTest
+from . import ASYNC_CONN
+from . import SYNC_CONN
+from . import SkuInsertTest
+
+SKUS = [(1, "A10N"), (1, "A10"), (2, "A10N"), (2, "G40N")]
+
+
+def setup_module(module):
+
+    if not SYNC_CONN.indices.exists(index="test_index"):
+        SkuTest.init(using=SYNC_CONN)
+
+    documents = (
+        SkuTest(
+            sku_id=SkuTest.build_sku_id(rut, sku),
+            sku=sku,
+            descripcion_corta="test",
+            rut_proveedor_=rut,
+        )
+        for rut, sku in SKUS
+    )
+
+    inserter = SkuInsertTest(connection=SYNC_CONN)
+
+    # Sin refresh: el get es en tiempo real
+    inserter.bulk_request(documents)
+
+
+def teardown_module(module):
+    SYNC_CONN.indices.delete(index="test_index")
+
+
+@pytest.mark.asyncio
+async def test_get_skus():
+    crud = SkuSearchTest(connection=ASYNC_CONN)
+
+    results = await crud.get_skus(
+        [(2, "G40N"), (3, "A10N"), (1, "A10N")],
+        includes=["sku", "rut_proveedor_"],
+        chunk_size=2,
+    )
+
+    assert results == [
+        {"sku": "G40N", "rut_proveedor_": 2},
+        None,
+        {"sku": "A10N", "rut_proveedor_": 1},
+    ]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("include_meta", [True, False])
+async def test_search_product_by_sku_exacto(include_meta):
+    crud = SkuSearchTest(connection=ASYNC_CONN)
+
+    results = await crud.search_product_by_sku(
+        "A10", rut_proveedor_=1, include_meta=include_meta, exact=True
+    )
+
+    assert len(results) == 1
+    source = results[0]["_source"] if include_meta else results[0]
+    assert source["sku"] == "A10"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("include_meta", [True, False])
+async def test_search_product_by_sku_por_campo(include_meta):
+    crud = SkuSearchTest(connection=ASYNC_CONN)
+    SYNC_CONN.indices.refresh(index="test_index")
+
+    results = await crud.search_product_by_sku(
+        "A10", rut_proveedor_=1, include_meta=include_meta
+    )
+
+    # Calza también `A10N`, por los n-gramas del campo `sku`
+    sources = [
+        result["_source"] if include_meta else result for result in results
+    ]
+    assert sorted(source["sku"] for source in sources) == ["A10", "A10N"]
+    if include_meta:
+        assert all("_score" in result for result in results)
+
+
+@pytest.mark.asyncio
+async def test_get_skus_con_filtro():
+    crud = SkuSearchTest(connection=ASYNC_CONN)
+    crud.sku_filter_max_age = 60
+    SYNC_CONN.indices.refresh(index="test_index")  # el scan no es realtime
+
+    sku_filter = await crud.load_sku_filter()
+
+    assert len(sku_filter) == len(SKUS)
+    expected = await crud.search_product_by_sku("A10N", 1, exact=True)
+    assert await crud.get_skus([(3, "A10N"), (1, "A10N")]) == [
+        None,
+        expected[0],
+    ]
+    assert await crud.search_product_by_sku("NOEXISTE", 1, exact=True) == []
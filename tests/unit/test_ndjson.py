@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+"""Compara :mod:`laholio.utils.ndjson` con el cuerpo de `bulk_request`."""
+import datetime
+import json
+import time
+from decimal import Decimal
+
+import pytest
+from elasticsearch import Elasticsearch
+from elasticsearch import Transport
+from elasticsearch.helpers.actions import _chunk_actions
+from elasticsearch.helpers.actions import expand_action
+from elasticsearch.serializer import JSONSerializer
+
+from laholio import S
+from laholio.crud import BulkInsertUpdateDelete
+from laholio.utils.ndjson import BulkEncoder
+from laholio.utils.serializer import FastJSONSerializer
+
+INSERTER = BulkInsertUpdateDelete.__new__(BulkInsertUpdateDelete)
+INSERTER.index_name = "test_index"
+
+COLUMNS = ("sku_id", "sku", "rut_proveedor_", "descripcion_larga", "atributos")
+
+
+def rows(n):
+    for i in range(n):
+        yield (
+            "{}_SKU{}".format(i % 7, i),
+            "SKU{}".format(i),
+            i % 7,
+            'Descripción ñandú "{}" / 10€  '.format(i) * (i % 5),
+            {"precio": Decimal("1.5"), "fecha": datetime.date(2020, 1, 2)},
+        )
+
+
+def documents(n):
+    for row in rows(n):
+        source = dict(zip(COLUMNS, row))
+        yield {"_id": source["sku_id"], "_source": source}
+
+
+def expected_chunks(actions, chunk_size=500, max_chunk_bytes=4000):
+    """Lo que envía `elasticsearch.helpers.bulk`."""
+    return [
+        ("\n".join(bulk_actions) + "\n").encode("utf-8")
+        for _, bulk_actions in _chunk_actions(
+            map(expand_action, actions),
+            chunk_size,
+            max_chunk_bytes,
+            FastJSONSerializer(),
+        )
+    ]
+
+
+def encoded_chunks(encoder, documents):
+    return [body for body, _ in encoder.chunks(documents)]
+
+
+class FakeTransport(Transport):
+    """Transporte que guarda los cuerpos de la bulk API, en bytes."""
+
+    def __init__(self, *args, **kwargs):
+        self.serializer = JSONSerializer()
+        self.bodies = []
+
+    def perform_request(
+        self, method, url, headers=None, params=None, body=None
+    ):
+        if method == "HEAD":
+            return True
+
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        self.bodies.append(body)
+        items = []
+        lines = iter(body.splitlines())
+        for line in lines:
+            [(op_type, meta)] = json.loads(line.decode("utf-8")).items()
+            if op_type != "delete":
+                next(lines)
+            items.append({op_type: {"_id": meta.get("_id"), "status": 200}})
+        return {"items": items}
+
+
+@pytest.fixture(params=[False, True], ids=["sin_routing", "routing"])
+def routing(request, monkeypatch):
+    monkeypatch.setattr(S, "ROUTING_BY_PROVIDER", request.param)
+
+
+@pytest.mark.parametrize("with_ids", [True, False])
+def test_identico_a_prepare_bulk_raw(routing, with_ids):
+    docs = list(documents(60))
+    encoder = BulkEncoder(
+        "test_index", with_ids=with_ids, chunk_size=7, max_chunk_bytes=4000
+    )
+
+    expected = expected_chunks(
+        INSERTER.prepare_bulk_raw(docs, "index", with_ids), chunk_size=7
+    )
+
+    # Sin `_id`, el documento puede ser la fuente o traer `_source`
+    if not with_ids:
+        docs = [doc["_source"] for doc in docs]
+    assert encoded_chunks(encoder, docs) == expected
+    assert len(expected) > 60 // 7
+
+
+def test_filas_igual_a_diccionarios(routing):
+    encoder = BulkEncoder("test_index", max_chunk_bytes=4000)
+    row_encoder = BulkEncoder(
+        "test_index", columns=COLUMNS, id_column="sku_id", max_chunk_bytes=4000
+    )
+
+    assert encoded_chunks(row_encoder, rows(30)) == encoded_chunks(
+        encoder, documents(30)
+    )
+
+
+@pytest.mark.parametrize("op_type", ["update", "delete"])
+def test_update_y_delete(routing, op_type):
+    docs = list(documents(10))
+    encoder = BulkEncoder("test_index", op_type=op_type)
+
+    expected = expected_chunks(
+        BulkInsertUpdateDelete._with_routing(
+            {
+                "_op_type": op_type,
+                "_index": "test_index",
+                "_type": "doc",
+                "_id": doc["_id"],
+                "doc": doc["_source"],
+            }
+        )
+        for doc in docs
+    )
+
+    assert encoded_chunks(encoder, docs) == expected
+
+
+@pytest.mark.parametrize(
+    "op_type, document",
+    [
+        ("delete", {"_id": "7_A10N"}),
+        ("delete", {"_id": "7_A10N", "_routing": "9"}),
+        ("update", {"_id": "7_A10N", "_source": {"precio": 10}}),
+    ],
+)
+def test_delete_y_update_parcial_sin_rut(routing, op_type, document):
+    encoder = BulkEncoder("test_index", op_type=op_type)
+
+    expected = expected_chunks(
+        INSERTER.prepare_bulk_raw([document], op_type, True)
+    )
+
+    assert encoded_chunks(encoder, [document]) == expected
+    assert (b'"_routing"' in expected[0]) is (
+        S.ROUTING_BY_PROVIDER or "_routing" in document
+    )
+
+
+@pytest.mark.parametrize(
+    "with_ids, form", [(True, "_id"), (False, "_source"), (False, "plano")]
+)
+@pytest.mark.parametrize("op_type", ["index", "update", "delete"])
+def test_bulk_request_y_encoded_envian_los_mismos_bytes(
+    routing, op_type, with_ids, form
+):
+    docs = list(documents(40))
+    if form == "_source":
+        docs = [{"_source": doc["_source"]} for doc in docs]
+    elif form == "plano":
+        docs = [doc["_source"] for doc in docs]
+
+    bodies = []
+    for send in ("bulk_request", "bulk_request_encoded"):
+        connection = Elasticsearch(transport_class=FakeTransport)
+        inserter = BulkInsertUpdateDelete(connection, "test_index")
+        kwargs = dict(document_type="raw") if send == "bulk_request" else {}
+        success, errors = getattr(inserter, send)(
+            docs, op_type=op_type, with_ids=with_ids, chunk_size=7, **kwargs
+        )
+        assert (success, errors) == (len(docs), [])
+        bodies.append(connection.transport.bodies)
+
+    assert bodies[0] == bodies[1]
+    assert len(bodies[0]) == 6
+
+
+def test_on_document():
+    seen = []
+    encoder = BulkEncoder(
+        "test_index", on_document=lambda _id, source: seen.append(_id)
+    )
+
+    encoded_chunks(encoder, documents(3))
+
+    assert seen == ["0_SKU0", "1_SKU1", "2_SKU2"]
+
+
+def test_columnas_sin_id():
+    with pytest.raises(ValueError):
+        BulkEncoder("test_index", columns=("sku",), id_column="sku_id")
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize("size", [10000])
+def test_throughput_del_encoder(size):
+    """Documentos por segundo hasta el cuerpo listo para enviar."""
+    source_rows = list(rows(size))
+    docs = list(documents(size))
+
+    def raw():
+        expected_chunks(
+            INSERTER.prepare_bulk_raw(docs, "index", True),
+            max_chunk_bytes=10 * 1024 * 1024,
+        )
+
+    def encoded():
+        encoded_chunks(BulkEncoder("test_index"), docs)
+
+    def encoded_rows():
+        encoded_chunks(
+            BulkEncoder("test_index", columns=COLUMNS, id_column="sku_id"),
+            source_rows,
+        )
+
+    rates = {}
+    for name, function in [
+        ("raw", raw),
+        ("encoder", encoded),
+        ("encoder_filas", encoded_rows),
+    ]:
+        elapsed = min(_timed(function) for _ in range(3))
+        rates[name] = size / elapsed
+
+    print(
+        " ".join(
+            "{}={:.0f} docs/s".format(name, rate)
+            for name, rate in rates.items()
+        )
+    )
+
+    assert rates["encoder"] > rates["raw"]
+
+
+def _timed(function):
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
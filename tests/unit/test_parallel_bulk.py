@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""Pruebas de la bulk request sincrónica en paralelo"""
+import json
+import threading
+
+import pytest
+from elasticsearch import Elasticsearch
+from elasticsearch import Transport
+from elasticsearch.serializer import JSONSerializer
+
+from laholio.crud import BulkInsertUpdateDelete
+
+
+class FakeTransport(Transport):
+    """Transporte que responde la bulk API sin un cluster."""
+
+    bodies: list = []
+    threads: set = set()
+    rejected: set = set()
+
+    def __init__(self, *args, **kwargs):
+        self.serializer = JSONSerializer()
+
+    def perform_request(
+        self, method, url, headers=None, params=None, body=None
+    ):
+        if method == "HEAD":
+            return True
+
+        self.threads.add(threading.get_ident())
+        self.bodies.append(body)
+        items = []
+        for line in body.splitlines()[::2]:
+            [(op_type, meta)] = json.loads(line).items()
+            item = {
+                "_index": meta["_index"],
+                "_id": meta["_id"],
+                "status": 201,
+            }
+            if meta["_id"] == "1_MALO":
+                item.update(status=400, error={"type": "mapper_parsing"})
+            elif meta["_id"] == "1_X7" and meta["_id"] not in self.rejected:
+                self.rejected.add(meta["_id"])
+                item.update(status=429)
+            items.append({op_type: item})
+        return {"items": items}
+
+
+@pytest.fixture
+def inserter():
+    FakeTransport.bodies.clear()
+    FakeTransport.threads.clear()
+    FakeTransport.rejected.clear()
+    connection = Elasticsearch(transport_class=FakeTransport)
+    return BulkInsertUpdateDelete(connection, "test_index")
+
+
+def documents(n):
+    for i in range(n):
+        yield {
+            "_id": "1_MALO" if i == 3 else "1_X{}".format(i),
+            "_source": {"sku": "X", "descripcion_larga": "a" * 500},
+        }
+
+
+@pytest.mark.parametrize("thread_count", [1, 4])
+def test_resultado_igual_en_paralelo(inserter, thread_count):
+    success, errors = inserter.bulk_request(
+        documents(40),
+        document_type="raw",
+        thread_count=thread_count,
+        chunk_size=5,
+    )
+
+    assert success == 38  # el 429 no se reintenta
+    assert sorted(error["_id"] for error in errors) == ["1_MALO", "1_X7"]
+    assert [error for error in errors if error["_id"] == "1_MALO"] == [
+        {
+            "_index": "test_index",
+            "_id": "1_MALO",
+            "op_type": "index",
+            "status": 400,
+            "error": {"type": "mapper_parsing"},
+            "attempts": 1,
+        }
+    ]
+    assert len(FakeTransport.bodies) == 8
+    assert len(FakeTransport.threads) <= thread_count
+
+
+def test_chunks_por_bytes(inserter):
+    inserter.bulk_request(
+        documents(40), document_type="raw", max_chunk_bytes=4000
+    )
+
+    assert len(FakeTransport.bodies) > 1
+    assert all(len(body.encode()) <= 4000 for body in FakeTransport.bodies)
+
+
+@pytest.mark.parametrize("thread_count", [1, 4])
+def test_reintento_de_rechazados(inserter, thread_count):
+    success, errors = inserter.bulk_request(
+        documents(40),
+        document_type="raw",
+        thread_count=thread_count,
+        chunk_size=5,
+        max_retries=2,
+        initial_backoff=0,
+    )
+
+    assert success == 39
+    assert [(error["_id"], error["attempts"]) for error in errors] == [
+        ("1_MALO", 1)
+    ]
+    assert len(FakeTransport.bodies) == 9
+
+
+def test_bulk_request_codificada(inserter):
+    actions = []
+    inserter.add_listener(actions.append)
+
+    success, errors = inserter.bulk_request_encoded(
+        documents(12), chunk_size=5
+    )
+
+    # Sin reintentos, el 429 queda como falla
+    assert success == 10
+    assert [error["_id"] for error in errors] == ["1_MALO", "1_X7"]
+    sizes = [body.count(b"\n") // 2 for body in FakeTransport.bodies]
+    assert sizes == [5, 5, 2]
+    assert len(actions) == 12
+    assert actions[0] == {
+        "_op_type": "index",
+        "_id": "1_X0",
+        "_source": {"sku": "X", "descripcion_larga": "a" * 500},
+    }
+
+
+@pytest.mark.parametrize(
+    "op_type, body", [("update", {"doc": {"precio": 10}}), ("delete", None)]
+)
+def test_raw_update_y_delete(inserter, op_type, body):
+    success, errors = inserter.bulk_request(
+        [{"_id": "1_X1", "_source": {"precio": 10}}],
+        document_type="raw",
+        op_type=op_type,
+    )
+
+    assert (success, errors) == (1, [])
+    [sent] = FakeTransport.bodies
+    lines = [json.loads(line) for line in sent.splitlines()]
+    assert list(lines[0]) == [op_type]
+    assert lines[0][op_type]["_id"] == "1_X1"
+    assert lines[1:] == ([] if body is None else [body])
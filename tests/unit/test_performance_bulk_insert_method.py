@@ -96,3 +96,20 @@ async def test_productos_bien_cargados(input_id, expected):
     descripcion = [hit.descripcion_corta for hit in response]
 
     assert len(descripcion) == 1 and descripcion[0] == expected
+
+
+@pytest.mark.parametrize("slices", [1, 3])
+@pytest.mark.asyncio
+async def test_scan_recorre_todos_los_documentos(slices):
+
+    searcher = SkuSearchTest(ASYNC_CONN)
+
+    ids = [
+        hit.meta.id
+        async for hit in searcher.search_base.scan(size=17, slices=slices)
+    ]
+
+    assert len(ids) == len(set(ids)) == (
+        CANTIDAD_DE_DOCUMENTOS_A_CARGAR_USANDO_DSL
+        + CANTIDAD_DE_DOCUMENTOS_A_CARGAR_USANDO_RAW
+    )
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""Compara la serialización desde `Response` y desde el JSON crudo."""
+import json
+import timeit
+
+import pytest
+from elasticsearch.exceptions import SerializationError
+from elasticsearch_dsl.response import Response
+
+from laholio.crud import BaseAsyncSearch
+from laholio.utils.async_dsl import AsyncSearch
+from laholio.utils.serializer import FastJSONSerializer
+
+# `serialize` no usa la conexión, así que se evita el constructor
+SEARCHER = BaseAsyncSearch.__new__(BaseAsyncSearch)
+
+
+def raw_response(size=100):
+    return {
+        "took": 3,
+        "timed_out": False,
+        "hits": {
+            "total": size,
+            "max_score": 1.0,
+            "hits": [
+                {
+                    "_index": "test_index",
+                    "_type": "doc",
+                    "_id": str(i),
+                    "_score": 1.0,
+                    "_source": {
+                        "sku_id": str(i),
+                        "sku": "SKU{}".format(i),
+                        "descripcion_corta_": "Producto número {}".format(i),
+                        "rut_proveedor_": 76350871,
+                        "atributos": [{"nombre": "color", "valor": "rojo"}],
+                    },
+                    "sort": [1.0, str(i)],
+                }
+                for i in range(size)
+            ],
+        },
+    }
+
+
+def dsl_response(raw):
+    return Response(AsyncSearch(), raw)
+
+
+@pytest.mark.parametrize("include_meta", [True, False])
+def test_serializado_identico(include_meta):
+    raw = raw_response()
+
+    expected = SEARCHER.serialize(dsl_response(raw), include_meta)
+
+    assert SEARCHER.serialize(raw, include_meta) == expected
+    assert json.dumps(SEARCHER.serialize(raw, include_meta)) == json.dumps(
+        expected
+    )
+
+
+@pytest.mark.parametrize("response", [{}, dsl_response({})])
+def test_respuesta_sin_hits_por_filter_path(response):
+    assert SEARCHER.serialize(response, False) == []
+
+
+@pytest.mark.parametrize(
+    "include_meta, extra, expected",
+    [
+        (False, (), "hits.hits._source"),
+        (True, (), "hits.hits"),
+        (False, ("hits.hits.sort",), "hits.hits._source,hits.hits.sort"),
+    ],
+)
+def test_filter_path(include_meta, extra, expected):
+    assert SEARCHER._filter_path(include_meta, *extra) == expected
+
+
+def test_sugerencia_sin_opciones():
+    response = dsl_response({"suggest": {"sku_suggest": [{"text": "x"}]}})
+
+    assert SEARCHER._suggestion_texts(response, "sku_suggest") == []
+
+
+def test_fast_json_serializer():
+    raw = raw_response(size=3)
+    serializer = FastJSONSerializer()
+
+    assert serializer.loads(serializer.dumps(raw)) == raw
+
+    with pytest.raises(SerializationError):
+        serializer.loads("{no es json")
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize("size", [10, 50, 100])
+def test_serializado_crudo_mas_rapido(size):
+    body = json.dumps(raw_response(size))
+    serializer = FastJSONSerializer()
+
+    def dsl():
+        SEARCHER.serialize(dsl_response(json.loads(body)), False)
+
+    def raw():
+        SEARCHER.serialize(serializer.loads(body), False)
+
+    dsl_time = min(timeit.repeat(dsl, number=200, repeat=5))
+    raw_time = min(timeit.repeat(raw, number=200, repeat=5))
+
+    assert raw_time < dsl_time, "size={} dsl={:.4f}s raw={:.4f}s".format(
+        size, dsl_time, raw_time
+    )
+
+
+def test_sugerencia_con_collate_descarta_sin_matches():
+    response = dsl_response(
+        {
+            "suggest": {
+                "sku_suggest": [
+                    {
+                        "text": "cemnto",
+                        "options": [
+                            {"text": "cemnto melon", "collate_match": False},
+                            {"text": "cemento", "collate_match": True},
+                        ],
+                    }
+                ]
+            }
+        }
+    )
+
+    assert SEARCHER._suggestion_texts(response, "sku_suggest") == ["cemento"]
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""Pruebas para el log de queries :mod:`laholio.utils.query_log`"""
+import logging
+import queue
+
+import pytest
+
+from laholio.utils.query_log import DeferredQueueHandler
+from laholio.utils.query_log import QueryLog
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class Query:
+    """Cuenta cuántas veces se serializa la query."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def to_dict(self):
+        self.calls += 1
+        return {"query": {"match_all": {}}}
+
+
+def test_muestreo_uno_de_n_por_forma():
+    query_log, query = QueryLog(sample=3), Query()
+
+    logged = [query_log.log("a", query.to_dict) for _ in range(7)]
+
+    assert logged == [True, False, False, True, False, False, True]
+    assert query.calls == 3
+    assert query_log.log("b", query.to_dict)
+
+
+def test_limite_por_segundo():
+    clock = FakeClock()
+    query_log, query = QueryLog(rate=2, clock=clock), Query()
+
+    assert [query_log.log("a", query.to_dict) for _ in range(3)] == [
+        True,
+        True,
+        False,
+    ]
+
+    clock.now = 0.5
+    assert query_log.log("a", query.to_dict)
+    assert not query_log.log("a", query.to_dict)
+    assert query.calls == 3
+
+
+def test_no_serializa_si_el_nivel_no_esta_habilitado():
+    name = "laholio.test_query_log"
+    logging.getLogger(name).setLevel(logging.WARNING)
+    query_log, query = QueryLog(name=name), Query()
+
+    assert not query_log.log("a", query.to_dict)
+    assert query.calls == 0
+
+
+@pytest.mark.parametrize("sample, rate", [(0, None), (1, 0)])
+def test_parametros_invalidos(sample, rate):
+    with pytest.raises(ValueError):
+        QueryLog(sample=sample, rate=rate)
+
+
+def test_handler_encola_sin_formatear():
+    class Formatter(logging.Formatter):
+        def format(self, record):
+            raise AssertionError("no se debe formatear al encolar")
+
+    queue_ = queue.Queue(1)
+    handler = DeferredQueueHandler(queue_)
+    handler.setFormatter(Formatter())
+    record = logging.LogRecord(
+        "laholio", logging.INFO, __file__, 1, {"event": "Query"}, None, None
+    )
+
+    handler.handle(record)
+    handler.handle(record)
+
+    assert queue_.get_nowait() is record
+    assert handler.dropped == 1
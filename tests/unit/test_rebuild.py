@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+"""Pruebas de la reconstrucción blue/green :mod:`laholio.rebuild`"""
+from unittest import mock
+
+import pytest
+from elasticsearch_dsl import Document
+
+from laholio import rebuild as rebuild_module
+from laholio.crud import BulkInsertUpdateDelete
+from laholio.exceptions import AliasIsIndex
+from laholio.exceptions import IndexNotExists
+from laholio.rebuild import CatalogRebuild
+from laholio.rebuild import rollback
+from laholio.schemas import Sku
+from laholio.schemas import index_versions
+from laholio.schemas import init_schema
+from laholio.schemas import migrate_sku_id_raw
+from laholio.schemas import put_alias
+from laholio.utils.cache import MISSING
+from laholio.utils.cache import SearchResultCache
+
+from . import SYNC_CONN
+
+ALIAS = "test_rebuild"
+
+
+class SkuRebuildTest(Sku):
+    """Documento de prueba detrás del alias `test_rebuild`"""
+
+    class Index(Sku.Index):
+        name = ALIAS
+
+
+def teardown_module(module):
+    SYNC_CONN.indices.delete(index=ALIAS + "*", ignore=404)
+
+
+def rebuild(version, skus):
+    catalog = CatalogRebuild(
+        SYNC_CONN, doc=SkuRebuildTest, version=version, keep=2
+    )
+    with catalog.loading(force_merge=False) as inserter:
+        settings = SYNC_CONN.indices.get_settings(index=catalog.index_name)
+        assert (
+            settings[catalog.index_name]["settings"]["index"][
+                "refresh_interval"
+            ]
+            == "-1"
+        )
+        inserter.bulk_request(
+            SkuRebuildTest(
+                sku_id=SkuRebuildTest.build_sku_id(1, sku),
+                sku=sku,
+                rut_proveedor_=1,
+            )
+            for sku in skus
+        )
+    catalog.publish(wait_for_status="yellow", timeout="30s")
+    return catalog
+
+
+def count():
+    return SYNC_CONN.count(index=ALIAS)["count"]
+
+
+def test_rebuild_y_rollback():
+    rebuild("1", ["A10N"])
+    assert count() == 1
+
+    catalog = rebuild("2", ["A10N", "G40N"])
+    assert count() == 2
+    assert list(SYNC_CONN.indices.get_alias(name=ALIAS)) == [
+        catalog.index_name
+    ]
+    # Los settings de la carga masiva se restauraron
+    settings = SYNC_CONN.indices.get_settings(index=catalog.index_name)
+    index_settings = settings[catalog.index_name]["settings"]["index"]
+    assert index_settings["refresh_interval"] == "1s"
+    assert index_settings["number_of_replicas"] == "0"
+
+    rebuild("3", ["A10N", "G40N", "X1"])
+    assert index_versions(SYNC_CONN, ALIAS) == [
+        ALIAS + "_v2",
+        ALIAS + "_v3",
+    ]
+
+    assert rollback(SYNC_CONN, ALIAS) == ALIAS + "_v2"
+    assert count() == 2
+
+    with pytest.raises(IndexNotExists):
+        rollback(SYNC_CONN, ALIAS)
+
+
+def test_finish_bulk_load_idempotente():
+    catalog = CatalogRebuild(SYNC_CONN, doc=SkuRebuildTest, version="9")
+    catalog.create()
+    catalog.inserter.start_bulk_load()
+
+    # Un proceso nuevo, luego de una caída
+    inserter = BulkInsertUpdateDelete(SYNC_CONN, catalog.index_name)
+    assert inserter.finish_bulk_load() is True
+    assert inserter.finish_bulk_load() is False
+
+
+def test_put_alias_sobre_indice():
+    SYNC_CONN.indices.create(index=ALIAS + "_concreto")
+    SYNC_CONN.indices.create(index=ALIAS + "_nuevo")
+
+    with pytest.raises(AliasIsIndex):
+        put_alias(SYNC_CONN, ALIAS + "_nuevo", ALIAS + "_concreto")
+
+    assert (
+        put_alias(
+            SYNC_CONN,
+            ALIAS + "_nuevo",
+            ALIAS + "_concreto",
+            replace_index=True,
+        )
+        == []
+    )
+    assert list(SYNC_CONN.indices.get_alias(name=ALIAS + "_concreto")) == [
+        ALIAS + "_nuevo"
+    ]
+
+
+def test_migrar_sku_id_raw():
+    index = ALIAS + "_sin_raw"
+    SYNC_CONN.indices.create(
+        index=index,
+        body={
+            "mappings": {"doc": {"properties": {"sku_id": {"type": "text"}}}}
+        },
+    )
+    SYNC_CONN.index(
+        index=index, doc_type="doc", id="1_A", body={"sku_id": "1_A"}
+    )
+    SYNC_CONN.indices.refresh(index=index)
+
+    task = migrate_sku_id_raw(SYNC_CONN, index)
+    SYNC_CONN.tasks.get(task_id=task, wait_for_completion=True)
+    SYNC_CONN.indices.refresh(index=index)
+
+    mapping = SYNC_CONN.indices.get_mapping(index=index)
+    assert mapping[index]["mappings"]["doc"]["properties"]["sku_id"][
+        "fields"
+    ] == {"raw": {"type": "keyword"}}
+    hits = SYNC_CONN.search(
+        index=index, body={"sort": [{"sku_id.raw": "asc"}]}
+    )["hits"]["hits"]
+    assert hits[0]["sort"] == ["1_A"]
+    assert migrate_sku_id_raw(SYNC_CONN, index) is None
+
+
+@pytest.mark.parametrize("has_raw", [True, False])
+def test_init_schema_no_migra_sku_id_raw(has_raw):
+    connection = mock.Mock()
+    connection.indices.exists.return_value = True
+    connection.indices.get_field_mapping.return_value = {
+        ALIAS
+        + "_v1": {
+            "mappings": {
+                "doc": {"sku_id.raw": {"mapping": {}}} if has_raw else {}
+            }
+        }
+    }
+
+    with mock.patch("laholio.schemas.logger") as logger:
+        init_schema(connection, doc=SkuRebuildTest, templates=False)
+
+    assert logger.warning.called is not has_raw
+    connection.indices.put_mapping.assert_not_called()
+    connection.update_by_query.assert_not_called()
+
+
+def test_warmers_obligatorios_si_no_es_sku():
+    class Otro(Document):
+        class Index:
+            name = "otro"
+
+    with pytest.raises(ValueError):
+        CatalogRebuild(mock.Mock(), doc=Otro)
+
+    catalog = CatalogRebuild(mock.Mock(), doc=Otro, warmers=[{"size": 0}])
+    assert catalog.warmers == ({"size": 0},)
+    assert CatalogRebuild(mock.Mock(), doc=SkuRebuildTest).warmers == (
+        rebuild_module.WARMERS
+    )
+
+
+def test_mover_el_alias_invalida_el_cache(monkeypatch):
+    connection = mock.MagicMock()
+    connection.cluster.health.return_value = {}
+    connection.indices.get_alias.return_value = {ALIAS + "_v2": {}}
+    monkeypatch.setattr(rebuild_module, "put_alias", mock.Mock())
+    monkeypatch.setattr(
+        rebuild_module,
+        "index_versions",
+        mock.Mock(return_value=[ALIAS + "_v1", ALIAS + "_v2"]),
+    )
+
+    cache = SearchResultCache()
+    key = cache.make_key(ALIAS, "martillo", "and")
+    other = cache.make_key("otro", "martillo", "and")
+
+    for move in [
+        lambda: CatalogRebuild(
+            connection, doc=SkuRebuildTest, version="3"
+        ).publish(),
+        lambda: rollback(connection, ALIAS),
+    ]:
+        cache.set(key, ["viejo"])
+        cache.set(other, ["otro"])
+        move()
+        assert cache.get(key) is MISSING
+        assert cache.get(other) == ["otro"]
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""Pruebas para el caché de resultados :mod:`laholio.utils.cache`"""
+import pytest
+
+from laholio.utils.cache import MISSING
+from laholio.utils.cache import SearchResultCache
+from laholio.utils.cache import invalidate
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def key(text, rut=None, index="test_index", operator="and"):
+    return SearchResultCache.make_key(index, text, operator, rut, size=5)
+
+
+def test_key_normaliza_texto_y_proveedores():
+
+    assert key("  Cemento   MELON ", [2, 1]) == key("cemento melon", [1, 2])
+    assert key("cemento", 1) != key("cemento", 2)
+    assert key("cemento", operator="and") != key("cemento", operator="or")
+
+
+def test_hit_miss_y_copia_defensiva():
+    cache = SearchResultCache()
+
+    assert cache.get(key("cemento")) is MISSING
+
+    cache.set(key("cemento"), [{"sku": "200032"}])
+    cached = cache.get(key("cemento"))
+    cached[0]["sku"] = "otro"
+
+    assert cache.get(key("cemento")) == [{"sku": "200032"}]
+    assert cache.stats.as_dict()["hits"] == 2
+    assert cache.stats.as_dict()["misses"] == 1
+
+
+def test_ttl():
+    clock = FakeClock()
+    cache = SearchResultCache(ttl=10, clock=clock)
+    cache.set(key("cemento"), [])
+
+    clock.now = 9.9
+    assert cache.get(key("cemento")) == []
+
+    clock.now = 10
+    assert cache.get(key("cemento")) is MISSING
+    assert cache.stats.expirations == 1 and len(cache) == 0
+
+
+def test_lru_acotado_en_bytes():
+    value = ["x" * 90]
+    cache = SearchResultCache(max_bytes=300)
+
+    for i in range(3):
+        cache.set(key(str(i)), value)
+
+    cache.get(key("0"))  # "0" pasa a ser el más reciente
+    cache.set(key("3"), value)
+
+    assert cache.get(key("1")) is MISSING
+    assert cache.get(key("0")) == value
+    assert cache.stats.evictions == 1
+    assert cache.nbytes <= cache.max_bytes
+
+
+def test_invalidacion_por_proveedor():
+    cache = SearchResultCache()
+    cache.set(key("a", 1), [])
+    cache.set(key("b", [1, 2]), [])
+    cache.set(key("c", 3), [])
+    cache.set(key("d"), [])
+    cache.set(key("e", 1, index="otro_index"), [])
+
+    assert invalidate("test_index", [1]) == 3
+
+    assert cache.get(key("c", 3)) == []
+    assert cache.get(key("e", 1, index="otro_index")) == []
+    for text, rut in (("a", 1), ("b", [1, 2]), ("d", None)):
+        assert cache.get(key(text, rut)) is MISSING
+
+
+def test_invalidacion_de_indice_completo():
+    cache = SearchResultCache()
+    cache.set(key("a", 1), [])
+    cache.set(key("b", 2), [])
+
+    assert cache.invalidate("test_index") == 2
+    assert len(cache) == 0 and cache.nbytes == 0
+
+
+@pytest.mark.parametrize("max_bytes, ttl", [(0, 1), (1, 0)])
+def test_parametros_invalidos(max_bytes, ttl):
+    with pytest.raises(ValueError):
+        SearchResultCache(max_bytes=max_bytes, ttl=ttl)
+
+
+def test_set_descarta_busquedas_anteriores_a_la_invalidacion():
+    cache = SearchResultCache()
+    stamped = [cache.stamp(key("a", 1)), cache.stamp(key("b", 2))]
+    stamped_all = cache.stamp(key("c"))
+
+    # Escritura sobre el proveedor 1 mientras las búsquedas están en curso
+    invalidate("test_index", [1])
+    for stamped_key in stamped + [stamped_all]:
+        cache.set(stamped_key, ["viejo"])
+
+    assert cache.get(key("a", 1)) is MISSING
+    assert cache.get(key("b", 2)) == ["viejo"]
+    assert cache.get(key("c")) is MISSING
+    assert cache.stats.stale_sets == 2
+
+    stamped = cache.stamp(key("b", 2))
+    invalidate("test_index")
+    cache.set(stamped, ["viejo"])
+    assert cache.get(key("b", 2)) is MISSING
+
+    cache.set(cache.stamp(key("b", 2)), ["nuevo"])
+    assert cache.get(key("b", 2)) == ["nuevo"]
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""Pruebas del routing por `rut_proveedor_`"""
+import pytest
+
+from laholio import S
+from laholio.crud import BulkInsertUpdateDelete
+from laholio.crud import SkuSearch
+from laholio.schemas import Sku
+from laholio.utils.async_dsl import AsyncSearch
+
+
+@pytest.fixture
+def routing(monkeypatch):
+    monkeypatch.setattr(S, "ROUTING_BY_PROVIDER", True)
+
+
+@pytest.mark.parametrize(
+    "rut_proveedor_, expected",
+    [(1, "1"), ([1, 2], "1,2"), ([], None), (None, None)],
+)
+def test_build_routing(routing, rut_proveedor_, expected):
+    assert Sku.build_routing(rut_proveedor_) == expected
+
+
+def test_sin_routing_por_defecto():
+    assert Sku.build_routing(1) is None
+    assert SkuSearch._filter_brand(AsyncSearch(), 1)._params == {}
+
+
+@pytest.mark.parametrize(
+    "rut_proveedor_, expected", [(1, "1"), ([2, 3], "2,3")]
+)
+def test_filter_brand(routing, rut_proveedor_, expected):
+    search = SkuSearch._filter_brand(AsyncSearch(), rut_proveedor_)
+
+    assert search._params == {"routing": expected}
+
+
+@pytest.mark.parametrize("op_type", ["index", "update", "delete"])
+def test_bulk_raw(routing, op_type):
+    inserter = BulkInsertUpdateDelete.__new__(BulkInsertUpdateDelete)
+    inserter.index_name = "test_index"
+    documents = [
+        {"_id": "1_A10N", "_source": {"sku": "A10N", "rut_proveedor_": 1}},
+        {"_id": "otro", "_source": {"client_id": "x"}},
+    ]
+
+    actions = list(inserter.prepare_bulk_raw(documents, op_type, True))
+
+    assert actions[0]["_routing"] == "1"
+    assert "_routing" not in actions[1]
+
+
+@pytest.mark.parametrize(
+    "op_type, document",
+    [
+        ("delete", {"_id": "7_A10N"}),
+        ("update", {"_id": "7_A10N", "_source": {"precio": 10}}),
+    ],
+)
+def test_delete_y_update_parcial_sin_rut(routing, op_type, document):
+    inserter = BulkInsertUpdateDelete.__new__(BulkInsertUpdateDelete)
+    inserter.index_name = "test_index"
+
+    [action] = inserter.prepare_bulk_raw([document], op_type, True)
+    [explicit] = inserter.prepare_bulk_raw(
+        [{**document, "_routing": "9"}], op_type, True
+    )
+
+    assert action["_op_type"] == op_type
+    assert action["_routing"] == "7"
+    assert explicit["_routing"] == "9"
+
+
+@pytest.mark.parametrize("sku_id", ["otro", "x_A10N", None])
+def test_routing_from_id_sin_rut(routing, sku_id):
+    assert Sku.routing_from_id(sku_id) is None
+
+
+def test_routing_from_id_deshabilitado():
+    assert Sku.routing_from_id("7_A10N") is None
+
+
+def test_bulk_dsl(routing):
+    sku = Sku(sku_id="2_G40N", sku="G40N", rut_proveedor_=2)
+
+    [action] = BulkInsertUpdateDelete.prepare_bulk_dsl([sku], "update", True)
+
+    assert action["_routing"] == "2"
+    assert action["doc"]["rut_proveedor_"] == 2
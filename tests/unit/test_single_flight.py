@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""Pruebas para :class:`laholio.utils.async_dsl.SingleFlight`"""
+import asyncio
+
+import pytest
+
+from laholio.utils.async_dsl import SingleFlight
+
+
+class Backend:
+    """Simula el cluster: cuenta las llamadas y responde al liberar."""
+
+    def __init__(self):
+        self.calls = 0
+        self.release = asyncio.Event()
+        self.error = None
+
+    async def search(self):
+        self.calls += 1
+        await self.release.wait()
+        if self.error:
+            raise self.error
+        return {"calls": self.calls}
+
+
+@pytest.mark.asyncio
+async def test_llamadas_identicas_comparten_request():
+    group, backend = SingleFlight(), Backend()
+
+    callers = [
+        asyncio.ensure_future(group.do("llave", backend.search))
+        for _ in range(10)
+    ]
+    await asyncio.sleep(0)
+    backend.release.set()
+
+    results = await asyncio.gather(*callers)
+
+    assert backend.calls == 1
+    assert all(result == {"calls": 1} for result in results)
+    assert len(group) == 0
+
+
+@pytest.mark.asyncio
+async def test_llaves_distintas_no_se_comparten():
+    group, backend = SingleFlight(), Backend()
+    backend.release.set()
+
+    await asyncio.gather(
+        group.do("a", backend.search), group.do("b", backend.search)
+    )
+
+    assert backend.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_excepcion_llega_a_todos():
+    group, backend = SingleFlight(), Backend()
+    backend.error = RuntimeError("cluster caído")
+
+    callers = [
+        asyncio.ensure_future(group.do("llave", backend.search))
+        for _ in range(3)
+    ]
+    await asyncio.sleep(0)
+    backend.release.set()
+
+    results = await asyncio.gather(*callers, return_exceptions=True)
+
+    assert backend.calls == 1
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+@pytest.mark.asyncio
+async def test_cancelar_un_llamador_no_cancela_a_los_demas():
+    group, backend = SingleFlight(), Backend()
+
+    cancelled = asyncio.ensure_future(group.do("llave", backend.search))
+    survivor = asyncio.ensure_future(group.do("llave", backend.search))
+    await asyncio.sleep(0)
+
+    cancelled.cancel()
+    await asyncio.sleep(0)
+    backend.release.set()
+
+    assert await survivor == {"calls": 1}
+    assert cancelled.cancelled()
+    assert backend.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_cancelar_a_todos_cancela_la_tarea():
+    group, backend = SingleFlight(), Backend()
+
+    callers = [
+        asyncio.ensure_future(group.do("llave", backend.search))
+        for _ in range(2)
+    ]
+    await asyncio.sleep(0)
+    for caller in callers:
+        caller.cancel()
+    await asyncio.sleep(0)
+
+    assert len(group) == 0
+
+    # Una nueva llamada no se une a la tarea cancelada
+    backend.release.set()
+    assert await group.do("llave", backend.search) == {"calls": 2}
+
+
+@pytest.mark.asyncio
+async def test_cada_llamador_recibe_su_copia():
+    group, backend = SingleFlight(), Backend()
+
+    callers = [
+        asyncio.ensure_future(group.do("llave", backend.search))
+        for _ in range(3)
+    ]
+    await asyncio.sleep(0)
+    backend.release.set()
+
+    results = await asyncio.gather(*callers)
+    results[0]["calls"] = "modificado"
+
+    assert [result["calls"] for result in results[1:]] == [1, 1]
+    assert len({id(result) for result in results}) == 3
+
+
+@pytest.mark.asyncio
+async def test_sin_compartir_no_copia():
+    group = SingleFlight()
+    result = {}
+
+    async def search():
+        return result
+
+    assert await group.do("llave", search) is result
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""Pruebas del dimensionamiento de índices"""
+from unittest import mock
+
+import pytest
+from elasticsearch_dsl import Index
+
+from laholio.schemas import Sku
+from laholio.schemas import init_schema
+from laholio.settings import IndexProfile
+from laholio.utils.sizing import GB
+from laholio.utils.sizing import estimate_shard_count
+
+
+@pytest.mark.parametrize(
+    "doc_count, avg_doc_size, expected",
+    [
+        (0, 4000, 1),
+        (1000000, 4000, 1),  # ~6 GB con el margen
+        (10000000, 4000, 3),  # ~56 GB con el margen
+        (10 ** 10, 4000, 64),  # acotado por `max_shards`
+    ],
+)
+def test_estimate_shard_count(doc_count, avg_doc_size, expected):
+    assert estimate_shard_count(doc_count, avg_doc_size) == expected
+
+
+def test_estimate_shard_count_sin_margen():
+    assert (
+        estimate_shard_count(10, 2 * GB, target_shard_size=10 * GB, growth=1)
+        == 2
+    )
+
+
+@pytest.mark.parametrize(
+    "kwargs", [{"doc_count": -1}, {"growth": 0.5}, {"max_shards": 0}]
+)
+def test_estimate_shard_count_invalido(kwargs):
+    arguments = dict(doc_count=1, avg_doc_size=1)
+    arguments.update(kwargs)
+
+    with pytest.raises(ValueError):
+        estimate_shard_count(**arguments)
+
+
+def test_index_profile():
+    profile = IndexProfile(number_of_shards=3, codec="best_compression")
+
+    assert profile.index_settings() == {
+        "number_of_shards": 3,
+        "number_of_replicas": 0,
+        "refresh_interval": "1s",
+        "codec": "best_compression",
+        "max_result_window": 10000,
+    }
+
+
+def test_perfil_no_queda_en_el_documento():
+    connection = mock.Mock()
+    connection.indices.exists.return_value = False
+    settings = dict(Sku._index._settings)
+    profile = IndexProfile(number_of_shards=7, number_of_replicas=0)
+
+    with mock.patch.object(Index, "save", autospec=True) as save:
+        init_schema(connection, doc=Sku, templates=False, profile=profile)
+
+    [(index,), _] = save.call_args
+    assert index._settings["number_of_shards"] == 7
+    assert Sku._index._settings == settings
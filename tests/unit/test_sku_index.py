@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""Pruebas para el índice de prefijos :mod:`laholio.utils.prefix`"""
+import random
+
+import pytest
+
+from laholio.crud import BulkInsertUpdateDelete
+from laholio.utils.prefix import SkuPrefixIndex
+
+SKUS = [
+    {
+        "sku_id": "1_A10N",
+        "sku": "A10N",
+        "sku_fabricante": "MEL A10N-01",
+        "rut_proveedor_": 1,
+    },
+    {"sku_id": "1_A1000", "sku": "A1000", "rut_proveedor_": 1},
+    {"sku_id": "2_A10X", "sku": "A10X", "rut_proveedor_": 2},
+    {"sku_id": "2_200032", "sku": "200032", "rut_proveedor_": 2},
+]
+
+
+def build():
+    index = SkuPrefixIndex()
+    index.add_many(SKUS)
+    return index
+
+
+def ids(results):
+    return [result["sku_id"] for result in results]
+
+
+@pytest.mark.parametrize(
+    "prefix, rut_proveedor_, expected",
+    [
+        ("a10", None, ["1_A1000", "1_A10N", "2_A10X"]),
+        ("A10", 1, ["1_A1000", "1_A10N"]),
+        ("a10", [2, 3], ["2_A10X"]),
+        ("a10n-", None, ["1_A10N"]),  # por el sku_fabricante
+        ("mel", None, ["1_A10N"]),
+        ("a1", None, []),  # más corto que el min_gram
+        ("xyz", None, []),
+    ],
+)
+def test_complete(prefix, rut_proveedor_, expected):
+    assert ids(build().complete(prefix, rut_proveedor_)) == expected
+
+
+def test_complete_size():
+    assert ids(build().complete("a10", size=1)) == ["1_A1000"]
+
+
+@pytest.mark.parametrize(
+    "text, expected", [("A10N", True), (" a10 ", True), ("a10 n", False)]
+)
+def test_is_code(text, expected):
+    assert SkuPrefixIndex.is_code(text) is expected
+
+
+def test_add_reemplaza_codigos():
+    index = build()
+
+    index.add("1_A10N", 1, "B20N")
+
+    assert ids(index.complete("mel")) == []
+    assert ids(index.complete("b20")) == ["1_A10N"]
+    assert len(index) == len(SKUS)
+
+
+def test_listener_mantiene_el_indice():
+    index = build()
+    actions = [
+        {"_id": "3_C30", "_source": {"sku": "C30", "rut_proveedor_": 3}},
+        {"_op_type": "delete", "_id": "2_A10X"},
+        {"_op_type": "update", "_id": "1_A1000", "doc": {"precio": 1}},
+    ]
+
+    sent = list(BulkInsertUpdateDelete._notify(actions, [index.bulk_listener]))
+
+    assert sent == actions
+    assert ids(index.complete("c30", 3)) == ["3_C30"]
+    assert ids(index.complete("a10")) == ["1_A1000", "1_A10N"]
+    assert index.stats()["proveedores"] == 3
+
+
+def test_stats():
+    stats = build().stats()
+
+    assert stats["skus"] == len(SKUS)
+    assert stats["codigos"] == 6
+    assert stats["nbytes"] > 0
+
+
+@pytest.mark.parametrize("compact_min", [4096, 5], ids=["delta", "compacta"])
+def test_escrituras_igual_a_carga_masiva(monkeypatch, compact_min):
+    monkeypatch.setattr("laholio.utils.prefix.COMPACT_MIN", compact_min)
+    randomizer = random.Random(7)
+    index = build()
+    expected = {sku["sku_id"]: sku for sku in SKUS}
+
+    for step in range(300):
+        sku_id = "{}_C{}".format(randomizer.randint(1, 4), step % 40)
+        if randomizer.random() < 0.3:
+            index.remove(sku_id)
+            expected.pop(sku_id, None)
+        else:
+            sku = {
+                "sku_id": sku_id,
+                "sku": "C{}".format(randomizer.randint(100, 130)),
+                "rut_proveedor_": randomizer.randint(1, 4),
+            }
+            index.add(sku_id, sku["rut_proveedor_"], sku["sku"])
+            expected[sku_id] = sku
+        if step % 50 == 0:
+            index.complete("c10")
+
+    reference = SkuPrefixIndex()
+    reference.add_many(expected.values())
+    for prefix in ("c10", "c11", "c12", "a10"):
+        for rut_proveedor_ in (None, 1, [2, 3], 4):
+            # Los skus con el mismo código pueden quedar en otro orden
+            assert sorted(
+                ids(index.complete(prefix, rut_proveedor_, 100))
+            ) == sorted(ids(reference.complete(prefix, rut_proveedor_, 100)))
+    stats, reference_stats = index.stats(), reference.stats()
+    for name in ("skus", "codigos", "proveedores"):
+        assert stats[name] == reference_stats[name]
+
+
+def test_leer_despues_de_escribir_no_reconstruye(monkeypatch):
+    index = SkuPrefixIndex()
+    index.add_many(
+        {
+            "sku_id": "1_B{}".format(i),
+            "sku": "B{}".format(i),
+            "rut_proveedor_": 1,
+        }
+        for i in range(1000)
+    )
+
+    def extend(*args, **kwargs):
+        raise AssertionError("reconstruye el arreglo completo")
+
+    monkeypatch.setattr("laholio.utils.prefix._SortedCodes.extend", extend)
+    for step in range(50):
+        index.add("1_A{}".format(step), 1, "B10{}".format(step))
+        index.remove("1_B10{}".format(step))
+        results = ids(index.complete("b10", 1, size=100))
+        assert "1_A{}".format(step) in results
+        assert "1_B10{}".format(step) not in results
+
+    assert ids(index.complete("b100")) == ["1_A0"]
+    assert index.stats()["codigos"] == 1000 - 10 + 50
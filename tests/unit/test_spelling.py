@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""Pruebas para el corrector :mod:`laholio.utils.spelling`"""
+import pytest
+
+from laholio.crud import BulkInsertUpdateDelete
+from laholio.utils.spelling import SymSpell
+from laholio.utils.spelling import build
+from laholio.utils.spelling import edit_distance
+
+CATALOGO = [
+    "Cemento CBB Especial Unidad",
+    "Cemento MELON Extra",
+    "Hormigón Preparado AISLANTES NACIONALES Bolsa 25 kg",
+    "Pilar Electrosoldado ACMA (12-12/15-15) Unidad",
+]
+
+
+@pytest.mark.parametrize(
+    "source, target, expected",
+    [
+        ("cemento", "cemento", 0),
+        ("cemnto", "cemento", 1),
+        ("cemetno", "cemento", 1),  # transposición
+        ("melom", "melon", 1),
+        ("abc", "xyz", 3),  # mayor al máximo
+    ],
+)
+def test_edit_distance(source, target, expected):
+    assert edit_distance(source, target, 2) == expected
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("cemnto melom", "cemento melon"),
+        ("Hormigon electrosoldaod", "hormigon electrosoldado"),
+        ("HORMIGÓN", None),  # conocida, sin tilde ni mayúsculas
+        ("cemento", None),
+        ("xyzzy", None),  # sin candidatos
+    ],
+)
+def test_correct(text, expected):
+    assert build(CATALOGO).correct(text) == expected
+
+
+def test_prefiere_la_palabra_mas_frecuente():
+    corrector = build(["casa", "casa", "cama"])
+
+    assert [s.term for s in corrector.lookup("cara")] == ["casa", "cama"]
+
+
+def test_listener_agrega_vocabulario():
+    corrector = SymSpell()
+    listener = corrector.bulk_listener("descripcion_corta")
+    actions = [
+        {"_source": {"descripcion_corta": "Cemento MELON Extra"}},
+        {"doc": {"descripcion_corta": "Arena"}, "_op_type": "update"},
+        {"_op_type": "delete", "_id": "1"},
+    ]
+
+    sent = list(BulkInsertUpdateDelete._notify(actions, [listener]))
+
+    assert sent == actions
+    assert corrector.correct("arnea cemneto") == "arena cemento"
+
+
+def test_prefijo_mayor_a_la_distancia():
+    with pytest.raises(ValueError):
+        SymSpell(max_edit_distance=2, prefix_length=2)
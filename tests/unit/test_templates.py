@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""Pruebas para las plantillas de búsqueda :mod:`laholio.templates`"""
+import copy
+import itertools
+import json
+from unittest import mock
+
+import chevron
+import pytest
+from elasticsearch.exceptions import NotFoundError
+from elasticsearch.exceptions import RequestError
+
+from laholio.crud import SkuSearch
+from laholio.templates import SKU_LIST_ALL
+from laholio.templates import SKU_SEARCH
+from laholio.templates import SKU_SUGGEST
+from laholio.templates import TEMPLATES
+from laholio.templates import SearchTemplates
+from laholio.templates import is_missing_template
+from laholio.templates import provider_filter
+from laholio.templates import put_search_templates
+from laholio.utils.async_dsl import AsyncSearch
+
+from . import SYNC_CONN
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.mark.parametrize("rut_proveedor_", [76350871, [76350871, 1]])
+def test_filtro_igual_al_dsl(rut_proveedor_):
+    search = SkuSearch._filter_brand(AsyncSearch(), rut_proveedor_)
+
+    expected = search.to_dict()["query"]["bool"]["filter"]
+
+    assert provider_filter(rut_proveedor_) == expected
+
+
+def test_sin_proveedor_no_filtra():
+    assert provider_filter(None) == []
+
+
+def test_plantilla_faltante_se_reintenta():
+    clock = FakeClock()
+    templates = SearchTemplates(retry_after=10, clock=clock)
+
+    assert templates.enabled(SKU_SEARCH)
+
+    templates.missing(SKU_SEARCH)
+    clock.now = 9
+    assert not templates.enabled(SKU_SEARCH)
+
+    clock.now = 10
+    assert templates.enabled(SKU_SEARCH)
+
+    templates.found(SKU_SEARCH)
+    templates.missing(SKU_SEARCH)
+    assert not templates.enabled(SKU_SEARCH)
+
+
+def test_plantillas_deshabilitadas():
+    assert not SearchTemplates(ids=[]).enabled(SKU_SEARCH)
+
+
+@pytest.mark.parametrize(
+    "exc, expected",
+    [
+        (
+            NotFoundError(
+                404,
+                "resource_not_found_exception",
+                {"error": {"reason": "unable to find script [x]"}},
+            ),
+            True,
+        ),
+        (NotFoundError(404, "index_not_found_exception", {}), False),
+        (RequestError(400, "parsing_exception", {}), False),
+    ],
+)
+def test_error_de_plantilla_faltante(exc, expected):
+    assert is_missing_template(exc) is expected
+
+
+@pytest.fixture(scope="module")
+def searcher():
+    searcher = SkuSearch.__new__(SkuSearch)
+    searcher.connection = mock.Mock()
+    searcher.index_name = "test_index"
+    searcher.single_flight = None
+    return searcher
+
+
+def cluster_render(template_id, params):
+    """Cuerpo que arma el cluster con la plantilla guardada."""
+    return SYNC_CONN.render_search_template(
+        body={"id": template_id, "params": params}
+    )["template_output"]
+
+
+def chevron_render(template_id, params):
+    """Cuerpo que arma chevron con la plantilla, sin el cluster.
+
+    Emula la función `toJson` del Mustache de ES.
+
+    """
+    data = dict(params)
+    data["toJson"] = lambda name, _: json.dumps(params[name.strip()])
+    return json.loads(chevron.render(TEMPLATES[template_id], data))
+
+
+@pytest.fixture(scope="module", params=["chevron", "cluster"])
+def render(request):
+    if request.param == "chevron":
+        return chevron_render
+    put_search_templates(SYNC_CONN, force=True)
+    return cluster_render
+
+
+def normalized(search):
+    """Cuerpo que envía `search`, escrito como en las plantillas.
+
+    Las plantillas siempre usan un `bool` con `must` y `filter`, y
+    siempre traen `includes`, `size` y `from`, lo que no cambia los
+    resultados.
+
+    """
+    body = copy.deepcopy(search.to_dict())
+    body.update(
+        (name, value)
+        for name, value in search._params.items()
+        if name in ("size", "from")
+    )
+    query = body.get("query", {})
+    if "bool" not in query:
+        body["query"] = query = {"bool": {"must": [query]}}
+    query["bool"].setdefault("filter", [])
+    if "_source" in body:
+        body["_source"].setdefault("includes", [])
+    return body
+
+
+@pytest.mark.parametrize(
+    "operator, search_size, rut_proveedor_, includes, excludes",
+    itertools.product(
+        ["and", "or"], [5, 1], [None, 1, [1, 2]], [None, ["sku"]], [None]
+    ),
+)
+def test_sku_search_igual_al_dsl(
+    searcher, render, operator, search_size, rut_proveedor_, includes, excludes
+):
+    args = (
+        'cemento "melón" \\ 1/2"',
+        operator,
+        search_size,
+        rut_proveedor_,
+        includes,
+        excludes,
+    )
+
+    assert render(SKU_SEARCH, searcher._product_params(*args)) == normalized(
+        searcher._product_search(*args)
+    )
+
+
+@pytest.mark.parametrize("suggestion_type", ["phrase", "term"])
+def test_sku_suggest_igual_al_dsl(searcher, render, suggestion_type):
+    args = ('cemento "melón"', "descripcion_corta_", suggestion_type, "s")
+
+    assert (
+        render(SKU_SUGGEST, searcher._suggest_params(*args))
+        == searcher._suggest_search(*args).to_dict()
+    )
+
+
+@pytest.mark.parametrize(
+    "from_, rut_proveedor_, includes, keyset, after",
+    [
+        (0, None, None, False, None),
+        (3, 1, ["sku"], False, None),
+        (0, [1, 2], None, True, None),
+        (0, None, ["sku"], True, "1_A10N"),
+        (0, 1, None, True, '1_"A"'),
+        (7, None, None, False, None),  # `from_` mayor que `size`
+    ],
+)
+def test_sku_list_all_igual_al_dsl(
+    searcher, render, from_, rut_proveedor_, includes, keyset, after
+):
+    args = (
+        from_,
+        5,
+        rut_proveedor_,
+        includes,
+        ["descripcion_corta_"],
+        keyset,
+        after,
+    )
+
+    assert render(SKU_LIST_ALL, searcher._list_all_params(*args)) == (
+        normalized(searcher._list_all_search(*args))
+    )
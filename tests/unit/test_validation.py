@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+"""Compara :mod:`laholio.validation` con la validación fila a fila."""
+import json
+import random
+import time
+from decimal import Decimal
+
+import pytest
+from pydantic import ValidationError
+
+from laholio.schemas import Sku
+from laholio.schemas import SkuQualityStatus
+from laholio.schemas import SkuYellow
+from laholio.schemas import TypeSkuError
+from laholio.validation import ColumnarValidator
+
+SKU_MODEL = Sku.to_pydantic("Sku")
+SKU_YELLOW_MODEL = SkuYellow.to_pydantic("SkuYellow")
+
+VALID = dict(
+    sku_id="1_A",
+    sku="A",
+    dv_proveedor="K",
+    rut_proveedor_=1,
+    contenido="c",
+    formato_venta="f",
+    unidad_medida="u",
+    descripcion_corta="d",
+    descripcion_corta_="d",
+    atributos={"color": "rojo"},
+    imagenes={"normal": "n.png"},
+    status="Completo",
+)
+
+# Valores que se prueban en cada campo; `KeyError` quita el campo
+CASES = {
+    "str": [KeyError, None, 1, 1.5, True, Decimal("2"), b"x", b"\xff", [1]]
+    + ["", SkuQualityStatus.completo],
+    "int": [KeyError, None, "12", " 12 ", "1.5", 1.7, float("nan"), True]
+    + [Decimal("3.2"), b"5", [1], "x"],
+    "enum": [KeyError, None, "Incompleto", "completo"]
+    + [SkuQualityStatus.completo, {}],
+    "atributos": [KeyError, None, {}, [("a", "b")], {"a": None}, "ab", [1]]
+    + [{"a": 1, 2: "x"}, {"a": [1]}, {(1,): "x"}],
+}
+
+
+def field_cases(name):
+    if name in ("atributos", "status"):
+        return CASES["atributos" if name == "atributos" else "enum"]
+    if name in ("imagenes", "especificaciones"):
+        key = "normal" if name == "imagenes" else "ficha_tecnica"
+        values = [None, [1], {}, 2]
+        return [KeyError, None, {}, "x", [(key, "x")]] + [
+            {key: value} for value in values
+        ]
+    if name.startswith("rut_"):
+        return CASES["int"]
+    return CASES["str"]
+
+
+def rows():
+    fields = list(SKU_MODEL.__fields__)
+    for name in fields:
+        for value in field_cases(name):
+            row = dict(VALID)
+            if value is KeyError:
+                row.pop(name, None)
+            else:
+                row[name] = value
+            yield row
+
+    # Filas con varios errores a la vez
+    randomizer = random.Random(42)
+    for _ in range(300):
+        row = dict(VALID)
+        for name in randomizer.sample(fields, 3):
+            value = randomizer.choice(field_cases(name))
+            if value is KeyError:
+                row.pop(name, None)
+            else:
+                row[name] = value
+        yield row
+
+
+def without_none_alternatives(errors):
+    return [
+        {"loc": error["loc"], "msg": error["msg"], "type": error["type"]}
+        for error in errors
+        if error["type"] != "type_error.none.allowed"
+    ]
+
+
+def row_by_row(data):
+    """Validación de referencia con los modelos de pydantic."""
+    result = []
+    for row in data:
+        try:
+            SKU_MODEL(**row)
+            result.append((None, None))
+            continue
+        except ValidationError as exc:
+            errors = exc.errors()
+        try:
+            SKU_YELLOW_MODEL(**row)
+            result.append((TypeSkuError.missing, errors))
+        except ValidationError as exc:
+            result.append((TypeSkuError.fatal, exc.errors()))
+    return result
+
+
+@pytest.fixture(scope="module")
+def validator():
+    return ColumnarValidator()
+
+
+def test_misma_clasificacion_que_pydantic(validator):
+    data = list(rows())
+    expected = row_by_row(data)
+
+    incomplete, fatal = validator.validate(data)
+
+    assert validator.classify(data) == [
+        type_error for type_error, _ in expected
+    ]
+    found = {
+        error.row: (TypeSkuError(error.type_error), error.sku_errors)
+        for error in incomplete + fatal
+    }
+    assert len(found) == len(incomplete) + len(fatal)
+    for row, (type_error, errors) in enumerate(expected):
+        if type_error is None:
+            assert row not in found
+            continue
+        found_type, detail = found[row]
+        assert found_type is type_error
+        assert json.loads(detail) == json.loads(
+            json.dumps(without_none_alternatives(errors), default=str)
+        )
+    assert {TypeSkuError.missing, TypeSkuError.fatal, None} == {
+        type_error for type_error, _ in expected
+    }
+
+
+def test_columnas_igual_a_filas(validator):
+    data = list(rows())
+    names = {name for row in data for name in row}
+    # Sin `imagenes` en ninguna fila: falta en todas
+    columns = {
+        name: [row.get(name) for row in data]
+        for name in names
+        if name != "imagenes"
+    }
+
+    classes = validator.classify(columns)
+
+    assert classes == validator.classify(
+        [{**row, "imagenes": None} for row in data]
+    )
+    assert set(classes) == {TypeSkuError.missing, TypeSkuError.fatal}
+
+
+def test_objetos_strict(validator):
+    rows = [
+        {**VALID, "imagenes": {"normal": "n.png", "grande": "g.png"}},
+        {**VALID, "especificaciones": {"otra": "x"}},
+    ]
+
+    _, fatal = validator.validate(rows, first_row=2)
+
+    assert [error.row for error in fatal] == [2, 3]
+    assert json.loads(fatal[0].sku_errors) == [
+        {
+            "loc": ["imagenes", "grande"],
+            "msg": "extra fields not permitted",
+            "type": "value_error.extra",
+        }
+    ]
+
+
+def test_columnas_de_distinto_largo(validator):
+    with pytest.raises(ValueError):
+        validator.classify({"sku": ["A"], "sku_id": []})
+
+
+def test_dataframe(validator):
+    pandas = pytest.importorskip("pandas")
+    frame = pandas.DataFrame([VALID, {**VALID, "rut_proveedor_": None}])
+
+    assert validator.classify(frame) == [None, TypeSkuError.fatal]
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize("size", [20000])
+def test_validacion_columnar_mas_rapida(validator, size):
+    """Filas por segundo de la validación fila a fila y la columnar."""
+    data = [
+        {**VALID, "sku_id": "1_{}".format(i), "sku": str(i)}
+        for i in range(size)
+    ]
+    for i in range(0, size, 50):
+        data[i] = {**data[i], "contenido": None}
+    for i in range(0, size, 70):
+        data[i] = {**data[i], "rut_proveedor_": "x"}
+
+    columns = {name: [row.get(name) for row in data] for name in VALID}
+
+    rates = {}
+    for name, function in [
+        ("fila a fila", lambda: [error for error, _ in row_by_row(data)]),
+        ("columnar filas", lambda: validator.classify(data)),
+        ("columnar columnas", lambda: validator.classify(columns)),
+    ]:
+        start = time.perf_counter()
+        classes = function()
+        rates[name] = (classes, size / (time.perf_counter() - start))
+
+    print(
+        " ".join(
+            "{}={:.0f} filas/s".format(name, rate)
+            for name, (_, rate) in rates.items()
+        )
+    )
+    expected, row_rate = rates.pop("fila a fila")
+    for classes, rate in rates.values():
+        assert classes == expected
+        assert rate > 5 * row_rate